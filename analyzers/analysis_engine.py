@@ -0,0 +1,691 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+
+"""单次遍历的融合分析引擎"""
+import math
+from collections import Counter, deque
+from hashlib import blake2b
+from concurrent.futures import ProcessPoolExecutor
+
+from analyzers.length_analyzer import LengthAccumulator
+from analyzers.complexity_analyzer import ComplexityAccumulator
+from analyzers.duplication_analyzer import DuplicationAnalyzer
+from analyzers.entropy_analyzer import EntropyAnalyzer, window_fractions
+from analyzers.near_duplicate_analyzer import NearDuplicateAnalyzer
+from config.analysis_config import LENGTH_CONFIG
+from utils.code_utils import normalize_line
+from utils.verilog_lexer import lex
+
+# 逐行记录格式版本，profile_row的输出变化时递增，使旧的缓存记录失效
+RECORD_VERSION = 3
+
+# 读写逐行缓存的批大小（行数）
+CACHE_BATCH_SIZE = 1000
+
+# 输出逐行指标时精确模式单进程分析的分块大小（行数），限制未写出的指标行数
+ROW_METRICS_BATCH_SIZE = 10000
+
+# 各累加器对应的分析器名称，用作剖析区间名的前缀
+ACCUMULATOR_ANALYZERS = {
+    'length_stats': 'length',
+    'complexity_stats': 'complexity',
+    'duplication_stats': 'duplication',
+    'entropy_stats': 'entropy',
+    'near_duplicate_stats': 'near_duplicate',
+}
+
+# 单行分析结果中供CodeScorer评分的统计字段
+ROW_RESULT_SECTIONS = ('length_stats', 'complexity_stats', 'duplication_stats', 'entropy_stats')
+
+# 逐行指标表的列及类型（'int'、'float'或'bool'），各代码块的计数列（blocks_<类型>）追加在其后
+ROW_METRIC_COLUMNS = (
+    ('row', 'int'),
+    ('valid', 'bool'),
+    ('text_length', 'int'),
+    ('line_count', 'int'),
+    ('long_line_count', 'int'),
+    ('blank_ratio', 'float'),
+    ('comment_ratio', 'float'),
+    ('code_ratio', 'float'),
+    ('duplication_ratio', 'float'),
+    ('duplicate_pattern_count', 'int'),
+    ('entropy', 'float'),
+    ('low_entropy_window_ratio', 'float'),
+    ('high_entropy_window_ratio', 'float'),
+)
+
+
+def line_ratios(total_lines, blank_count, comment_count):
+    """计算空行、注释行和代码行占总行数的比例"""
+    if total_lines <= 0:
+        return 0, 0, 0
+    return (blank_count / total_lines, comment_count / total_lines,
+            (total_lines - blank_count - comment_count) / total_lines)
+
+
+def _no_switch(name, rows=1):
+    """未启用剖析时代替StageProfiler.switch"""
+
+
+class AnalysisEngine:
+    def __init__(self, duplication_config=None, entropy_config=None, length_config=None,
+                 near_duplicate_config=None, cache=None):
+        """初始化融合分析引擎
+
+        Args:
+            duplication_config: 重复分析配置，如果为None则使用默认配置
+            entropy_config: 熵分析配置，如果为None则使用默认配置
+            length_config: 长度分析配置，如果为None则使用默认配置
+            near_duplicate_config: 跨文件近似重复分析配置，如果为None则使用默认配置
+            cache: 可选的逐行分析记录缓存（utils.row_cache.RowCache）
+        """
+        self.duplication_analyzer = DuplicationAnalyzer(duplication_config)
+        self.near_duplicate_analyzer = NearDuplicateAnalyzer(near_duplicate_config)
+        self.entropy_analyzer = EntropyAnalyzer(entropy_config)
+        self.length_config = length_config or LENGTH_CONFIG
+        self.long_line_threshold = self.length_config['long_line_threshold']
+        self.cache = cache
+        self.row_metric_names = [name for name, _ in self.row_metric_columns()]
+
+        # 影响逐行记录的全部配置的摘要，作为缓存键的密钥
+        self.config_key = blake2b(repr((
+            RECORD_VERSION,
+            self.duplication_analyzer.config,
+            self.entropy_analyzer.config,
+            self.length_config,
+            self.near_duplicate_analyzer.config,
+        )).encode('utf-8'), digest_size=16).digest()
+
+    def profile_row(self, code, profiler=None):
+        """单次遍历一行数据的代码文本，生成供所有分析器汇总的逐行记录
+
+        Args:
+            code: 代码文本
+            profiler: 可选的StageProfiler，按分析器记录各子阶段的耗时和计数器；
+                最后一个子阶段区间（near_duplicate.minhash）由调用方结束
+
+        Returns:
+            dict: 逐行记录，包含行长度、行类型计数、行级重复、块级指纹、代码块计数和滑动窗口熵分布
+        """
+        if not isinstance(code, str):
+            return {
+                'valid': False,
+                'text_length': None,
+                'line_count': 0,
+                'duplication_ratio': 0,
+                'duplicate_pattern_count': 0,
+                'duplicate_patterns': {},
+                'fingerprints': None,
+                'minhash': None,
+            }
+
+        duplication = self.duplication_analyzer
+        min_line_length = duplication.min_line_length
+        switch = profiler.switch if profiler is not None else _no_switch
+        # 注释、字符串和数字只扫描一次，行分类、行标准化和代码块统计共用扫描结果
+        switch('lexer.scan')
+        tokens = lex(code)
+        code_lines = tokens.code_lines()
+        switch('length.line_stats')
+        lines = code.split('\n')
+        line_lengths, long_line_count, blank_count, comment_count = self.line_stats(lines, code_lines)
+        switch('duplication.normalize')
+        normalized_lines = [normalize_line(line) for line in code_lines]
+
+        switch('duplication.line_duplicates')
+        ratio, num_patterns, patterns = duplication.find_line_duplicates(lines, normalized_lines)
+        switch('duplication.winnow')
+        fingerprints = duplication.winnow(normalized_lines)
+        switch('entropy.block_scan')
+        entropy = self.entropy_analyzer.analyze_block_entropy(code, tokens)
+        switch('near_duplicate.minhash')
+        # 跨文件比较与行级重复使用同样的有效行
+        minhash = self.near_duplicate_analyzer.signature(
+            normalized for normalized, length in zip(normalized_lines, line_lengths)
+            if length > min_line_length
+        )
+
+        if profiler is not None:
+            counters = profiler.counters
+            counters['tokens_lexed'] += len(tokens)
+            counters['lines_normalized'] += len(lines)
+            counters['windows_hashed'] += max(
+                0, len(normalized_lines) - normalized_lines.count('') - duplication.min_block_size + 1)
+            counters['fingerprints_selected'] += len(fingerprints[0])
+            counters['regex_matches'] += sum(entropy['block_counts'].values())
+            counters['entropy_windows'] += entropy['window_profile']['windows']
+
+        return {
+            'valid': True,
+            'text_length': len(code),
+            'line_count': len(lines),
+            'line_lengths': line_lengths,
+            'long_line_count': long_line_count,
+            'blank_count': blank_count,
+            'comment_count': comment_count,
+            'code_count': len(lines) - blank_count - comment_count,
+            'duplication_ratio': ratio,
+            'duplicate_pattern_count': num_patterns,
+            'duplicate_patterns': patterns,
+            'fingerprints': fingerprints,
+            'entropy': entropy['entropy'],
+            'block_counts': entropy['block_counts'],
+            'window_profile': entropy['window_profile'],
+            'minhash': minhash,
+        }
+
+    def line_stats(self, lines, code_lines):
+        """统计行长度、超长行数、空行数和注释行数
+
+        Args:
+            lines: 代码行
+            code_lines: 去除注释后的代码行（utils.verilog_lexer），与lines一一对应；
+                非空白、去除注释后只剩空白的行为注释行
+
+        Returns:
+            tuple: (行长度列表, 超长行数, 空行数, 注释行数)
+        """
+        long_line_threshold = self.long_line_threshold
+        line_lengths = []
+        long_line_count = 0
+        blank_count = 0
+        comment_count = 0
+        for line, code_line in zip(lines, code_lines):
+            length = len(line)
+            line_lengths.append(length)
+            if length > long_line_threshold:
+                long_line_count += 1
+
+            if not line.strip():
+                blank_count += 1
+            elif not code_line.strip():
+                comment_count += 1
+        return line_lengths, long_line_count, blank_count, comment_count
+
+    def row_metric_columns(self):
+        """逐行指标表的列名和类型，与row_metrics返回的值一一对应"""
+        return list(ROW_METRIC_COLUMNS) + [(f'blocks_{block}', 'int') for block in self.entropy_analyzer.patterns]
+
+    def row_metrics(self, record, index):
+        """从逐行记录提取第index行的逐行指标（与各累加器的统计口径一致）
+
+        Returns:
+            tuple: 按row_metric_columns顺序排列的指标值，无效行的长度、比例、熵和块计数为None
+        """
+        if not record['valid']:
+            return (index, False, None, record['line_count'], None, None, None, None,
+                    record['duplication_ratio'], record['duplicate_pattern_count'], None, None, None) \
+                + (None,) * len(self.entropy_analyzer.patterns)
+
+        return (
+            index,
+            True,
+            record['text_length'],
+            record['line_count'],
+            record['long_line_count'],
+        ) + line_ratios(record['line_count'], record['blank_count'], record['comment_count']) + (
+            record['duplication_ratio'],
+            record['duplicate_pattern_count'],
+            record['entropy'],
+        ) + window_fractions(record['window_profile']) + tuple(record['block_counts'].values())
+
+    def row_results(self, metrics):
+        """将一行的逐行指标组织为与数据集分析结果结构相同的单行统计，供CodeScorer对单行评分
+
+        Args:
+            metrics: row_metrics返回的有效行指标
+
+        Returns:
+            dict: 只包含CodeScorer所需字段的单行分析结果
+        """
+        values = dict(zip(self.row_metric_names, metrics))
+        return {section: self.row_result_section(section, values) for section in ROW_RESULT_SECTIONS}
+
+    def row_result_section(self, section, values):
+        """生成单行分析结果中的一个统计字段，只读取该字段所需的指标
+
+        Args:
+            section: 统计字段名（length_stats、complexity_stats、duplication_stats或entropy_stats）
+            values: 指标列名到值的映射
+
+        Returns:
+            dict: 该字段的单行统计
+        """
+        if section == 'length_stats':
+            return {
+                'length_distribution': {'mean': values['text_length']},
+                'line_length_stats': {'long_lines_ratio': 1.0 if values['long_line_count'] > 0 else 0.0},
+            }
+        if section == 'complexity_stats':
+            return {
+                'blank_lines_ratio': {'mean': values['blank_ratio']},
+                'comment_lines_ratio': {'mean': values['comment_ratio']},
+                'code_lines_ratio': {'mean': values['code_ratio']},
+            }
+        if section == 'duplication_stats':
+            ratio = values['duplication_ratio']
+            return {
+                'line_level': {
+                    'ratios': {'mean': ratio},
+                    'high_duplication_count': int(ratio >= self.duplication_analyzer.high_duplication_threshold),
+                    'total_files': 1,
+                },
+            }
+        block_counts = {block: values[f'blocks_{block}'] for block in self.entropy_analyzer.patterns}
+        return {
+            'global_entropy_stats': {'mean': values['entropy']},
+            'block_stats': {
+                'total_blocks': sum(block_counts.values()),
+                'block_type_counts': {
+                    block_type: sum(block_counts[block] for block in blocks)
+                    for block_type, blocks in self.entropy_analyzer.block_mapping.items()
+                },
+                'top_blocks': [{'block': block, 'count': count}
+                               for block, count in Counter(block_counts).most_common(10)],
+            },
+        }
+
+    def cascade_stages(self):
+        """级联过滤的分析阶段，按声明的相对开销从低到高排列
+
+        每个阶段只计算一部分逐行指标：run(code, state)返回该阶段的指标值（列名到值的映射），
+        state保存阶段之间共享的中间结果（如拆分后的行），后面的阶段可以使用前面阶段的结果。
+        columns为该阶段产出的指标列，dimensions为该阶段完成后即可计算的CodeScorer评分维度。
+        级联过滤不需要块级指纹和MinHash签名，各阶段不计算这两项。
+
+        Returns:
+            list: 阶段描述（dict）的列表
+        """
+        return [
+            {'name': 'length', 'cost': 1, 'run': self._stage_length,
+             'columns': ['valid', 'text_length', 'line_count'], 'dimensions': []},
+            {'name': 'lines', 'cost': 4, 'run': self._stage_lines,
+             'columns': ['long_line_count', 'blank_ratio', 'comment_ratio', 'code_ratio'],
+             'dimensions': ['code_length', 'line_stats']},
+            {'name': 'duplication', 'cost': 5, 'run': self._stage_duplication,
+             'columns': ['duplication_ratio', 'duplicate_pattern_count'], 'dimensions': ['duplication']},
+            {'name': 'entropy', 'cost': 25, 'run': self._stage_entropy,
+             'columns': ['entropy', 'low_entropy_window_ratio', 'high_entropy_window_ratio']
+                + [f'blocks_{block}' for block in self.entropy_analyzer.patterns],
+             'dimensions': ['complexity', 'entropy']},
+        ]
+
+    def _stage_length(self, code, state):
+        if not isinstance(code, str):
+            return {'valid': False}
+        lines = state['lines'] = code.split('\n')
+        return {'valid': True, 'text_length': len(code), 'line_count': len(lines)}
+
+    def _stage_lines(self, code, state):
+        lines = state['lines']
+        tokens = state['tokens'] = lex(code)
+        code_lines = state['code_lines'] = tokens.code_lines()
+        line_lengths, long_line_count, blank_count, comment_count = self.line_stats(lines, code_lines)
+        blank_ratio, comment_ratio, code_ratio = line_ratios(len(lines), blank_count, comment_count)
+        return {'long_line_count': long_line_count, 'blank_ratio': blank_ratio,
+                'comment_ratio': comment_ratio, 'code_ratio': code_ratio}
+
+    def _stage_duplication(self, code, state):
+        lines = state['lines']
+        ratio, num_patterns, _ = self.duplication_analyzer.find_line_duplicates(
+            lines, [normalize_line(line) for line in state['code_lines']])
+        return {'duplication_ratio': ratio, 'duplicate_pattern_count': num_patterns}
+
+    def _stage_entropy(self, code, state):
+        entropy = self.entropy_analyzer.analyze_block_entropy(code, state['tokens'])
+        values = {f'blocks_{block}': count for block, count in entropy['block_counts'].items()}
+        values['entropy'] = entropy['entropy']
+        values['low_entropy_window_ratio'], values['high_entropy_window_ratio'] = \
+            window_fractions(entropy['window_profile'])
+        return values
+
+    def create_accumulators(self, streaming=False):
+        """创建各分析器的累加器
+
+        Args:
+            streaming: 流式模式下各累加器只保留内存有界的在线统计
+        """
+        return {
+            'length_stats': LengthAccumulator(streaming),
+            'complexity_stats': ComplexityAccumulator(streaming),
+            'duplication_stats': self.duplication_analyzer.create_accumulator(streaming),
+            'entropy_stats': self.entropy_analyzer.create_accumulator(streaming),
+            'near_duplicate_stats': self.near_duplicate_analyzer.create_accumulator(),
+        }
+
+    def collect_results(self, accumulators, texts=None, profiler=None):
+        """生成各分析器的统计结果，跨文件近似重复结果并入duplication_stats['cross_file']，
+        全部冗余行及其代表行（NearDuplicateAccumulator.redundant_rows）放在'near_duplicate_rows'中
+
+        Args:
+            accumulators: 各分析器的累加器
+            texts: 可选的全部代码文本，提供时为重复块补充示例代码
+            profiler: 可选的StageProfiler，记录各分析器生成结果（<分析器>.result）的耗时
+        """
+        switch = profiler.switch if profiler is not None else _no_switch
+        results = {}
+        for name, accumulator in accumulators.items():
+            if name not in ('duplication_stats', 'near_duplicate_stats'):
+                switch(f'{ACCUMULATOR_ANALYZERS[name]}.result', 0)
+                results[name] = accumulator.result()
+        switch('duplication.result', 0)
+        results['duplication_stats'] = accumulators['duplication_stats'].result(texts)
+        switch('near_duplicate.result', 0)
+        near_duplicates = accumulators['near_duplicate_stats']
+        clusters = near_duplicates.clusters()
+        results['duplication_stats']['cross_file'] = near_duplicates.result(clusters)
+        # 逐行的冗余行列表与数据量成正比，不属于报告内容，保存报告时另存为单独的文件
+        results['near_duplicate_rows'] = near_duplicates.redundant_rows(clusters)
+        switch(None)
+        return results
+
+    def iter_records(self, texts, profiler=None):
+        """逐行产出分析记录，配置了缓存时复用未变化的行的记录
+
+        Args:
+            texts: 代码文本序列
+            profiler: 可选的StageProfiler，另记录缓存读写的耗时和命中数
+
+        Yields:
+            dict: 逐行记录
+        """
+        cache = self.cache
+        if cache is None:
+            for code in texts:
+                yield self.profile_row(code, profiler)
+            return
+
+        switch = profiler.switch if profiler is not None else _no_switch
+        texts = list(texts)
+        for batch_start in range(0, len(texts), CACHE_BATCH_SIZE):
+            batch = texts[batch_start:batch_start + CACHE_BATCH_SIZE]
+            switch('row_cache.lookup', 0)
+            keys = cache.keys(self.config_key, batch)
+            cached = cache.get_many(keys)
+            if profiler is not None:
+                profiler.counters['cache_hits'] += len(cached)
+                profiler.counters['cache_misses'] += len(batch) - len(cached)
+            computed = {}
+            for key, code in zip(keys, batch):
+                record = cached.get(key)
+                if record is None:
+                    record = self.profile_row(code, profiler)
+                    if key is not None:
+                        computed[key] = record
+                yield record
+            switch('row_cache.store', 0)
+            cache.put_many(computed, cached.keys())
+
+    def analyze_chunk(self, texts, start, pbar=None, streaming=False, row_metrics=False, profiler=None):
+        """分析一段连续的代码文本，返回可合并的部分累加结果
+
+        Args:
+            texts: 代码文本序列
+            start: 该段第一行在整个数据集中的行号
+            pbar: 可选的tqdm进度条，按行数推进
+            streaming: 是否使用流式累加器
+            row_metrics: 是否同时收集该段的逐行指标（保存在返回结果的'row_metrics'中）
+            profiler: 可选的StageProfiler，记录逐行分析各子阶段和各累加器（<分析器>.add）的耗时
+
+        Returns:
+            dict: 各分析器的累加器
+        """
+        accumulators = self.create_accumulators(streaming)
+        length_acc = accumulators['length_stats']
+        complexity_acc = accumulators['complexity_stats']
+        duplication_acc = accumulators['duplication_stats']
+        entropy_acc = accumulators['entropy_stats']
+        near_duplicate_acc = accumulators['near_duplicate_stats']
+        metrics = [] if row_metrics else None
+        switch = profiler.switch if profiler is not None else _no_switch
+
+        pending = 0
+        for index, record in enumerate(self.iter_records(texts, profiler), start):
+            switch('length.add')
+            length_acc.add(record)
+            switch('complexity.add')
+            complexity_acc.add(record)
+            switch('duplication.add')
+            duplication_acc.add(record, index)
+            switch('entropy.add')
+            entropy_acc.add(record)
+            switch('near_duplicate.add')
+            near_duplicate_acc.add(record, index)
+            if metrics is not None:
+                switch('row_metrics.extract')
+                metrics.append(self.row_metrics(record, index))
+
+            pending += 1
+            if pbar is not None and pending == 1000:
+                pbar.update(pending)
+                pending = 0
+        if pbar is not None and pending:
+            pbar.update(pending)
+        switch(None)
+        if profiler is not None:
+            profiler.counters['rows'] += len(texts)
+
+        if metrics is not None:
+            accumulators['row_metrics'] = metrics
+        return accumulators
+
+    @staticmethod
+    def _merge_partial(accumulators, partial, row_sink=None, profiler=None):
+        """按行顺序合并部分结果，其中的逐行指标写入row_sink后丢弃，工作进程的剖析结果合并到profiler
+
+        Returns:
+            dict: 合并后的累加器（accumulators为None时即为partial）
+        """
+        metrics = partial.pop('row_metrics', None)
+        if metrics and row_sink is not None:
+            row_sink.write_rows(metrics)
+        worker_profiler = partial.pop('profile', None)
+        if worker_profiler is not None and profiler is not None:
+            profiler.merge(worker_profiler)
+        if accumulators is None:
+            return partial
+        for name, accumulator in accumulators.items():
+            accumulator.merge(partial[name])
+        return accumulators
+
+    def analyze(self, texts, pbar=None, workers=1, chunk_size=None):
+        """对全部代码文本进行单次遍历分析
+
+        Args:
+            texts: 代码文本序列（如DataFrame的text列）
+            pbar: 可选的tqdm进度条，按行数推进
+            workers: 并行进程数，大于1时按块分发到进程池
+            chunk_size: 每个任务的行数，为None时按进程数自动划分
+
+        Returns:
+            dict: 与各分析器输出格式一致的分析结果
+        """
+        texts = list(texts)
+        return self.collect_results(self.accumulate(texts, pbar, workers, chunk_size), texts)
+
+    def accumulate(self, texts, pbar=None, workers=1, chunk_size=None, row_sink=None, profiler=None):
+        """对全部代码文本进行单次遍历分析，返回可继续合并的累加器
+
+        参数同analyze。
+
+        Args:
+            row_sink: 可选的逐行指标输出（提供write_rows方法，如utils.row_metrics_writer.RowMetricsWriter），
+                逐行指标按行顺序分批写入
+            profiler: 可选的StageProfiler（utils.profiler），记录各分析器子阶段的耗时和计数器，
+                多进程分析时合并各工作进程的记录
+        """
+        texts = list(texts)
+        total_rows = len(texts)
+
+        if (workers <= 1 or total_rows == 0) and row_sink is not None:
+            print(f"\nAnalyzing {total_rows} records in a single pass...")
+            # 分块分析并及时写出逐行指标，结果与整体分析一致
+            accumulators = self.create_accumulators()
+            for start in range(0, total_rows, ROW_METRICS_BATCH_SIZE):
+                partial = self.analyze_chunk(texts[start:start + ROW_METRICS_BATCH_SIZE], start, pbar,
+                                             row_metrics=True, profiler=profiler)
+                self._merge_partial(accumulators, partial, row_sink)
+        elif workers <= 1 or total_rows == 0:
+            print(f"\nAnalyzing {total_rows} records in a single pass...")
+            accumulators = self.analyze_chunk(texts, 0, pbar, profiler=profiler)
+        else:
+            print(f"\nAnalyzing {total_rows} records with {workers} worker processes...")
+            if chunk_size is None:
+                # 每个进程分到多个任务以平衡长短不一的文件
+                chunk_size = max(1, math.ceil(total_rows / (workers * 4)))
+            chunks = (texts[start:start + chunk_size] for start in range(0, total_rows, chunk_size))
+            accumulators = self._analyze_parallel(chunks, pbar, workers, streaming=False, row_sink=row_sink,
+                                                  profiler=profiler)
+
+        return accumulators
+
+    def analyze_stream(self, chunks, pbar=None, workers=1):
+        """流式分析分块读入的代码文本，内存占用与数据集大小无关
+
+        均值和标准差使用Welford在线算法，中位数和分位数由可合并的分位数草图估计。
+        块级重复的指纹覆盖全部行，但不保留原始文本，重复块不附带示例代码。
+
+        Args:
+            chunks: 代码文本块的可迭代对象（如pd.read_csv(chunksize=...)逐块产出的text列）
+            pbar: 可选的tqdm进度条，按行数推进
+            workers: 并行进程数，大于1时各块分发到进程池
+
+        Returns:
+            dict: 与各分析器输出格式一致的分析结果
+        """
+        return self.collect_results(self.accumulate_stream(chunks, pbar, workers))
+
+    def accumulate_stream(self, chunks, pbar=None, workers=1, streaming=True, start=0, row_sink=None,
+                          profiler=None):
+        """逐块分析代码文本，返回可继续合并的累加器
+
+        Args:
+            chunks: 代码文本块的可迭代对象
+            pbar: 可选的tqdm进度条，按行数推进
+            workers: 并行进程数，大于1时各块分发到进程池
+            streaming: 是否使用内存有界的流式累加器（需与待合并的累加器一致）
+            start: 第一块第一行在整个数据集中的行号（向已有结果追加数据时使用）
+            row_sink: 可选的逐行指标输出，每块的逐行指标合并时按行顺序写入
+            profiler: 可选的StageProfiler，记录各分析器子阶段的耗时和计数器
+
+        Returns:
+            dict: 各分析器的累加器
+        """
+        mode = "streaming" if streaming else "chunked"
+        if workers <= 1:
+            print(f"\nAnalyzing records in {mode} mode...")
+            accumulators = self.create_accumulators(streaming)
+            for texts in chunks:
+                partial = self.analyze_chunk(texts, start, pbar, streaming, row_metrics=row_sink is not None,
+                                             profiler=profiler)
+                self._merge_partial(accumulators, partial, row_sink)
+                start += len(texts)
+        else:
+            print(f"\nAnalyzing records in {mode} mode with {workers} worker processes...")
+            accumulators = self._analyze_parallel(chunks, pbar, workers, streaming, start, row_sink, profiler)
+            if accumulators is None:
+                accumulators = self.create_accumulators(streaming)
+
+        return accumulators
+
+    def _analyze_parallel(self, chunks, pbar, workers, streaming, start=0, row_sink=None, profiler=None):
+        """在进程池中分块分析，并按行顺序合并部分结果（逐行指标同样按行顺序写入row_sink）
+
+        同时在途的任务数限制为进程数的两倍，使内存占用不随数据量增长。
+        提供profiler时每个任务使用一个新的剖析器，其记录随部分结果返回并合并到profiler。
+        """
+        accumulators = None
+        pending = deque()
+        row_metrics = row_sink is not None
+
+        def merge_oldest():
+            nonlocal accumulators
+            partial = pending.popleft().result()
+            if pbar is not None:
+                pbar.update(partial['length_stats'].total_files)
+            accumulators = self._merge_partial(accumulators, partial, row_sink, profiler)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            for texts in chunks:
+                texts = list(texts)
+                chunk_profiler = profiler.spawn() if profiler is not None else None
+                pending.append(executor.submit(_analyze_chunk_in_worker, texts, start, streaming, row_metrics,
+                                               chunk_profiler))
+                start += len(texts)
+                if len(pending) >= workers * 2:
+                    merge_oldest()
+            # 按提交顺序合并，保证与串行分析的并列排序一致
+            while pending:
+                merge_oldest()
+
+        return accumulators
+
+
+_worker_engine = None
+
+
+def _init_worker(engine):
+    """进程池初始化：每个工作进程持有一份分析引擎"""
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _analyze_chunk_in_worker(texts, start, streaming, row_metrics=False, profiler=None):
+    """在工作进程中分析一段代码文本，剖析器随部分结果返回"""
+    partial = _worker_engine.analyze_chunk(texts, start, streaming=streaming, row_metrics=row_metrics,
+                                           profiler=profiler)
+    if profiler is not None:
+        partial['profile'] = profiler
+    return partial
+
+
+def map_chunks(process, batches, workers=1, start=0):
+    """逐批调用process(texts, start)，按输入顺序产出结果
+
+    Args:
+        process: 处理一批代码文本的可序列化函数（如对象的绑定方法），工作进程中使用其副本
+        batches: (附带数据, 代码文本序列)的可迭代对象，附带数据（如该批的原始记录）留在主进程中原样返回
+        workers: 并行进程数，大于1时各批分发到进程池，同时在途的批数限制为进程数的两倍
+        start: 第一批第一行的行号
+
+    Yields:
+        tuple: (附带数据, 该批的处理结果)
+    """
+    if workers <= 1:
+        for payload, texts in batches:
+            texts = list(texts)
+            result = process(texts, start)
+            start += len(texts)
+            yield payload, result
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker, initargs=(process,)) as executor:
+        for payload, texts in batches:
+            texts = list(texts)
+            pending.append((payload, executor.submit(_process_chunk_in_worker, texts, start)))
+            start += len(texts)
+            if len(pending) >= workers * 2:
+                payload, future = pending.popleft()
+                yield payload, future.result()
+        while pending:
+            payload, future = pending.popleft()
+            yield payload, future.result()
+
+
+_worker_process = None
+
+
+def _init_chunk_worker(process):
+    """进程池初始化：每个工作进程持有一份逐批处理函数"""
+    global _worker_process
+    _worker_process = process
+
+
+def _process_chunk_in_worker(texts, start):
+    """在工作进程中处理一段代码文本"""
+    return _worker_process(texts, start)
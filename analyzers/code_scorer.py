@@ -6,7 +6,6 @@ See LICENSE file in the project root for license information.
 """
 
 """代码质量打分器"""
-import numpy as np
 from config.scoring_config import SCORING_CONFIG
 
 class CodeScorer:
@@ -135,6 +134,11 @@ class CodeScorer:
             blocks = duplication_stats['block_level']
             if len(blocks['top_blocks']) > metrics['max_identical_blocks']:
                 score *= 0.9
+        
+        # 评估跨文件近似重复
+        if 'cross_file' in duplication_stats:
+            if duplication_stats['cross_file']['duplicate_fraction'] > metrics['max_near_duplicate_ratio']:
+                score *= 0.7
                 
         return score
     
@@ -187,24 +191,25 @@ class CodeScorer:
             scores['entropy'] * weights['entropy']
         )
         
-        # 确定评级
-        if final_score >= 90:
-            grade = 'A'
-        elif final_score >= 80:
-            grade = 'B'
-        elif final_score >= 70:
-            grade = 'C'
-        elif final_score >= 60:
-            grade = 'D'
-        else:
-            grade = 'F'
-            
         return {
             'score': final_score,
-            'grade': grade,
+            'grade': self.grade(final_score),
             'dimension_scores': scores
         }
     
+    @staticmethod
+    def grade(final_score):
+        """根据最终得分确定评级"""
+        if final_score >= 90:
+            return 'A'
+        elif final_score >= 80:
+            return 'B'
+        elif final_score >= 70:
+            return 'C'
+        elif final_score >= 60:
+            return 'D'
+        return 'F'
+    
     def score_codebase(self, analysis_results):
         """对代码库进行打分
         
@@ -225,3 +230,13 @@ class CodeScorer:
         
         # 计算最终得分
         return self.calculate_final_score(scores)
+
+
+def print_score_summary(scores, title=""):
+    """打印评分摘要"""
+    print(f"\n=== {title} ===")
+    print(f"Final Score: {scores['score']:.1f}")
+    print(f"Grade: {scores['grade']}")
+    print("\nDimension Scores:")
+    for dim, score in scores['dimension_scores'].items():
+        print(f"  {dim}: {score:.1f}")
@@ -7,11 +7,16 @@ See LICENSE file in the project root for license information.
 
 """代码复杂度分析器"""
 import numpy as np
-from utils.code_utils import preprocess_code, is_comment_line, is_blank_line
+from utils.code_utils import preprocess_code, is_blank_line
+from utils.verilog_lexer import lex
+from utils.stats_utils import create_summary
 
 class ComplexityAnalyzer:
     def analyze_code_complexity(self, df):
-        """分析代码复杂度"""
+        """分析代码复杂度
+
+        注释行为非空白、但去除注释（utils.verilog_lexer）后只剩空白的行，块注释内部的行都是注释行。
+        """
         blank_lines_ratio = []
         comment_lines_ratio = []
         code_lines_ratio = []
@@ -23,7 +28,8 @@ class ComplexityAnalyzer:
 
             total_lines = len(lines)
             blank_count = sum(1 for line in lines if is_blank_line(line))
-            comment_count = sum(1 for line in lines if is_comment_line(line))
+            # 去除注释后的空白行包含原有的空白行
+            comment_count = sum(1 for line in lex(code).code_lines() if is_blank_line(line)) - blank_count
             code_count = total_lines - blank_count - comment_count
 
             blank_lines_ratio.append(blank_count / total_lines if total_lines > 0 else 0)
@@ -50,3 +56,41 @@ class ComplexityAnalyzer:
                 'max': float(np.max(code_lines_ratio))
             }
         }
+
+
+class ComplexityAccumulator:
+    """复杂度统计累加器，从逐行分析记录中汇总行类型比例"""
+
+    def __init__(self, streaming=False):
+        """初始化累加器
+        
+        Args:
+            streaming: 流式模式下使用内存有界的在线统计代替保存全部比例
+        """
+        self.blank_lines_ratio = create_summary(streaming)
+        self.comment_lines_ratio = create_summary(streaming)
+        self.code_lines_ratio = create_summary(streaming)
+
+    def add(self, record):
+        """累加一条记录"""
+        if not record['valid']:
+            return
+
+        total_lines = record['line_count']
+        self.blank_lines_ratio.add(record['blank_count'] / total_lines if total_lines > 0 else 0)
+        self.comment_lines_ratio.add(record['comment_count'] / total_lines if total_lines > 0 else 0)
+        self.code_lines_ratio.add(record['code_count'] / total_lines if total_lines > 0 else 0)
+
+    def merge(self, other):
+        """合并另一个累加器的部分结果（需按行顺序合并）"""
+        self.blank_lines_ratio.merge(other.blank_lines_ratio)
+        self.comment_lines_ratio.merge(other.comment_lines_ratio)
+        self.code_lines_ratio.merge(other.code_lines_ratio)
+
+    def result(self):
+        """生成与ComplexityAnalyzer一致的统计结果"""
+        return {
+            'blank_lines_ratio': self.blank_lines_ratio.summary(median=False),
+            'comment_lines_ratio': self.comment_lines_ratio.summary(median=False),
+            'code_lines_ratio': self.code_lines_ratio.summary(median=False)
+        }
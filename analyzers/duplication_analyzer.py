@@ -6,10 +6,46 @@ See LICENSE file in the project root for license information.
 """
 
 """代码重复分析器"""
-from collections import defaultdict
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from hashlib import blake2b
+import heapq
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from utils.code_utils import preprocess_code, normalize_line
+from utils.verilog_lexer import lex
 from config.analysis_config import DUPLICATION_CONFIG
+from utils.stats_utils import create_summary, describe_counts_summary
+
+# k-gram指纹的组合系数（uint64按2^64回绕）
+KGRAM_BASE = np.uint64(0x9E3779B97F4A7C15)
+
+# 重复块报告中列出的出现位置数
+MAX_BLOCK_LOCATIONS = 5
+
+
+def normalize_code_lines(code_lines):
+    """去除注释（utils.verilog_lexer）后逐行标准化，注释行和空白行标准化为空字符串"""
+    if not code_lines:
+        return []
+    return [normalize_line(line) for line in lex('\n'.join(code_lines)).code_lines()]
+
+
+@lru_cache(maxsize=65536)
+def line_hash(line):
+    """标准化代码行的64位稳定哈希（跨进程、跨运行一致）"""
+    return int.from_bytes(blake2b(line.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def mix64(values):
+    """splitmix64混合函数，使k-gram哈希的最小值选取均匀"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
 
 class DuplicationAnalyzer:
     def __init__(self, config=None):
@@ -24,25 +60,30 @@ class DuplicationAnalyzer:
         block_config = self.config['block_analysis']
         self.min_block_size = block_config['min_block_size']
         self.max_block_size = block_config['max_block_size']
-        self.block_sample_size = block_config['sample_size']
-        self.min_file_lines = block_config['min_file_lines']
+        self.winnow_window = block_config['winnow_window']
         
         # 设置行分析参数
         line_config = self.config['line_analysis']
         self.min_line_length = line_config['min_line_length']
         self.high_duplication_threshold = line_config['high_duplication_threshold']
-        
-        # 设置通用参数
-        self.random_seed = self.config['general']['random_seed']
 
-    def find_line_duplicates(self, code_lines):
-        """查找代码中的行级重复"""
+    def find_line_duplicates(self, code_lines, normalized_lines=None):
+        """查找代码中的行级重复
+        
+        Args:
+            code_lines: 代码行列表
+            normalized_lines: 预先标准化的代码行（normalize_code_lines），与code_lines一一对应，为None时现场计算
+        """
         line_patterns = defaultdict(list)
         original_lines = {}  # 保存原始行用于展示
+        if normalized_lines is None:
+            normalized_lines = normalize_code_lines(code_lines)
         
         for i, line in enumerate(code_lines):
             if len(line) > self.min_line_length:  # 忽略很短的行
-                normalized = normalize_line(line)
+                normalized = normalized_lines[i]
+                if not normalized:  # 注释行和空白行不参与行级重复
+                    continue
                 line_patterns[normalized].append(i)
                 if normalized not in original_lines:
                     original_lines[normalized] = line
@@ -65,156 +106,277 @@ class DuplicationAnalyzer:
         
         return duplication_ratio, len(duplicates), duplicates
 
-    def find_duplicate_blocks(self, code_lines):
-        """使用滑动窗口和哈希方法查找重复代码块"""
-        block_hashes = defaultdict(list)
-        duplicate_blocks = []
-        
-        # 计算步长（跳过一些行以提高性能）
-        step = max(1, len(code_lines) // 1000)  # 对于大文件使用更大的步长
-        
-        # 对不同大小的块进行查找
-        for block_size in range(self.min_block_size, min(self.max_block_size + 1, len(code_lines))):
-            # 使用滑动窗口计算每个块的哈希值，使用步长来跳过一些位置
-            for i in range(0, len(code_lines) - block_size + 1, step):
-                block = code_lines[i:i + block_size]
-                # 标准化并连接块中的行
-                normalized_block = '\n'.join(normalize_line(line) for line in block)
-                block_hash = hash(normalized_block)
-                
-                # 记录相同哈希值的块位置
-                block_hashes[block_hash].append((i, block))
-        
-        # 收集重复块信息
-        seen_positions = set()
-        for block_hash, positions in block_hashes.items():
-            if len(positions) > 1:  # 找到重复块
-                # 检查是否与已找到的块重叠
-                current_positions = set(range(pos[0], pos[0] + len(pos[1])) 
-                                     for pos in positions)
-                
-                # 如果这个块与已找到的块没有重叠，添加到结果中
-                if not any(pos in seen_positions for positions_set in current_positions 
-                          for pos in positions_set):
-                    duplicate_blocks.append({
-                        'lines': [pos[0] for pos in positions],
-                        'size': len(positions[0][1]),
-                        'count': len(positions),
-                        'example': '\n'.join(positions[0][1])
-                    })
-                    # 更新已见过的位置
-                    for positions_set in current_positions:
-                        seen_positions.update(positions_set)
-        
-        return duplicate_blocks
+    def winnow(self, normalized_lines):
+        """使用winnowing（MOSS）算法选取一行代码文本的指纹
+        
+        以min_block_size个连续非空标准化行为一个k-gram，在每winnow_window个连续k-gram中
+        选取哈希最小的一个作为指纹。采用稳健winnowing：上一个指纹仍在窗口内且仍为最小值时不重新选取，
+        避免重复行较多的区域产生大量指纹。长度不少于min_block_size + winnow_window - 1
+        个非空行的相同代码段保证至少共享一个指纹。
+        
+        Args:
+            normalized_lines: 标准化后的代码行
+            
+        Returns:
+            tuple: (指纹哈希, 起始行号, 结束行号(不含))，均为numpy数组
+        """
+        positions = [i for i, line in enumerate(normalized_lines) if line]
+        kgram_count = len(positions) - self.min_block_size + 1
+        if kgram_count <= 0:
+            empty = np.empty(0, dtype=np.int64)
+            return np.empty(0, dtype=np.uint64), empty, empty
+        
+        line_hashes = np.fromiter((line_hash(normalized_lines[i]) for i in positions),
+                                  dtype=np.uint64, count=len(positions))
+        kgrams = line_hashes[:kgram_count].copy()
+        for offset in range(1, self.min_block_size):
+            kgrams = kgrams * KGRAM_BASE + line_hashes[offset:offset + kgram_count]
+        kgrams = mix64(kgrams)
+        
+        window = min(self.winnow_window, kgram_count)
+        windows = sliding_window_view(kgrams, window)
+        minimums = windows.min(axis=1).tolist()
+        # 每个窗口中最右侧的最小值
+        rightmost = (np.arange(len(windows)) + (window - 1 - np.argmin(windows[:, ::-1], axis=1))).tolist()
+        values = kgrams.tolist()
+        selected = []
+        for start, minimum in enumerate(minimums):
+            if selected and selected[-1] >= start and values[selected[-1]] == minimum:
+                continue
+            selected.append(rightmost[start])
+        selected = np.asarray(selected, dtype=np.int64)
+        
+        positions = np.asarray(positions, dtype=np.int64)
+        return kgrams[selected], positions[selected], positions[selected + self.min_block_size - 1] + 1
+
+    def create_accumulator(self, streaming=False):
+        """创建重复度统计累加器"""
+        return DuplicationAccumulator(self, streaming)
 
     def analyze_code_duplication(self, df):
         """分析代码重复情况"""
-        # 设置随机种子
-        np.random.seed(self.random_seed)
+        accumulator = self.create_accumulator()
         
-        # 第一阶段：对所有文件进行行级重复分析
-        print("\nAnalyzing line-level duplications for all files...")
-        line_duplication_ratios = []
-        line_duplicate_patterns = []
-        all_line_duplicates = []
-        
-        for code in df['text']:
-            processed_lines = preprocess_code(code)
-            ratio, num_patterns, patterns = self.find_line_duplicates(processed_lines)
-            line_duplication_ratios.append(ratio)
-            line_duplicate_patterns.append(num_patterns)
-            if patterns:
-                all_line_duplicates.extend(patterns.items())
-        
-        # 第二阶段：对抽样文件进行块级重复分析
-        print(f"\nAnalyzing block-level duplications for {self.block_sample_size} sample files...")
-        sampled_indices = np.random.choice(len(df), self.block_sample_size, replace=False)
-        df_sample = df.iloc[sampled_indices]
-        
-        all_block_duplicates = []
-        for code in df_sample['text']:
+        print("\nAnalyzing line-level and block-level duplications for all files...")
+        for index, code in enumerate(df['text']):
             processed_lines = preprocess_code(code)
-            if len(processed_lines) >= self.min_file_lines:  # 只对较长的文件进行块分析
-                block_duplicates = self.find_duplicate_blocks(processed_lines)
-                if block_duplicates:
-                    all_block_duplicates.extend(block_duplicates)
+            normalized_lines = normalize_code_lines(processed_lines)
+            ratio, num_patterns, patterns = self.find_line_duplicates(processed_lines, normalized_lines)
+            accumulator.add_line_duplicates(index, ratio, num_patterns, patterns)
+            accumulator.add_fingerprints(index, *self.winnow(normalized_lines))
+        
+        return accumulator.result(list(df['text']))
+
+
+class DuplicationAccumulator:
+    """重复度统计累加器，从逐行分析记录中汇总行级和块级重复"""
+
+    TOP_K = 5
+
+    def __init__(self, analyzer, streaming=False):
+        """初始化累加器
+        
+        Args:
+            analyzer: 提供配置的DuplicationAnalyzer
+            streaming: 流式模式下使用内存有界的在线统计代替保存全部重复率
+        """
+        self.analyzer = analyzer
+        self.line_duplication_ratios = create_summary(streaming)
+        self.line_duplicate_patterns = Counter()
+        self.high_duplication_count = 0
+        self.total_files = 0
         
         # 分析重复模式类型
-        pattern_types = {
+        self.pattern_types = {
             'variable': 0,  # 变量名变化
             'number': 0,    # 数值变化
             'mixed': 0,     # 混合变化
             'other': 0      # 其他
         }
         
-        # 统计最常见的重复模式
-        pattern_frequency = defaultdict(int)
-        for pattern, info in all_line_duplicates:
-            pattern_frequency[pattern] += info['count']
-            
+        # 最常见重复模式的小顶堆，堆键保证与稳定排序一致的并列顺序
+        self.top_patterns = []
+        # 全部行的winnowing指纹，按行号顺序紧凑保存（每个指纹32字节）；语料级克隆检测需要全部指纹，
+        # 流式模式下也随行数线性增长，并保存在--update的状态文件中
+        self.fingerprint_hashes = array('Q')
+        self.fingerprint_rows = array('q')
+        self.fingerprint_starts = array('q')
+        self.fingerprint_ends = array('q')
+
+    def add(self, record, index):
+        """累加第index行的分析记录
+        
+        Args:
+            record: 逐行分析记录
+            index: 行号
+        """
+        self.add_line_duplicates(index, record['duplication_ratio'],
+                                 record['duplicate_pattern_count'], record['duplicate_patterns'])
+        if record['fingerprints'] is not None:
+            self.add_fingerprints(index, *record['fingerprints'])
+
+    def add_line_duplicates(self, index, ratio, num_patterns, patterns):
+        """累加一个文件的行级重复结果"""
+        self.line_duplication_ratios.add(ratio)
+        self.line_duplicate_patterns[num_patterns] += 1
+        self.total_files += 1
+        if ratio >= self.analyzer.high_duplication_threshold:
+            self.high_duplication_count += 1
+        
+        for order, (pattern, info) in enumerate(patterns.items()):
             # 判断模式类型
             if 'VAR' in pattern and ('BIN' in pattern or 'HEX' in pattern or 'DEC' in pattern or 'NUM' in pattern):
-                pattern_types['mixed'] += 1
+                self.pattern_types['mixed'] += 1
             elif 'VAR' in pattern:
-                pattern_types['variable'] += 1
+                self.pattern_types['variable'] += 1
             elif 'BIN' in pattern or 'HEX' in pattern or 'DEC' in pattern or 'NUM' in pattern:
-                pattern_types['number'] += 1
+                self.pattern_types['number'] += 1
             else:
-                pattern_types['other'] += 1
+                self.pattern_types['other'] += 1
+            
+            self._push(self.top_patterns, (info['count'], -index, -order),
+                       {'pattern': pattern, 'example': info['original'], 'count': info['count']})
+
+    def add_fingerprints(self, index, hashes, starts, ends):
+        """记录第index行的winnowing指纹"""
+        self.fingerprint_hashes.frombytes(hashes.astype(np.uint64).tobytes())
+        self.fingerprint_rows.frombytes(np.full(len(hashes), index, dtype=np.int64).tobytes())
+        self.fingerprint_starts.frombytes(starts.astype(np.int64).tobytes())
+        self.fingerprint_ends.frombytes(ends.astype(np.int64).tobytes())
+
+    def merge(self, other):
+        """合并另一个累加器的部分结果（需按行顺序合并）"""
+        self.line_duplication_ratios.merge(other.line_duplication_ratios)
+        self.line_duplicate_patterns.update(other.line_duplicate_patterns)
+        self.high_duplication_count += other.high_duplication_count
+        self.total_files += other.total_files
+        for pattern_type, count in other.pattern_types.items():
+            self.pattern_types[pattern_type] += count
+        for key, item in other.top_patterns:
+            self._push(self.top_patterns, key, item)
+        self.fingerprint_hashes.extend(other.fingerprint_hashes)
+        self.fingerprint_rows.extend(other.fingerprint_rows)
+        self.fingerprint_starts.extend(other.fingerprint_starts)
+        self.fingerprint_ends.extend(other.fingerprint_ends)
+
+    def _push(self, heap, key, item):
+        """将元素压入容量为TOP_K的小顶堆"""
+        if len(heap) < self.TOP_K:
+            heapq.heappush(heap, (key, item))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, item))
+
+    def find_clone_classes(self):
+        """根据指纹倒排索引查找文件内和跨文件的克隆类
+        
+        指纹按哈希排序后即为倒排索引，出现两次及以上的指纹为共享指纹。
+        同一行中相邻（之间没有未共享的指纹）的共享指纹先连成一段，遇到段内已有的指纹时断开，以区分文件内的
+        周期性重复；winnowing选取的相邻指纹相距不超过winnow_window个k-gram，之间可能隔有不被任何指纹覆盖的行，
+        因此不按行号是否相接判断；
+        再在相邻两个指纹并非总是一起出现处拆开（该相邻对的出现次数少于其中任一指纹的出现次数），
+        使范围不同的重复段在共享部分上归为同一克隆类。指纹序列相同的克隆段归为同一克隆类。
+        
+        Returns:
+            tuple: (克隆类字典{指纹序列: [(行号, 起始行, 行数), ...]}, 共享指纹数)
+        """
+        hashes = np.frombuffer(self.fingerprint_hashes, dtype=np.uint64)
+        if len(hashes) == 0:
+            return {}, 0
+        _, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+        occurrences = counts[inverse]
+        shared = np.flatnonzero(occurrences > 1)
+        
+        indices = shared.tolist()
+        fingerprints = hashes[shared].tolist()
+        rows = np.frombuffer(self.fingerprint_rows, dtype=np.int64)[shared].tolist()
+        starts = np.frombuffer(self.fingerprint_starts, dtype=np.int64)[shared].tolist()
+        ends = np.frombuffer(self.fingerprint_ends, dtype=np.int64)[shared].tolist()
+        fingerprint_counts = dict(zip(fingerprints, occurrences[shared].tolist()))
+        
+        # 第一遍：同一行中相邻、互不重复的共享指纹连成的段（指纹在fingerprints中的下标区间）
+        runs = []
+        run_members = set()
+        run_begin = 0
+        for position, (fingerprint, row, index) in enumerate(zip(fingerprints, rows, indices)):
+            if position > run_begin and (row != rows[position - 1] or index != indices[position - 1] + 1
+                                         or fingerprint in run_members):
+                runs.append((run_begin, position))
+                run_members = set()
+                run_begin = position
+            run_members.add(fingerprint)
+        if fingerprints:
+            runs.append((run_begin, len(fingerprints)))
+        
+        # 各相邻指纹对的出现次数，少于其中任一指纹的出现次数时两者并非总是一起出现
+        pair_counts = Counter(
+            (fingerprints[position], fingerprints[position + 1])
+            for begin, end in runs for position in range(begin, end - 1)
+        )
         
-        # 获取最常见的重复模式
-        top_patterns = sorted(all_line_duplicates, key=lambda x: x[1]['count'], reverse=True)[:5]
+        classes = defaultdict(list)
+        
+        def add_segment(begin, end):
+            locations = classes[tuple(fingerprints[begin:end])]
+            row, start = rows[begin], starts[begin]
+            # 同一行中与上一次出现重叠的克隆段不重复计数
+            if not locations or locations[-1][0] != row or locations[-1][1] + locations[-1][2] <= start:
+                locations.append((row, start, ends[end - 1] - start))
+        
+        # 第二遍：在并非总是一起出现的相邻指纹之间拆开
+        for begin, end in runs:
+            segment_begin = begin
+            for position in range(begin, end - 1):
+                first, second = fingerprints[position], fingerprints[position + 1]
+                pair_count = pair_counts[first, second]
+                if pair_count != fingerprint_counts[first] or pair_count != fingerprint_counts[second]:
+                    add_segment(segment_begin, position + 1)
+                    segment_begin = position + 1
+            add_segment(segment_begin, end)
+        
+        return {key: locations for key, locations in classes.items() if len(locations) > 1}, len(shared)
+
+    def result(self, texts=None):
+        """生成与DuplicationAnalyzer一致的统计结果
+        
+        Args:
+            texts: 可选的全部代码文本（按行号索引），提供时为重复块补充示例代码
+        """
+        analyzer = self.analyzer
         
-        # 获取最大的重复块
-        top_blocks = sorted(all_block_duplicates, 
-                          key=lambda x: x['size'] * (x['count'] - 1), 
-                          reverse=True)[:5]
+        # 汇总全量克隆类，取重复行数最多的重复块
+        clone_classes, shared_fingerprints = self.find_clone_classes()
+        # 属于报告中某个克隆类的行（共享指纹但未形成克隆类的行不计入）
+        rows_with_clones = len({location[0] for locations in clone_classes.values() for location in locations})
+        top_blocks = []
+        for locations in clone_classes.values():
+            row, start, size = locations[0]
+            self._push(top_blocks, (size * (len(locations) - 1), -row, -start), {
+                'size': size,
+                'count': len(locations),
+                'files': len({location[0] for location in locations}),
+                'locations': [[location[0], location[1]] for location in locations[:MAX_BLOCK_LOCATIONS]],
+                'example': '\n'.join(texts[row].split('\n')[start:start + size]) if texts is not None else None
+            })
+        total_fingerprints = len(self.fingerprint_hashes)
         
         return {
             'line_level': {
-                'ratios': {
-                    'mean': float(np.mean(line_duplication_ratios)),
-                    'std': float(np.std(line_duplication_ratios)),
-                    'min': float(np.min(line_duplication_ratios)),
-                    'max': float(np.max(line_duplication_ratios)),
-                    'median': float(np.median(line_duplication_ratios))
-                },
-                'patterns': {
-                    'mean': float(np.mean(line_duplicate_patterns)),
-                    'std': float(np.std(line_duplicate_patterns)),
-                    'min': float(np.min(line_duplicate_patterns)),
-                    'max': float(np.max(line_duplicate_patterns)),
-                    'median': float(np.median(line_duplicate_patterns))
-                },
-                'pattern_types': pattern_types,
-                'top_patterns': [
-                    {
-                        'pattern': pattern,
-                        'example': info['original'],
-                        'count': info['count']
-                    }
-                    for pattern, info in top_patterns
-                ],
-                'high_duplication_count': sum(1 for r in line_duplication_ratios 
-                                            if r >= self.high_duplication_threshold),
-                'total_files': len(line_duplication_ratios)
+                'ratios': self.line_duplication_ratios.summary(),
+                'patterns': describe_counts_summary(self.line_duplicate_patterns),
+                'pattern_types': dict(self.pattern_types),
+                'top_patterns': [item for _, item in sorted(self.top_patterns, key=lambda x: x[0], reverse=True)],
+                'high_duplication_count': self.high_duplication_count,
+                'total_files': self.total_files
             },
             'block_level': {
-                'total_blocks': len(all_block_duplicates),
-                'top_blocks': [
-                    {
-                        'size': block['size'],
-                        'count': block['count'],
-                        'example': block['example']
-                    }
-                    for block in top_blocks
-                ],
-                'sample_size': self.block_sample_size,
+                'total_blocks': len(clone_classes),
+                'top_blocks': [item for _, item in sorted(top_blocks, key=lambda x: x[0], reverse=True)],
+                'total_fingerprints': total_fingerprints,
+                'shared_fingerprint_ratio': shared_fingerprints / total_fingerprints if total_fingerprints > 0 else 0.0,
+                'rows_with_clones': rows_with_clones,
                 'config': {
-                    'min_block_size': self.min_block_size,
-                    'max_block_size': self.max_block_size,
-                    'min_file_lines': self.min_file_lines
+                    'min_block_size': analyzer.min_block_size,
+                    'winnow_window': analyzer.winnow_window
                 }
             }
         }
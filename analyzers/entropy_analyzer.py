@@ -6,10 +6,29 @@ See LICENSE file in the project root for license information.
 """
 
 """Verilog代码熵分析器"""
+import math
 import numpy as np
-from collections import Counter, defaultdict
+from collections import Counter
 import re
 from config.analysis_config import ENTROPY_CONFIG
+from utils.verilog_lexer import lex
+from utils.stats_utils import create_summary
+
+# 可以出现在标识符中的字符，关键字前后不能是这些字符
+_WORD_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$')
+
+def window_fractions(window_profile):
+    """一个文件中低熵窗口和高熵窗口的比例
+
+    Args:
+        window_profile: EntropyAnalyzer.window_profile的结果
+
+    Returns:
+        tuple: (低熵窗口比例, 高熵窗口比例)
+    """
+    windows = window_profile['windows']
+    return window_profile['low_entropy_windows'] / windows, window_profile['high_entropy_windows'] / windows
+
 
 class EntropyAnalyzer:
     def __init__(self, config=None):
@@ -22,6 +41,12 @@ class EntropyAnalyzer:
         self.block_weights = self.config['block_weights']
         self.window_size = self.config['window_size']
         self.thresholds = self.config['thresholds']
+        # 滑动窗口熵的增量更新用到的w*log2(w)和计数增量表
+        self.weight_logs = {
+            block_type: weight * math.log2(weight) if weight > 0 else 0.0
+            for block_type, weight in self.block_weights.items()
+        }
+        self.count_log_deltas = []
         
         # 编译正则表达式
         self.patterns = {
@@ -63,6 +88,44 @@ class EntropyAnalyzer:
             'struct': re.compile(r'\bstruct\b'),
         }
         
+        # 关键字表：大部分代码块由一个关键字直接确定，
+        # 其余代码块在该关键字出现时用原正则关键字之后的部分在掩码文本上做守卫匹配
+        self.keyword_blocks = {
+            'always_ff': 'always_ff',
+            'always_comb': 'always_comb',
+            'assign': 'assign',
+            'case': 'case', 'casex': 'case', 'casez': 'case',
+            'if': 'if_else', 'else': 'if_else',
+            'input': 'port_def', 'output': 'port_def', 'inout': 'port_def',
+            'parameter': 'parameter_def',
+            'localparam': 'localparameter',
+            'function': 'function_def',
+            'task': 'task_def',
+            'generate': 'generate',
+            'initial': 'initial',
+            'assert': 'assert',
+            'property': 'property',
+            'typedef': 'typedef',
+            'enum': 'enum',
+            'struct': 'struct',
+        }
+        self.guarded_keywords = {
+            'always': ('always_posedge', 'always_negedge'),
+            'reg': ('reg_def',),
+            'wire': ('wire_def',),
+            'logic': ('logic_def',),
+            'module': ('module_def',),
+        }
+        self.guard_patterns = {
+            block_type: re.compile(self.patterns[block_type].pattern[len(r'\b') + len(keyword):])
+            for keyword, block_types in self.guarded_keywords.items()
+            for block_type in block_types
+        }
+        # 全部关键字的字面量选择（长的在前），正则引擎可以直接查找候选关键字；
+        # 关键字前的单词边界在扫描循环中检查，比以\b开头快一个数量级
+        keywords = sorted(list(self.keyword_blocks) + list(self.guarded_keywords), key=len, reverse=True)
+        self.keyword_scanner = re.compile('(?:' + '|'.join(keywords) + r')(?![\w$])')
+        
         # 代码块类型映射
         self.block_mapping = {
             'Sequential': ['always_ff', 'always_posedge', 'always_negedge'],
@@ -74,20 +137,159 @@ class EntropyAnalyzer:
             'Others': ['typedef', 'enum', 'struct']
         }
     
-    def analyze_block_entropy(self, code_text):
+    def scan_blocks(self, code_text, tokens=None):
+        """按出现位置扫描注释和字符串之外的代码块
+        
+        关键字直接确定的代码块在关键字处出现一次；需要守卫的代码块只在其关键字处，
+        用原正则关键字之后的部分在掩码文本（注释和字符串已替换，位置不变）上匹配，
+        同一代码块的匹配互不重叠（与在整个文本上finditer的计数一致）。
+        
+        Args:
+            code_text: 代码文本
+            tokens: 可选的预先扫描的记号区间（utils.verilog_lexer.lex的结果），为None时现场扫描
+            
+        Returns:
+            tuple: (每次出现所在的行号列表（升序）, 对应的代码块类型列表, 总行数)
+        """
+        if tokens is None:
+            tokens = lex(code_text)
+        masked_text = tokens.masked_text()
+        keyword_blocks = self.keyword_blocks
+        lines = []
+        blocks = []
+        guard_ends = {}
+        line = 0
+        position = 0
+        for match in self.keyword_scanner.finditer(masked_text):
+            start = match.start()
+            # 关键字前的单词边界（数字的数值部分只含十六进制字符，不会构成关键字）
+            if start and masked_text[start - 1] in _WORD_CHARS:
+                continue
+            line += masked_text.count('\n', position, start)
+            position = start
+            block_type = keyword_blocks.get(match.group())
+            if block_type is not None:
+                lines.append(line)
+                blocks.append(block_type)
+                continue
+            for block_type in self.guarded_keywords[match.group()]:
+                if start < guard_ends.get(block_type, 0):
+                    continue
+                guard = self.guard_patterns[block_type].match(masked_text, match.end())
+                if guard:
+                    guard_ends[block_type] = guard.end()
+                    lines.append(line)
+                    blocks.append(block_type)
+        return lines, blocks, masked_text.count('\n') + 1
+
+    def _block_counts(self, blocks):
+        """代码块类型列表的计数（顺序与self.patterns一致）"""
+        block_counts = dict.fromkeys(self.patterns, 0)
+        for block_type, count in Counter(blocks).items():
+            block_counts[block_type] = count
+        return block_counts
+
+    def window_profile(self, block_lines, blocks, line_count):
+        """滑动窗口的代码块熵分布
+        
+        窗口为连续的window_size行，每次滑动一行；文件不足window_size行时整个文件为一个窗口。
+        滑动时只更新移出和移入窗口的代码块：维护加权计数x_b = c_b * w_b的总和W与S = Σ x_b*log2(x_b)，
+        窗口熵为(log2(W) - S/W) / log2(代码块种类数)，与analyze_block_entropy的整体熵定义一致；
+        没有代码块的窗口熵为0。熵只在有代码块移入或移出时变化，因此只在这些位置计算，
+        总开销与代码块出现次数成线性，与文件行数无关。
+        
+        Args:
+            block_lines: 每次代码块出现所在的行号（升序）
+            blocks: 对应的代码块类型
+            line_count: 文件总行数
+            
+        Returns:
+            dict: 窗口数、低熵窗口数和高熵窗口数
+        """
+        window = max(1, min(self.window_size, line_count))
+        windows = line_count - window + 1
+        low_threshold = self.thresholds['low_entropy']
+        high_threshold = self.thresholds['high_entropy']
+        weights = self.block_weights
+        weight_logs = self.weight_logs
+        count_log_deltas = self._count_log_deltas(len(blocks))
+        log2 = math.log2
+        max_entropy = log2(len(weights))
+        
+        # x_b*log2(x_b) = c_b*w_b*log2(w_b) + w_b*c_b*log2(c_b)，计数加一时S增加w_b*log2(w_b) + w_b*Δ(c_b)
+        counts = dict.fromkeys(weights, 0)
+        total_weight = 0.0
+        weighted_log_sum = 0.0
+        low_windows = 0
+        high_windows = 0
+        occurrences = len(blocks)
+        entering = 0
+        leaving = 0
+        first = 0
+        while first < windows:
+            # 窗口[first, first + window)：移入此前尚未进入窗口的代码块，移出已离开窗口的代码块
+            end = first + window
+            while entering < occurrences and block_lines[entering] < end:
+                block_type = blocks[entering]
+                count = counts[block_type]
+                weight = weights[block_type]
+                weighted_log_sum += weight_logs[block_type] + weight * count_log_deltas[count]
+                total_weight += weight
+                counts[block_type] = count + 1
+                entering += 1
+            while leaving < occurrences and block_lines[leaving] < first:
+                block_type = blocks[leaving]
+                count = counts[block_type] - 1
+                weight = weights[block_type]
+                weighted_log_sum -= weight_logs[block_type] + weight * count_log_deltas[count]
+                total_weight -= weight
+                counts[block_type] = count
+                leaving += 1
+            
+            if entering > leaving and total_weight > 0:
+                entropy = (log2(total_weight) - weighted_log_sum / total_weight) / max_entropy
+            else:
+                entropy = 0.0
+            
+            # 下一个有代码块移入或移出的窗口之前，熵保持不变
+            following = windows
+            if entering < occurrences:
+                following = min(following, block_lines[entering] - window + 1)
+            if leaving < occurrences:
+                following = min(following, block_lines[leaving] + 1)
+            if entropy < low_threshold:
+                low_windows += following - first
+            elif entropy > high_threshold:
+                high_windows += following - first
+            first = following
+        
+        return {
+            'windows': windows,
+            'low_entropy_windows': low_windows,
+            'high_entropy_windows': high_windows,
+        }
+
+    def _count_log_deltas(self, max_count):
+        """计数c从c到c+1时c*log2(c)的增量表，至少覆盖0到max_count - 1，按需扩展"""
+        deltas = self.count_log_deltas
+        for count in range(len(deltas), max_count):
+            deltas.append((count + 1) * math.log2(count + 1) - (count * math.log2(count) if count else 0.0))
+        return deltas
+
+    def analyze_block_entropy(self, code_text, tokens=None):
         """分析代码块的熵
         
         Args:
             code_text: 代码文本
+            tokens: 可选的预先扫描的记号区间，为None时现场扫描
             
         Returns:
-            dict: 代码块熵分析结果
+            dict: 代码块熵分析结果，包含整体熵、代码块计数和滑动窗口熵分布
         """
         # 统计每种代码块的出现次数
-        block_counts = {
-            block_type: len(pattern.findall(code_text))
-            for block_type, pattern in self.patterns.items()
-        }
+        block_lines, blocks, line_count = self.scan_blocks(code_text, tokens)
+        block_counts = self._block_counts(blocks)
+        window_profile = self.window_profile(block_lines, blocks, line_count)
         
         # 计算总权重
         total_weight = sum(
@@ -99,6 +301,7 @@ class EntropyAnalyzer:
             return {
                 'entropy': 0,
                 'block_counts': block_counts,
+                'window_profile': window_profile,
             }
         
         # 计算每个块的加权频率
@@ -122,6 +325,7 @@ class EntropyAnalyzer:
         return {
             'entropy': normalized_entropy,
             'block_counts': block_counts,
+            'window_profile': window_profile,
         }
     
     def analyze_code_entropy(self, df):
@@ -135,15 +339,59 @@ class EntropyAnalyzer:
         """
         print("\nAnalyzing code entropy...")
         
-        # 初始化统计
-        all_block_counts = Counter()
-        all_entropies = []
-        
         # 分析每个文件
+        accumulator = self.create_accumulator()
         for code in df['text']:
-            result = self.analyze_block_entropy(code)
-            all_entropies.append(result['entropy'])
-            all_block_counts.update(result['block_counts'])
+            accumulator.add(self.analyze_block_entropy(code))
+        
+        return accumulator.result()
+
+    def create_accumulator(self, streaming=False):
+        """创建熵统计累加器"""
+        return EntropyAccumulator(self, streaming)
+
+
+class EntropyAccumulator:
+    """熵统计累加器，从逐行分析记录中汇总熵与代码块统计"""
+
+    def __init__(self, analyzer, streaming=False):
+        """初始化累加器
+        
+        Args:
+            analyzer: 提供配置和代码块映射的EntropyAnalyzer
+            streaming: 流式模式下使用内存有界的在线统计代替保存全部熵值
+        """
+        self.analyzer = analyzer
+        self.all_block_counts = Counter()
+        self.all_entropies = create_summary(streaming)
+        self.window_counts = Counter()
+        self.low_entropy_fractions = create_summary(streaming)
+        self.high_entropy_fractions = create_summary(streaming)
+
+    def add(self, record):
+        """累加一条记录（需包含entropy、block_counts和window_profile）"""
+        if record.get('valid') is False:
+            return
+        self.all_entropies.add(record['entropy'])
+        self.all_block_counts.update(record['block_counts'])
+        window_profile = record['window_profile']
+        self.window_counts.update(window_profile)
+        low_fraction, high_fraction = window_fractions(window_profile)
+        self.low_entropy_fractions.add(low_fraction)
+        self.high_entropy_fractions.add(high_fraction)
+
+    def merge(self, other):
+        """合并另一个累加器的部分结果（需按行顺序合并）"""
+        self.all_block_counts.update(other.all_block_counts)
+        self.all_entropies.merge(other.all_entropies)
+        self.window_counts.update(other.window_counts)
+        self.low_entropy_fractions.merge(other.low_entropy_fractions)
+        self.high_entropy_fractions.merge(other.high_entropy_fractions)
+
+    def result(self):
+        """生成与EntropyAnalyzer一致的统计结果"""
+        all_block_counts = self.all_block_counts
+        all_entropies = self.all_entropies
         
         # 计算每种代码块类型的总数
         block_type_counts = {
@@ -151,18 +399,17 @@ class EntropyAnalyzer:
                 all_block_counts[block]
                 for block in blocks
             )
-            for block_type, blocks in self.block_mapping.items()
+            for block_type, blocks in self.analyzer.block_mapping.items()
         }
         
+        # 全部文件的窗口合计，以及每个文件低熵和高熵窗口比例的分布
+        total_windows = self.window_counts['windows']
+        low_windows = self.window_counts['low_entropy_windows']
+        high_windows = self.window_counts['high_entropy_windows']
+        
         # 计算总体统计信息
         return {
-            'global_entropy_stats': {
-                'mean': float(np.mean(all_entropies)),
-                'std': float(np.std(all_entropies)),
-                'min': float(np.min(all_entropies)),
-                'max': float(np.max(all_entropies)),
-                'median': float(np.median(all_entropies))
-            },
+            'global_entropy_stats': all_entropies.summary(),
             'block_stats': {
                 'total_blocks': sum(all_block_counts.values()),
                 'block_counts': dict(all_block_counts),
@@ -172,5 +419,15 @@ class EntropyAnalyzer:
                     for block, count in all_block_counts.most_common(10)
                 ]
             },
-            'config': self.config
+            'window_stats': {
+                'window_size': self.analyzer.window_size,
+                'total_windows': total_windows,
+                'low_entropy_windows': low_windows,
+                'high_entropy_windows': high_windows,
+                'low_entropy_ratio': low_windows / total_windows if total_windows > 0 else 0,
+                'high_entropy_ratio': high_windows / total_windows if total_windows > 0 else 0,
+                'file_low_entropy_fraction': self.low_entropy_fractions.summary(),
+                'file_high_entropy_fraction': self.high_entropy_fractions.summary(),
+            },
+            'config': self.analyzer.config
         }
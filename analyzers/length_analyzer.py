@@ -6,8 +6,9 @@ See LICENSE file in the project root for license information.
 """
 
 """代码长度分析器"""
-import pandas as pd
+from collections import Counter
 from utils.code_utils import preprocess_code
+from utils.stats_utils import describe_counts, bin_histogram, StreamingSummary
 
 class LengthAnalyzer:
     def analyze_code_length(self, df):
@@ -60,7 +61,8 @@ class LengthAnalyzer:
             if has_long_line:
                 files_with_long_lines += 1
         
-        # 计算统计信息
+        # 计算统计信息（按需导入pandas，流式累加路径不依赖pandas）
+        import pandas as pd
         line_lengths = pd.Series(line_lengths)
         stats = line_lengths.describe()
         
@@ -76,3 +78,99 @@ class LengthAnalyzer:
             'long_lines_count': files_with_long_lines,
             'long_lines_ratio': files_with_long_lines / total_files
         }
+
+
+class LengthAccumulator:
+    """长度统计累加器，从逐行分析记录中汇总长度统计"""
+
+    def __init__(self, streaming=False):
+        """初始化累加器
+        
+        Args:
+            streaming: 流式模式下代码长度使用内存有界的在线统计和分位数草图
+        """
+        self.streaming = streaming
+        self.code_lengths = StreamingSummary() if streaming else Counter()
+        # 行数和行长度的取值范围有限，按取值计数即可保持精确且内存有界
+        self.line_counts = Counter()
+        self.line_lengths = Counter()
+        self.total_files = 0
+        self.files_with_long_lines = 0
+        self.total_long_lines = 0
+
+    def add(self, record):
+        """累加一条记录"""
+        self.total_files += 1
+        self.line_counts[record['line_count']] += 1
+        if not record['valid']:
+            return
+
+        if self.streaming:
+            self.code_lengths.add(record['text_length'])
+        else:
+            self.code_lengths[record['text_length']] += 1
+        self.line_lengths.update(record['line_lengths'])
+        self.total_long_lines += record['long_line_count']
+        if record['long_line_count'] > 0:
+            self.files_with_long_lines += 1
+
+    def merge(self, other):
+        """合并另一个累加器的部分结果"""
+        if self.streaming:
+            self.code_lengths.merge(other.code_lengths)
+        else:
+            self.code_lengths.update(other.code_lengths)
+        self.line_counts.update(other.line_counts)
+        self.line_lengths.update(other.line_lengths)
+        self.total_files += other.total_files
+        self.files_with_long_lines += other.files_with_long_lines
+        self.total_long_lines += other.total_long_lines
+
+    def length_histogram(self):
+        """返回代码长度直方图（流式模式下为分位数草图各桶的代表值）"""
+        if self.streaming:
+            items = self.code_lengths.sketch.items()
+        else:
+            items = sorted(self.code_lengths.items())
+        return {
+            'lengths': [length for length, _ in items],
+            'counts': [count for _, count in items]
+        }
+
+    def line_length_histogram(self):
+        """返回行长度直方图（按长度排序的取值及其次数）"""
+        lengths = sorted(self.line_lengths)
+        return {
+            'lengths': lengths,
+            'counts': [self.line_lengths[length] for length in lengths]
+        }
+
+    def result(self):
+        """生成与LengthAnalyzer一致的统计结果"""
+        line_length_stats = describe_counts(self.line_lengths)
+        length_histogram = self.length_histogram()
+        line_length_histogram = self.line_length_histogram()
+        if self.streaming:
+            length_distribution = self.code_lengths.describe()
+        else:
+            length_distribution = describe_counts(self.code_lengths)
+        return {
+            'length_distribution': length_distribution,
+            'line_count_distribution': describe_counts(self.line_counts),
+            'line_length_stats': {
+                'mean': line_length_stats['mean'],
+                'std': line_length_stats['std'],
+                'min': line_length_stats['min'],
+                'max': line_length_stats['max'],
+                'median': line_length_stats['50%'],
+                'total_files': self.total_files,
+                'files_with_long_lines': self.files_with_long_lines,
+                'total_long_lines': self.total_long_lines,
+                'long_lines_count': self.files_with_long_lines,
+                'long_lines_ratio': self.files_with_long_lines / self.total_files
+            },
+            # 报告中只保存供绘图直接使用的等宽分箱直方图，大小与数据量无关；
+            # 按取值的精确计数保留在累加器（--update的状态文件）中
+            'length_bins': bin_histogram(length_histogram['lengths'], length_histogram['counts']),
+            'line_length_bins': bin_histogram(line_length_histogram['lengths'], line_length_histogram['counts'])
+        }
@@ -0,0 +1,231 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+
+"""跨文件近似重复分析器（MinHash/LSH）"""
+from array import array
+from hashlib import blake2b
+import numpy as np
+from config.analysis_config import NEAR_DUPLICATE_CONFIG
+
+# 单次计算MinHash时处理的shingle数，限制中间矩阵的内存
+SHINGLE_BATCH_SIZE = 4096
+
+
+class NearDuplicateAnalyzer:
+    def __init__(self, config=None):
+        """初始化近似重复分析器
+
+        Args:
+            config: 分析配置，如果为None则使用默认配置
+        """
+        self.config = config or NEAR_DUPLICATE_CONFIG
+        self.num_perm = self.config['num_perm']
+        self.bands = self.config['bands']
+        self.rows_per_band = self.num_perm // self.bands
+        self.shingle_size = self.config['shingle_size']
+        self.similarity_threshold = self.config['similarity_threshold']
+
+        # 乘法移位哈希族：h(x) = (a * x + b) mod 2^64 的高32位，a为奇数
+        rng = np.random.default_rng(self.config['random_seed'])
+        self.hash_a = rng.integers(0, 2**64, size=self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self.hash_b = rng.integers(0, 2**64, size=self.num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, normalized_lines):
+        """计算连续标准化行组成的shingle的64位哈希
+
+        使用blake2b而非内置hash，保证不同进程和不同运行之间的结果一致。
+
+        Args:
+            normalized_lines: 参与比较的标准化代码行
+
+        Returns:
+            numpy.ndarray: 去重后的shingle哈希（uint64），没有有效行时为空数组
+        """
+        lines = [line for line in normalized_lines if line]
+        if not lines:
+            return np.empty(0, dtype=np.uint64)
+
+        size = min(self.shingle_size, len(lines))
+        hashes = {
+            int.from_bytes(blake2b('\n'.join(lines[i:i + size]).encode('utf-8'), digest_size=8).digest(), 'little')
+            for i in range(len(lines) - size + 1)
+        }
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, normalized_lines):
+        """计算一行代码文本的MinHash签名
+
+        Args:
+            normalized_lines: 参与比较的标准化代码行
+
+        Returns:
+            numpy.ndarray: 长度为num_perm的uint32签名，没有有效行时返回None
+        """
+        shingles = self.shingle_hashes(normalized_lines)
+        if len(shingles) == 0:
+            return None
+
+        a = self.hash_a[:, None]
+        b = self.hash_b[:, None]
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint64)
+        for start in range(0, len(shingles), SHINGLE_BATCH_SIZE):
+            batch = shingles[None, start:start + SHINGLE_BATCH_SIZE]
+            # uint64乘加按2^64自然回绕
+            hashed = (a * batch + b) >> np.uint64(32)
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def find_clusters(self, row_ids, signatures):
+        """通过LSH分带查找近似重复簇
+
+        每个分带内按带哈希排序，哈希相同的行与该组第一行比较签名，
+        估计相似度达到阈值时合并到同一簇。总体复杂度为O(N log N * bands)。
+
+        Args:
+            row_ids: 行号数组
+            signatures: 与row_ids对应的签名矩阵（N x num_perm）
+
+        Returns:
+            list: 近似重复簇（行号升序的列表），按行号最小的行排序
+        """
+        total = len(row_ids)
+        # 并查集只记录被合并过的行（未出现的行自成一簇），内存与匹配数而非总行数成正比
+        parent = {}
+
+        def find(i):
+            root = i
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while i != root:
+                parent[i], i = root, parent[i]
+            return root
+
+        if total > 1:
+            band_weights = self.hash_a[:self.rows_per_band]
+            for band in range(self.bands):
+                columns = signatures[:, band * self.rows_per_band:(band + 1) * self.rows_per_band]
+                band_hashes = (columns.astype(np.uint64) * band_weights).sum(axis=1, dtype=np.uint64)
+                order = np.argsort(band_hashes, kind='stable')
+                sorted_hashes = band_hashes[order]
+
+                # 每行所在组的第一行
+                run_starts = np.flatnonzero(np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]])
+                run_lengths = np.diff(np.r_[run_starts, total])
+                heads = np.repeat(order[run_starts], run_lengths)
+                members = order
+                candidates = heads != members
+                if not candidates.any():
+                    continue
+                heads = heads[candidates]
+                members = members[candidates]
+
+                # 用签名估计Jaccard相似度，过滤哈希碰撞和低相似度的候选
+                similarity = (signatures[heads] == signatures[members]).mean(axis=1)
+                matched = similarity >= self.similarity_threshold
+                for head, member in zip(heads[matched].tolist(), members[matched].tolist()):
+                    head_root, member_root = find(head), find(member)
+                    if head_root != member_root:
+                        # 以行号较小的行作为簇的代表
+                        if row_ids[member_root] < row_ids[head_root]:
+                            head_root, member_root = member_root, head_root
+                        parent[member_root] = head_root
+
+        clusters = {}
+        for i in set(parent) | set(parent.values()):
+            clusters.setdefault(find(i), []).append(int(row_ids[i]))
+        return sorted((sorted(rows) for rows in clusters.values() if len(rows) > 1),
+                      key=lambda rows: rows[0])
+
+    def create_accumulator(self):
+        """创建近似重复累加器"""
+        return NearDuplicateAccumulator(self)
+
+
+class NearDuplicateAccumulator:
+    """近似重复累加器，按行收集MinHash签名，汇总时统一进行LSH聚类
+
+    签名以紧凑的字节数组保存，每行占用num_perm * 4字节。LSH聚类需要全部行的签名，
+    流式模式下也随行数线性增长，并保存在--update的状态文件中。
+    """
+
+    def __init__(self, analyzer):
+        """初始化累加器
+
+        Args:
+            analyzer: 提供签名参数和聚类方法的NearDuplicateAnalyzer
+        """
+        self.analyzer = analyzer
+        self.row_ids = array('q')
+        self.signatures = bytearray()
+
+    def add(self, record, index):
+        """累加一条记录（需包含minhash签名）"""
+        signature = record.get('minhash')
+        if signature is None:
+            return
+        self.row_ids.append(index)
+        self.signatures += signature.tobytes()
+
+    def merge(self, other):
+        """合并另一个累加器的部分结果"""
+        self.row_ids.extend(other.row_ids)
+        self.signatures += other.signatures
+
+    def clusters(self):
+        """对已收集的签名进行LSH聚类，返回近似重复簇（行号升序的列表）"""
+        analyzer = self.analyzer
+        row_ids = np.frombuffer(self.row_ids, dtype=np.int64)
+        signatures = np.frombuffer(bytes(self.signatures), dtype=np.uint32).reshape(-1, analyzer.num_perm)
+        return analyzer.find_clusters(row_ids, signatures)
+
+    def redundant_rows(self, clusters=None):
+        """列出全部冗余行（各簇中除行号最小的一行以外的行）及其所在簇的代表行
+
+        数量与数据量成正比，不写入JSON报告，由main.py另存为报告目录中的<名称>_near_duplicates.csv。
+
+        Args:
+            clusters: 可选的已计算的近似重复簇（clusters()的结果），为None时现场聚类
+
+        Returns:
+            list: (冗余行号, 代表行号)的列表，按冗余行号升序
+        """
+        if clusters is None:
+            clusters = self.clusters()
+        return sorted((row, rows[0]) for rows in clusters for row in rows[1:])
+
+    def result(self, clusters=None):
+        """生成跨文件近似重复统计结果
+
+        报告中只包含冗余行数和最大的几个簇（行号以max_listed_rows为上限），大小与数据量无关。
+
+        Args:
+            clusters: 可选的已计算的近似重复簇（clusters()的结果），为None时现场聚类
+        """
+        config = self.analyzer.config
+        if clusters is None:
+            clusters = self.clusters()
+
+        # 每个簇保留行号最小的一行，其余视为冗余
+        duplicate_rows = sum(len(rows) - 1 for rows in clusters)
+        total_rows = len(self.row_ids)
+        largest = sorted(clusters, key=lambda rows: len(rows), reverse=True)[:config['max_listed_clusters']]
+
+        return {
+            'rows_analyzed': total_rows,
+            'cluster_count': len(clusters),
+            'duplicate_rows': duplicate_rows,
+            'duplicate_fraction': duplicate_rows / total_rows if total_rows > 0 else 0.0,
+            'top_clusters': [
+                {
+                    'size': len(rows),
+                    'representative': rows[0],
+                    'rows': rows[:config['max_listed_rows']]
+                }
+                for rows in largest
+            ],
+            'config': config
+        }
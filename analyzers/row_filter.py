@@ -0,0 +1,194 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+
+"""逐行过滤器：按逐行评分和指标阈值决定每行是否保留"""
+import time
+from collections import Counter
+from analyzers.code_scorer import CodeScorer
+from config.scoring_config import FILTER_CONFIG
+
+# 无效行（文本缺失或不是字符串）的剔除原因
+INVALID_REASON = 'invalid'
+
+# 过滤输出中各列的类型（输入的代码列和附加的评分、评级、剔除原因列），写出Parquet分片时使用，
+# 不由第一批数据推断（第一批的某列可能全为空值）
+OUTPUT_COLUMN_TYPES = {'text': 'string', 'score': 'float', 'grade': 'string', 'reject_reason': 'string'}
+
+# 未完整评分的行（无效行和级联中提前剔除的行）的评分，为浮点类型的NaN，使评分列类型一致
+UNSCORED = float('nan')
+
+# 数值误差容限：评分上界低于min_score超过该值时才提前剔除，保证与完整评估的结果一致
+SCORE_BOUND_TOLERANCE = 1e-9
+
+# 各评分维度使用的CodeScorer方法和单行统计字段
+DIMENSION_SCORERS = {
+    'code_length': ('score_code_length', 'length_stats'),
+    'line_stats': ('score_line_stats', 'complexity_stats'),
+    'complexity': ('score_complexity', 'entropy_stats'),
+    'duplication': ('score_duplication', 'duplication_stats'),
+    'entropy': ('score_entropy', 'entropy_stats'),
+}
+
+
+class RowFilter:
+    def __init__(self, engine, config=None, scorer=None):
+        """初始化逐行过滤器
+
+        Args:
+            engine: 计算逐行指标的AnalysisEngine
+            config: 过滤配置，如果为None则使用默认配置
+            scorer: 逐行评分使用的CodeScorer，如果为None则使用默认评分配置
+        """
+        self.engine = engine
+        self.config = config or FILTER_CONFIG
+        self.scorer = scorer or CodeScorer()
+        self.min_score = self.config.get('min_score')
+        self.cascade = self.config.get('cascade', True)
+        self.weights = self.scorer.config['weights']
+
+        # 指标硬性阈值：(原因, 指标列位置, 是否为下限, 阈值)
+        columns = {name: position for position, name in enumerate(engine.row_metric_names)}
+        self.thresholds = []
+        for key, value in self.config.items():
+            if key in ('min_score', 'cascade') or value is None:
+                continue
+            bound, _, column = key.partition('_')
+            if bound not in ('min', 'max') or column not in columns:
+                raise ValueError(f"Unknown filter threshold: {key}")
+            self.thresholds.append((key, columns[column], bound == 'min', value))
+
+        # 级联阶段，各阶段的阈值检查挂在产出该指标的阶段上：(原因, 指标列名, 是否为下限, 阈值)
+        self.stages = engine.cascade_stages()
+        for stage in self.stages:
+            stage_columns = set(stage['columns'])
+            stage['thresholds'] = [(key, engine.row_metric_names[position], is_min, limit)
+                                   for key, position, is_min, limit in self.thresholds
+                                   if engine.row_metric_names[position] in stage_columns]
+
+    def evaluate(self, metrics):
+        """评估一行
+
+        Args:
+            metrics: AnalysisEngine.row_metrics返回的逐行指标
+
+        Returns:
+            tuple: (评分, 评级, 剔除原因)，保留的行剔除原因为None，无效行的评分为UNSCORED、评级为None
+        """
+        if not metrics[1]:
+            return UNSCORED, None, INVALID_REASON
+
+        scores = self.scorer.score_codebase(self.engine.row_results(metrics))
+        reasons = [key for key, position, is_min, limit in self.thresholds
+                   if (metrics[position] < limit if is_min else metrics[position] > limit)]
+        if self.min_score is not None and scores['score'] < self.min_score:
+            reasons.insert(0, 'min_score')
+        return scores['score'], scores['grade'], ','.join(reasons) or None
+
+    def evaluate_code(self, code, stage_stats):
+        """按级联阶段逐步分析并评估一行代码
+
+        每个阶段完成后检查该阶段产出指标上的硬性阈值，并用已完成维度的得分和
+        未完成维度的满分（100）计算最终评分的上界；启用级联时，任一阈值不满足
+        或上界低于min_score即提前剔除，后面开销更大的阶段不再运行。评分上界保证
+        保留的行与完整评估完全相同，但提前剔除的行只记录已检查阶段的剔除原因，评分为UNSCORED、评级为None。
+
+        Args:
+            code: 代码文本
+            stage_stats: 各阶段的统计（阶段名到[运行行数, 剔除行数, 耗时秒数]），原地累加
+
+        Returns:
+            tuple: (评分, 评级, 剔除原因)
+        """
+        values = {}
+        state = {}
+        scores = {}
+        failed = set()
+        score_bound = 100.0
+        last_stage = self.stages[-1]
+        for stage in self.stages:
+            stats = stage_stats[stage['name']]
+            started = time.perf_counter()
+            values.update(stage['run'](code, state))
+            stats[2] += time.perf_counter() - started
+            stats[0] += 1
+
+            if not values['valid']:
+                stats[1] += 1
+                return UNSCORED, None, INVALID_REASON
+
+            failed.update(key for key, column, is_min, limit in stage['thresholds']
+                          if (values[column] < limit if is_min else values[column] > limit))
+            for dimension in stage['dimensions']:
+                method, section = DIMENSION_SCORERS[dimension]
+                scores[dimension] = getattr(self.scorer, method)(self.engine.row_result_section(section, values))
+                score_bound -= (100.0 - scores[dimension]) * self.weights[dimension]
+
+            if self.cascade and stage is not last_stage:
+                below_score = self.min_score is not None and score_bound < self.min_score - SCORE_BOUND_TOLERANCE
+                if failed or below_score:
+                    stats[1] += 1
+                    return UNSCORED, None, self._join_reasons(failed, below_score)
+
+        final = self.scorer.calculate_final_score(scores)
+        below_score = self.min_score is not None and final['score'] < self.min_score
+        if failed or below_score:
+            stage_stats[last_stage['name']][1] += 1
+        return final['score'], final['grade'], self._join_reasons(failed, below_score)
+
+    def _join_reasons(self, failed, below_score):
+        """按配置顺序拼接剔除原因（min_score在最前），与evaluate一致"""
+        reasons = [key for key, _, _, _ in self.thresholds if key in failed]
+        if below_score:
+            reasons.insert(0, 'min_score')
+        return ','.join(reasons) or None
+
+    def evaluate_chunk(self, texts, start=0):
+        """按级联阶段评估一批代码文本（可在工作进程中运行）
+
+        引擎配置了缓存时，已缓存的行直接以完整指标评估，不经过级联阶段。
+
+        Args:
+            texts: 代码文本序列
+            start: 该批第一行的行号
+
+        Returns:
+            tuple: (各行的(评分, 评级, 剔除原因)列表, 各阶段的统计)
+        """
+        stage_stats = {stage['name']: [0, 0, 0.0] for stage in self.stages}
+        cache = self.engine.cache
+        if cache is None:
+            return [self.evaluate_code(code, stage_stats) for code in texts], stage_stats
+
+        keys = cache.keys(self.engine.config_key, texts)
+        cached = cache.get_many(keys)
+        evaluations = []
+        for index, (key, code) in enumerate(zip(keys, texts), start):
+            record = cached.get(key)
+            if record is None:
+                evaluations.append(self.evaluate_code(code, stage_stats))
+            else:
+                evaluations.append(self.evaluate(self.engine.row_metrics(record, index)))
+        return evaluations, stage_stats
+
+    def filter_batch(self, frame, evaluations):
+        """按行评估结果把一批原始记录拆分为保留和剔除两部分
+
+        Args:
+            frame: 一批原始记录（DataFrame）
+            evaluations: 与frame各行对应的(评分, 评级, 剔除原因)
+
+        Returns:
+            tuple: (保留的记录, 剔除的记录, 剔除原因计数)；两部分均附加score和grade列，
+                剔除的记录另有reject_reason列
+        """
+        scores, grades, reasons = zip(*evaluations) if evaluations else ((), (), ())
+        frame = frame.assign(score=list(scores), grade=list(grades))
+        rejected_mask = [reason is not None for reason in reasons]
+        kept = frame[[not rejected for rejected in rejected_mask]]
+        rejected = frame[rejected_mask].assign(reject_reason=[reason for reason in reasons if reason is not None])
+        reason_counts = Counter(part for reason in reasons if reason is not None for part in reason.split(','))
+        return kept, rejected, reason_counts
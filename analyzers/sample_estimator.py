@@ -0,0 +1,271 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""抽样近似评估：由样本的逐行指标估计数据集指标、CodeScorer得分和评级的自助法置信区间
+
+每个重抽样不重新分析代码，而是对样本各行取重抽样次数作为权重，由逐行指标的加权和得到各统计量，
+再按与完整分析相同的口径组织为CodeScorer的输入，因此得分的置信区间反映了全部评分规则的阈值效应。
+分层抽样时在各层内分别重抽样。置信区间使用百分位数法，未做有限总体校正（抽样比例较大时偏保守）。
+
+跨文件的统计（近似重复比例和块级重复块）只能在样本内部计算：两份近似重复的文件同时入样的概率
+约为抽样比例的平方，样本内的近似重复比例会低估数据集的比例，报告中以within_sample标出；
+块级重复块的数量在各重抽样中保持为样本分析的结果。
+"""
+import numpy as np
+
+from analyzers.code_scorer import CodeScorer
+from config.analysis_config import SAMPLING_CONFIG
+
+# 评级，从高到低
+GRADES = ('A', 'B', 'C', 'D', 'F')
+
+# 只能在样本内部计算、不是数据集无偏估计的指标
+WITHIN_SAMPLE_METRICS = ('near_duplicate_fraction',)
+
+
+class RowMetricsCollector:
+    """在内存中收集逐行指标的row_sink（与RowMetricsWriter的write_rows接口相同）"""
+
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, rows):
+        self.rows.extend(rows)
+
+
+class SampleEstimator:
+    def __init__(self, engine, scorer=None, config=None):
+        """初始化估计器
+
+        Args:
+            engine: 分析样本的AnalysisEngine，提供逐行指标列和评分口径所需的配置
+            scorer: CodeScorer，如果为None则使用默认配置
+            config: 抽样配置，如果为None则使用默认配置
+        """
+        self.engine = engine
+        self.scorer = scorer or CodeScorer()
+        self.config = config or SAMPLING_CONFIG
+        self.patterns = list(engine.entropy_analyzer.patterns)
+
+    def row_features(self, row_metrics, signature_rows, redundant_rows):
+        """将样本的逐行指标整理为特征矩阵，各统计量均为特征列的加权和之比
+
+        Args:
+            row_metrics: 按行号排序的逐行指标（row_metrics返回的元组）
+            signature_rows: 有MinHash签名（参与近似重复检测）的行号
+            redundant_rows: 样本内近似重复簇中的冗余行号
+
+        Returns:
+            tuple: (特征名 -> 列号, 特征矩阵)
+        """
+        names = [name for name, _ in self.engine.row_metric_columns()]
+        columns = {name: index for index, name in enumerate(names)}
+        n = len(row_metrics)
+        table = np.array([[np.nan if value is None else float(value) for value in row] for row in row_metrics],
+                         dtype=np.float64).reshape(n, len(names))
+        valid = table[:, columns['valid']]
+        threshold = self.engine.duplication_analyzer.high_duplication_threshold
+
+        def valid_column(name):
+            return np.where(valid > 0, np.nan_to_num(table[:, columns[name]]), 0.0)
+
+        features = {
+            'files': np.ones(n),
+            'valid': valid,
+            'text_length': valid_column('text_length'),
+            'long_line_files': np.where(valid > 0, valid_column('long_line_count') > 0, 0.0),
+            'blank_ratio': valid_column('blank_ratio'),
+            'comment_ratio': valid_column('comment_ratio'),
+            'code_ratio': valid_column('code_ratio'),
+            'entropy': valid_column('entropy'),
+            'low_entropy_window_ratio': valid_column('low_entropy_window_ratio'),
+            'high_entropy_window_ratio': valid_column('high_entropy_window_ratio'),
+            'duplication_ratio': table[:, columns['duplication_ratio']],
+            'high_duplication': table[:, columns['duplication_ratio']] >= threshold,
+            'signature': np.isin(np.arange(n), np.asarray(signature_rows, dtype=np.int64)),
+            'redundant': np.isin(np.arange(n), np.asarray(redundant_rows, dtype=np.int64)),
+        }
+        for block in self.patterns:
+            features[f'blocks_{block}'] = valid_column(f'blocks_{block}')
+        index = {name: position for position, name in enumerate(features)}
+        return index, np.column_stack([np.asarray(column, dtype=np.float64) for column in features.values()])
+
+    def replicate_weights(self, strata, rng, count):
+        """生成count个自助法重抽样的行权重（各行被抽中的次数），分层时在各层内重抽样"""
+        strata = np.asarray(strata)
+        weights = np.zeros((count, len(strata)))
+        for stratum in np.unique(strata):
+            rows = np.flatnonzero(strata == stratum)
+            weights[:, rows] = rng.multinomial(len(rows), np.full(len(rows), 1.0 / len(rows)), size=count)
+        return weights
+
+    def metrics(self, index, sums):
+        """由特征列的加权和计算各统计量，sums的每一行对应一个重抽样"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            files = sums[:, index['files']]
+            valid = sums[:, index['valid']]
+            return {
+                'mean_text_length': sums[:, index['text_length']] / valid,
+                'long_line_file_ratio': sums[:, index['long_line_files']] / files,
+                'blank_ratio': sums[:, index['blank_ratio']] / valid,
+                'comment_ratio': sums[:, index['comment_ratio']] / valid,
+                'code_ratio': sums[:, index['code_ratio']] / valid,
+                'entropy': sums[:, index['entropy']] / valid,
+                'low_entropy_window_ratio': sums[:, index['low_entropy_window_ratio']] / valid,
+                'high_entropy_window_ratio': sums[:, index['high_entropy_window_ratio']] / valid,
+                'duplication_ratio': sums[:, index['duplication_ratio']] / files,
+                'high_duplication_ratio': sums[:, index['high_duplication']] / files,
+                'near_duplicate_fraction': np.where(sums[:, index['signature']] > 0,
+                                                    sums[:, index['redundant']] / sums[:, index['signature']], 0.0),
+            }
+
+    def scorer_input(self, metrics, block_counts, top_blocks):
+        """按完整分析的口径组织一个重抽样的CodeScorer输入
+
+        Args:
+            metrics: 该重抽样的各统计量
+            block_counts: 各代码块的加权计数（按patterns顺序）
+            top_blocks: 样本分析得到的块级重复块（各重抽样保持不变）
+        """
+        counts = {block: float(count) for block, count in zip(self.patterns, block_counts)}
+        ordered = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            'length_stats': {
+                'length_distribution': {'mean': metrics['mean_text_length']},
+                'line_length_stats': {'long_lines_ratio': metrics['long_line_file_ratio']},
+            },
+            'complexity_stats': {
+                'blank_lines_ratio': {'mean': metrics['blank_ratio']},
+                'comment_lines_ratio': {'mean': metrics['comment_ratio']},
+                'code_lines_ratio': {'mean': metrics['code_ratio']},
+            },
+            'duplication_stats': {
+                'line_level': {
+                    'ratios': {'mean': metrics['duplication_ratio']},
+                    'high_duplication_count': metrics['high_duplication_ratio'],
+                    'total_files': 1.0,
+                },
+                'block_level': {'top_blocks': top_blocks},
+                'cross_file': {'duplicate_fraction': metrics['near_duplicate_fraction']},
+            },
+            'entropy_stats': {
+                'global_entropy_stats': {'mean': metrics['entropy']},
+                'block_stats': {
+                    'total_blocks': sum(counts.values()),
+                    'block_type_counts': {
+                        block_type: sum(counts[block] for block in blocks)
+                        for block_type, blocks in self.engine.entropy_analyzer.block_mapping.items()
+                    },
+                    'top_blocks': [{'block': block, 'count': count} for block, count in ordered],
+                },
+            },
+        }
+
+    def score(self, metrics, block_counts, top_blocks):
+        """计算一个重抽样的CodeScorer得分"""
+        return self.scorer.score_codebase(self.scorer_input(metrics, block_counts, top_blocks))
+
+    def interval(self, replicates, estimate):
+        """估计值、百分位数置信区间和标准误"""
+        alpha = (1 - self.config['confidence']) / 2
+        finite = replicates[np.isfinite(replicates)]
+        if len(finite) == 0:
+            return {'estimate': float(estimate), 'ci_low': None, 'ci_high': None, 'std_error': None}
+        low, high = np.percentile(finite, [100 * alpha, 100 * (1 - alpha)])
+        return {
+            'estimate': float(estimate),
+            'ci_low': float(low),
+            'ci_high': float(high),
+            'std_error': float(np.std(finite, ddof=1)) if len(finite) > 1 else 0.0,
+        }
+
+    def estimate(self, row_metrics, strata, signature_rows, redundant_rows, top_blocks):
+        """估计各指标、各维度得分和最终得分的置信区间
+
+        Args:
+            row_metrics: 样本的逐行指标，行号为样本内的序号
+            strata: 样本各行所在的层（不分层时全部相同）
+            signature_rows: 有MinHash签名的样本行号
+            redundant_rows: 样本内近似重复簇中的冗余行号
+            top_blocks: 样本分析得到的块级重复块
+
+        Returns:
+            dict: metrics为各指标，score为最终得分及各评级的概率，dimension_scores为各维度得分
+        """
+        config = self.config
+        index, features = self.row_features(row_metrics, signature_rows, redundant_rows)
+        block_columns = [index[f'blocks_{block}'] for block in self.patterns]
+
+        # 全部权重为1即样本本身，得到点估计（与样本的完整分析结果一致）
+        point_sums = features.sum(axis=0, keepdims=True)
+        point_metrics = {name: values[0] for name, values in self.metrics(index, point_sums).items()}
+        point = self.score(point_metrics, point_sums[0, block_columns], top_blocks)
+
+        rng = np.random.default_rng(config['seed'])
+        replicates = config['bootstrap_replicates']
+        metric_replicates = {name: [] for name in point_metrics}
+        score_replicates = []
+        dimension_replicates = {dimension: [] for dimension in point['dimension_scores']}
+        grades = dict.fromkeys(GRADES, 0)
+        for start in range(0, replicates, config['replicate_batch']):
+            count = min(config['replicate_batch'], replicates - start)
+            sums = self.replicate_weights(strata, rng, count) @ features
+            batch = self.metrics(index, sums)
+            for name, values in batch.items():
+                metric_replicates[name].append(values)
+            for row in range(count):
+                scores = self.score({name: values[row] for name, values in batch.items()},
+                                    sums[row, block_columns], top_blocks)
+                score_replicates.append(scores['score'])
+                grades[scores['grade']] += 1
+                for dimension, value in scores['dimension_scores'].items():
+                    dimension_replicates[dimension].append(value)
+
+        score = self.interval(np.array(score_replicates), point['score'])
+        ci_grades = {self.scorer.grade(score['ci_low']), self.scorer.grade(score['ci_high'])}
+        score.update({
+            'grade': point['grade'],
+            'grade_probabilities': {grade: count / replicates for grade, count in grades.items() if count},
+            # 置信区间跨越评级边界时，样本不足以确定评级
+            'grade_ambiguous': len(ci_grades) > 1,
+        })
+        return {
+            'bootstrap': {
+                'replicates': replicates,
+                'confidence': config['confidence'],
+                'method': 'percentile',
+                'stratified': len(set(strata)) > 1,
+            },
+            'metrics': {
+                name: dict(self.interval(np.concatenate(values), point_metrics[name]),
+                           within_sample=name in WITHIN_SAMPLE_METRICS)
+                for name, values in metric_replicates.items()
+            },
+            'score': score,
+            'dimension_scores': {
+                dimension: self.interval(np.array(values), point['dimension_scores'][dimension])
+                for dimension, values in dimension_replicates.items()
+            },
+        }
+
+
+def print_sampling_summary(sampling):
+    """打印抽样方法和得分、各指标的置信区间"""
+    estimate = sampling['estimate']
+    confidence = estimate['bootstrap']['confidence'] * 100
+    print(f"\nSampling: {sampling['method']}{' (length-stratified)' if sampling['stratified'] else ''}, "
+          f"{sampling['sample_rows']}/{sampling['population_rows']} rows "
+          f"({sampling['sample_fraction']:.2%}), {estimate['bootstrap']['replicates']} bootstrap replicates")
+    score = estimate['score']
+    if score['ci_low'] is not None:
+        print(f"  score: {score['estimate']:.1f} ({confidence:.0f}% CI {score['ci_low']:.1f}-{score['ci_high']:.1f})")
+    probabilities = ', '.join(f"{grade} {probability:.0%}" for grade, probability in score['grade_probabilities'].items())
+    print(f"  grade: {score['grade']}{' (ambiguous)' if score['grade_ambiguous'] else ''} [{probabilities}]")
+    for name, interval in estimate['metrics'].items():
+        if interval['ci_low'] is None:
+            continue
+        note = " (within sample)" if interval['within_sample'] else ""
+        print(f"  {name}: {interval['estimate']:.4g} ({interval['ci_low']:.4g}-{interval['ci_high']:.4g}){note}")
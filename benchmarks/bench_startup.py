@@ -0,0 +1,120 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""命令行冷启动基准：在新的解释器进程中多次运行各子命令，检查耗时是否在预算内
+
+同时检查score子命令没有导入pandas、pyarrow、tqdm和绘图库（numpy是分析本身的依赖，不在检查之列）。超出预算或导入了重型库时以状态1退出，
+可直接用于CI。
+
+用法:
+    python -m benchmarks.bench_startup --budget 0.5 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 仓库根目录，子进程在此目录下运行cli.py
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# score子命令不应导入的重型库。numpy不在其中：score要分析输入，winnowing指纹、MinHash签名和
+# 统计汇总都以numpy实现，导入numpy（约0.1秒）是评分本身的开销，已计入cli score的时间预算
+HEAVY_MODULES = ('pandas', 'pyarrow', 'tqdm', 'matplotlib', 'seaborn')
+
+# 评分使用的示例Verilog源文件
+SAMPLE_VERILOG = """// 4-bit counter with synchronous reset
+module counter #(parameter WIDTH = 4) (
+    input wire clk,
+    input wire rst,
+    output reg [WIDTH-1:0] count
+);
+
+    // count up on every rising edge
+    always @(posedge clk) begin
+        if (rst)
+            count <= 0;
+        else
+            count <= count + 1;
+    end
+
+endmodule
+"""
+
+# 检查score子命令导入了哪些重型库的子进程脚本
+IMPORT_CHECK = """
+import contextlib, io, sys
+sys.path.insert(0, {root!r})
+import cli
+with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+    cli.main(['score', {path!r}])
+print(' '.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def time_command(args, repeat):
+    """在新的解释器进程中运行命令repeat次，返回各次的墙钟耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=REPO_ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def heavy_imports(sample_path):
+    """返回score子命令导入的重型库"""
+    script = IMPORT_CHECK.format(root=REPO_ROOT, path=sample_path, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return output.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DQEvaluator CLI cold start against a time budget")
+    parser.add_argument('--budget', type=float, default=0.5,
+                        help="Maximum median wall time in seconds for the budgeted commands (default: 0.5)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per command (default: 5)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample_path = os.path.join(tmp, 'counter.v')
+        with open(sample_path, 'w') as f:
+            f.write(SAMPLE_VERILOG)
+
+        # (名称, 参数, 是否受预算约束)；main.py --help作为导入全部依赖的对照
+        commands = [
+            ('interpreter', ['-c', 'pass'], False),
+            ('cli --help', ['cli.py', '--help'], True),
+            ('cli score', ['cli.py', 'score', sample_path], True),
+            ('main.py --help', ['main.py', '--help'], False),
+        ]
+        failed = False
+        print(f"{'command':<16} {'median':>8} {'min':>8}  budget {args.budget:.2f}s")
+        for name, command, budgeted in commands:
+            timings = time_command(command, args.repeat)
+            median = statistics.median(timings)
+            verdict = ''
+            if budgeted:
+                verdict = 'ok' if median <= args.budget else 'OVER BUDGET'
+                failed = failed or median > args.budget
+            print(f"{name:<16} {median:>7.3f}s {min(timings):>7.3f}s  {verdict}")
+
+        imported = heavy_imports(sample_path)
+        if imported:
+            failed = True
+            print(f"score imported heavy modules: {', '.join(imported)}")
+        else:
+            print("score imported none of: " + ', '.join(HEAVY_MODULES))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""分析器和端到端性能基准：在确定性的合成语料上测量吞吐量（行/秒、MB/秒）和峰值内存
+
+每个基准在新的子进程中运行，峰值常驻内存（ru_maxrss）互不影响；耗时取多次运行的最小值。
+结果追加到JSON历史文件中，记录提交、运行环境和语料摘要，--compare与同一语料上的上一次运行比较，
+可用于跨提交追踪性能变化。
+
+用法:
+    python -m benchmarks.bench_suite --rows 2000 --repeat 3 --compare
+    python -m benchmarks.bench_suite --only engine entropy --fail-on-regression 10
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from benchmarks.corpus_generator import VerilogCorpusGenerator, add_corpus_arguments, corpus_config
+from utils.profiler import peak_rss_mb
+
+# 仓库根目录
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 默认的历史文件
+DEFAULT_HISTORY = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'history.json')
+
+# 流式基准每块的行数
+STREAM_CHUNK_ROWS = 1000
+
+
+def _frame(texts):
+    import pandas as pd
+    return pd.DataFrame({'text': texts})
+
+
+def _engine_results(texts, workers):
+    from analyzers.analysis_engine import AnalysisEngine
+    return AnalysisEngine().analyze(texts, workers=workers)
+
+
+# 各基准的准备和计时部分：setup(texts, workers, workdir)的返回值传给run，只有run计时；
+# workdir为基准结束后删除的临时目录
+def setup_length(texts, workers, workdir):
+    from analyzers.length_analyzer import LengthAnalyzer
+    return LengthAnalyzer(), _frame(texts)
+
+
+def run_length(state):
+    analyzer, df = state
+    analyzer.analyze_code_length(df)
+    analyzer.analyze_line_counts(df)
+    analyzer.analyze_line_lengths(df)
+
+
+def setup_complexity(texts, workers, workdir):
+    from analyzers.complexity_analyzer import ComplexityAnalyzer
+    return ComplexityAnalyzer(), _frame(texts)
+
+
+def run_complexity(state):
+    analyzer, df = state
+    analyzer.analyze_code_complexity(df)
+
+
+def setup_duplication(texts, workers, workdir):
+    from analyzers.duplication_analyzer import DuplicationAnalyzer
+    return DuplicationAnalyzer(), _frame(texts)
+
+
+def run_duplication(state):
+    analyzer, df = state
+    analyzer.analyze_code_duplication(df)
+
+
+def setup_entropy(texts, workers, workdir):
+    from analyzers.entropy_analyzer import EntropyAnalyzer
+    return EntropyAnalyzer(), _frame(texts)
+
+
+def run_entropy(state):
+    analyzer, df = state
+    analyzer.analyze_code_entropy(df)
+
+
+def setup_scorer(texts, workers, workdir):
+    from analyzers.code_scorer import CodeScorer
+    return CodeScorer(), _engine_results(texts, workers)
+
+
+def run_scorer(state):
+    scorer, results = state
+    scorer.score_codebase(results)
+
+
+def setup_visualizer(texts, workers, workdir):
+    from visualizers.code_visualizer import CodeVisualizer
+    return CodeVisualizer(), _engine_results(texts, workers), workdir
+
+
+def run_visualizer(state):
+    from visualizers.plot_tasks import generate_visualizations
+    visualizer, results, output_dir = state
+    generate_visualizations(results, output_dir, visualizer)
+
+
+def setup_engine(texts, workers, workdir):
+    from analyzers.analysis_engine import AnalysisEngine
+    return AnalysisEngine(), texts, workers
+
+
+def run_engine(state):
+    engine, texts, workers = state
+    engine.analyze(texts, workers=workers)
+
+
+def run_engine_streaming(state):
+    engine, texts, workers = state
+    chunks = (texts[start:start + STREAM_CHUNK_ROWS] for start in range(0, len(texts), STREAM_CHUNK_ROWS))
+    engine.collect_results(engine.accumulate_stream(chunks, workers=workers))
+
+
+def run_end_to_end(state):
+    from analyzers.code_scorer import CodeScorer
+    engine, texts, workers = state
+    CodeScorer().score_codebase(engine.analyze(texts, workers=workers))
+
+
+# 基准名称 -> (准备函数, 计时函数, 说明)
+BENCHMARKS = {
+    'length': (setup_length, run_length, "LengthAnalyzer: code length, line count and line length statistics"),
+    'complexity': (setup_complexity, run_complexity, "ComplexityAnalyzer.analyze_code_complexity"),
+    'duplication': (setup_duplication, run_duplication, "DuplicationAnalyzer.analyze_code_duplication"),
+    'entropy': (setup_entropy, run_entropy, "EntropyAnalyzer.analyze_code_entropy"),
+    'scorer': (setup_scorer, run_scorer, "CodeScorer.score_codebase on precomputed analysis results"),
+    'visualizer': (setup_visualizer, run_visualizer, "CodeVisualizer: render all plots of one report"),
+    'engine': (setup_engine, run_engine, "AnalysisEngine.analyze: fused single-pass analysis"),
+    'engine_streaming': (setup_engine, run_engine_streaming, "AnalysisEngine streaming mode (bounded memory)"),
+    'end_to_end': (setup_engine, run_end_to_end, "Analysis plus scoring, as in a main.py run without plots"),
+}
+
+
+def run_benchmark(name, corpus_path, repeat, workers):
+    """在子进程中运行一个基准，返回最小耗时和内存占用"""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    setup, run, _ = BENCHMARKS[name]
+    with open(corpus_path, 'rb') as f:
+        texts = pickle.load(f)
+
+    # 分析器的状态输出不计入结果
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as workdir:
+        state = setup(texts, workers, workdir)
+        baseline_rss = peak_rss_mb()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(state)
+            timings.append(time.perf_counter() - start)
+
+    peak = peak_rss_mb()
+    return {
+        'seconds': min(timings),
+        'peak_rss_mb': peak,
+        'rss_delta_mb': peak - baseline_rss,
+    }
+
+
+def git_revision():
+    """当前提交的短哈希和工作区是否有未提交的修改"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    check=True, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def corpus_digest(texts):
+    """语料内容的摘要，只有摘要相同的运行才互相比较"""
+    digest = hashlib.blake2b(digest_size=16)
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {'runs': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2, ensure_ascii=False)
+
+
+def previous_run(history, digest, names):
+    """同一语料上最近一次包含这些基准的运行"""
+    for run in reversed(history['runs']):
+        if run['corpus']['digest'] == digest and names & run['results'].keys():
+            return run
+    return None
+
+
+def print_results(results, previous):
+    """打印结果表，有上一次运行时附带耗时变化百分比"""
+    header = f"{'benchmark':<18} {'seconds':>9} {'rows/s':>10} {'MB/s':>8} {'peak MB':>9} {'delta MB':>9}"
+    if previous is not None:
+        header += f"  vs {previous['commit'] or '?'}"
+    print(header)
+    changes = {}
+    for name, result in results.items():
+        line = (f"{name:<18} {result['seconds']:>9.3f} {result['rows_per_s']:>10.0f} {result['mb_per_s']:>8.2f} "
+                f"{result['peak_rss_mb']:>9.1f} {result['rss_delta_mb']:>9.1f}")
+        old = previous['results'].get(name) if previous is not None else None
+        if old is not None:
+            changes[name] = (result['seconds'] - old['seconds']) / old['seconds'] * 100
+            line += f"  {changes[name]:+.1f}%"
+        print(line)
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DQEvaluator analyzers on a synthetic Verilog corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), metavar='NAME',
+                        help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark, the fastest is kept "
+                                                              "(default: 3)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes for the engine benchmarks and the scorer/visualizer setup "
+                             "(default: 1)")
+    parser.add_argument('--history', default=DEFAULT_HISTORY,
+                        help="JSON history file the run is appended to (default: benchmarks/results/history.json)")
+    parser.add_argument('--no-save', action='store_true', help="Do not append this run to the history file")
+    parser.add_argument('--compare', action='store_true',
+                        help="Show the change in time against the previous run on the same corpus")
+    parser.add_argument('--fail-on-regression', type=float, default=None, metavar='PCT',
+                        help="Exit with status 1 if any benchmark is more than PCT%% slower than the previous run "
+                             "on the same corpus (implies --compare)")
+    args = parser.parse_args()
+
+    names = args.only or list(BENCHMARKS)
+    config = corpus_config(args)
+    texts = VerilogCorpusGenerator(config).generate()
+    total_mb = sum(len(text.encode('utf-8')) for text in texts) / (1024 * 1024)
+    digest = corpus_digest(texts)
+    print(f"Corpus: {len(texts)} files, {total_mb:.1f} MB (digest {digest[:12]})")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_path = os.path.join(tmp, 'corpus.pkl')
+        with open(corpus_path, 'wb') as f:
+            pickle.dump(texts, f)
+        for name in names:
+            print(f"Running {name}: {BENCHMARKS[name][2]}")
+            # 每个基准使用新的解释器进程，峰值内存和导入开销互不影响
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(run_benchmark, name, corpus_path, args.repeat, args.workers).result()
+            result['rows_per_s'] = len(texts) / result['seconds'] if result['seconds'] else 0.0
+            result['mb_per_s'] = total_mb / result['seconds'] if result['seconds'] else 0.0
+            results[name] = result
+
+    commit, dirty = git_revision()
+    history = load_history(args.history)
+    compare = args.compare or args.fail_on_regression is not None
+    previous = previous_run(history, digest, set(names)) if compare else None
+    print()
+    changes = print_results(results, previous)
+
+    if not args.no_save:
+        history['runs'].append({
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'dirty': dirty,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'corpus': {**config, 'digest': digest, 'mb': total_mb},
+            'repeat': args.repeat,
+            'workers': args.workers,
+            'results': results,
+        })
+        save_history(args.history, history)
+        print(f"\nResults appended to {args.history}")
+
+    if args.fail_on_regression is not None:
+        regressed = [name for name, change in changes.items() if change > args.fail_on_regression]
+        if regressed:
+            print(f"Regression over {args.fail_on_regression}%: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""确定性的合成Verilog/SystemVerilog语料生成器，用于性能基准
+
+同样的配置总是生成完全相同的语料：每个文件使用由(seed, 文件序号)派生的独立随机数生成器，
+增加行数时已有文件的内容不变。可配置文件数、文件行数分布（对数正态）、注释和空行密度、
+跨文件重复率（由之前的文件复制并少量改写得到的文件比例）以及SystemVerilog文件比例。
+
+用法:
+    python -m benchmarks.corpus_generator --rows 10000 --duplication-rate 0.2 --output data/synthetic.csv
+"""
+import argparse
+import math
+import random
+
+import pandas as pd
+
+# 默认生成配置
+DEFAULT_CORPUS_CONFIG = {
+    'rows': 2000,                  # 文件数（数据集行数）
+    'seed': 0,                     # 随机种子
+    'median_lines': 80,            # 文件行数的中位数
+    'length_sigma': 0.8,           # 文件行数对数的标准差（对数正态分布）
+    'min_lines': 8,                # 最小文件行数
+    'max_lines': 4000,             # 最大文件行数
+    'comment_density': 0.2,        # 注释行占总行数的比例
+    'blank_density': 0.12,         # 空行占总行数的比例
+    'duplication_rate': 0.1,       # 由之前的文件复制并改写得到的文件比例
+    'mutation_rate': 0.05,         # 复制的文件中被改写的行比例
+    'systemverilog_ratio': 0.3,    # 使用SystemVerilog语法（logic、always_ff等）的文件比例
+}
+
+# 标识符和注释使用的词表
+NOUNS = ('data', 'addr', 'count', 'state', 'valid', 'ready', 'fifo', 'buf', 'req', 'ack',
+         'crc', 'shift', 'mux', 'sel', 'en', 'flag', 'ptr', 'err', 'cfg', 'stat')
+MODULE_NAMES = ('uart_tx', 'uart_rx', 'fifo_ctrl', 'alu', 'spi_master', 'i2c_slave', 'dma_engine',
+                'pwm_gen', 'timer', 'crc_calc', 'arbiter', 'decoder', 'encoder', 'mem_ctrl')
+COMMENT_PHRASES = ('update the output register', 'default assignment avoids latches',
+                   'synchronous reset', 'next state logic', 'handshake with the upstream block',
+                   'pipeline stage', 'TODO: parameterize the width', 'decode the command field',
+                   'wrap around at the end of the buffer', 'status flags for the host')
+OPERATORS = ('+', '-', '&', '|', '^')
+
+
+class VerilogCorpusGenerator:
+    def __init__(self, config=None):
+        """初始化生成器
+
+        Args:
+            config: 生成配置，如果为None则使用默认配置；只需提供与默认值不同的键
+        """
+        self.config = {**DEFAULT_CORPUS_CONFIG, **(config or {})}
+
+    def _rng(self, index):
+        """第index个文件的随机数生成器（只由种子和序号决定）"""
+        return random.Random(f"{self.config['seed']}:{index}")
+
+    def _file_lines(self, rng):
+        """按对数正态分布抽取文件行数"""
+        config = self.config
+        lines = round(math.exp(rng.gauss(math.log(config['median_lines']), config['length_sigma'])))
+        return min(max(lines, config['min_lines']), config['max_lines'])
+
+    def _name(self, rng):
+        return f"{rng.choice(NOUNS)}_{rng.choice(NOUNS)}{rng.randrange(16)}"
+
+    def _statement(self, rng, sv, signals):
+        """生成一段代码语句（多行），signals为模块中已声明的信号名"""
+        a, b, c = (rng.choice(signals) for _ in range(3))
+        kind = rng.random()
+        if kind < 0.3:
+            return [f"    assign {a} = {b} {rng.choice(OPERATORS)} {c};"]
+        if kind < 0.55:
+            head = "always_ff @(posedge clk)" if sv else "always @(posedge clk)"
+            return [f"    {head} begin",
+                    "        if (rst) begin",
+                    f"            {a} <= '0;" if sv else f"            {a} <= 0;",
+                    "        end else begin",
+                    f"            {a} <= {b} {rng.choice(OPERATORS)} {c};",
+                    "        end",
+                    "    end"]
+        if kind < 0.75:
+            head = "always_comb begin" if sv else "always @(*) begin"
+            body = [f"    {head}", f"        case ({a})"]
+            for value in range(rng.randint(2, 5)):
+                body.append(f"            {value}: {b} = {c} {rng.choice(OPERATORS)} {value};")
+            body += [f"            default: {b} = {c};", "        endcase", "    end"]
+            return body
+        if kind < 0.85:
+            return [f"    {rng.choice(MODULE_NAMES)} u_{self._name(rng)} (",
+                    "        .clk(clk),",
+                    "        .rst(rst),",
+                    f"        .in_data({a}),",
+                    f"        .out_data({b})",
+                    "    );"]
+        if kind < 0.93:
+            name = self._name(rng)
+            return [f"    function automatic [7:0] {name};",
+                    f"        input [7:0] value;",
+                    f"        {name} = value {rng.choice(OPERATORS)} 8'h{rng.randrange(256):02x};",
+                    "    endfunction"]
+        if sv:
+            return [f"    assert property (@(posedge clk) {a} |-> ##1 {b});"]
+        return ["    initial begin",
+                f"        {a} = 0;",
+                "    end"]
+
+    def _code_lines(self, rng, target):
+        """生成约target行代码（不含注释和空行）组成的模块"""
+        sv = rng.random() < self.config['systemverilog_ratio']
+        width = rng.choice((8, 16, 32))
+        module = f"{rng.choice(MODULE_NAMES)}_{rng.randrange(1000)}"
+        lines = [f"module {module} #(",
+                 f"    parameter WIDTH = {width},",
+                 f"    parameter DEPTH = {rng.choice((4, 8, 16, 32))}",
+                 ") (",
+                 "    input wire clk,",
+                 "    input wire rst,"]
+        signals = []
+        for _ in range(rng.randint(2, 6)):
+            name = self._name(rng)
+            direction = rng.choice(('input', 'output'))
+            kind = 'logic' if sv else ('wire' if direction == 'input' else 'reg')
+            lines.append(f"    {direction} {kind} [WIDTH-1:0] {name},")
+            signals.append(name)
+        lines[-1] = lines[-1].rstrip(',')
+        lines.append(");")
+
+        if sv and rng.random() < 0.5:
+            lines.append(f"    typedef enum logic [1:0] {{IDLE, BUSY, DONE}} state_t;")
+        for _ in range(rng.randint(2, 8)):
+            name = self._name(rng)
+            kind = 'logic' if sv else rng.choice(('wire', 'reg'))
+            lines.append(f"    {kind} [WIDTH-1:0] {name};")
+            signals.append(name)
+        lines.append(f"    localparam LIMIT = {rng.randrange(2, 1024)};")
+
+        while len(lines) < target - 1:
+            lines.extend(self._statement(rng, sv, signals))
+        lines.append("endmodule")
+        return lines
+
+    def _decorate(self, rng, code_lines, total):
+        """按注释和空行密度在代码行之间插入注释和空行"""
+        comment_lines = round(total * self.config['comment_density'])
+        blank_lines = round(total * self.config['blank_density'])
+        extras = ['comment'] * comment_lines + ['blank'] * blank_lines
+        positions = sorted(rng.randrange(len(code_lines) + 1) for _ in extras)
+        rng.shuffle(extras)
+        lines = []
+        cursor = 0
+        for position, extra in zip(positions, extras):
+            lines.extend(code_lines[cursor:position])
+            cursor = position
+            if extra == 'blank':
+                lines.append('')
+            elif rng.random() < 0.1:
+                lines.append(f"    /* {rng.choice(COMMENT_PHRASES)} */")
+            else:
+                lines.append(f"    // {rng.choice(COMMENT_PHRASES)}")
+        lines.extend(code_lines[cursor:])
+        return lines
+
+    def _mutate(self, rng, text):
+        """复制一个已有文件并改写其中少量行，得到近似重复的文件"""
+        lines = text.split('\n')
+        mutation_rate = self.config['mutation_rate']
+        signals = [self._name(rng) for _ in range(4)]
+        for index, line in enumerate(lines):
+            if line.startswith('    ') and rng.random() < mutation_rate:
+                lines[index] = self._statement(rng, False, signals)[0]
+        return '\n'.join(lines)
+
+    def generate(self):
+        """生成全部文件
+
+        Returns:
+            list: 代码文本，每个元素为一个文件
+        """
+        config = self.config
+        texts = []
+        for index in range(config['rows']):
+            rng = self._rng(index)
+            if index > 0 and rng.random() < config['duplication_rate']:
+                texts.append(self._mutate(rng, texts[rng.randrange(index)]))
+                continue
+            total = self._file_lines(rng)
+            code_target = max(total - round(total * (config['comment_density'] + config['blank_density'])), 1)
+            code_lines = self._code_lines(rng, code_target)
+            texts.append('\n'.join(self._decorate(rng, code_lines, total)))
+        return texts
+
+    def dataframe(self):
+        """生成全部文件，返回只有text列的DataFrame"""
+        return pd.DataFrame({'text': self.generate()})
+
+    def write(self, path):
+        """生成语料并按扩展名写出为CSV、JSONL或Parquet文件"""
+        df = self.dataframe()
+        if path.endswith('.jsonl'):
+            df.to_json(path, orient='records', lines=True, force_ascii=False)
+        elif path.endswith('.parquet'):
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+        return df
+
+
+def add_corpus_arguments(parser):
+    """添加语料生成参数（与DEFAULT_CORPUS_CONFIG的键一一对应）"""
+    for key, default in DEFAULT_CORPUS_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", dest=key, type=type(default), default=default,
+                            help=f"(default: {default})")
+
+
+def corpus_config(args):
+    """从解析后的参数中取出语料生成配置"""
+    return {key: getattr(args, key) for key in DEFAULT_CORPUS_CONFIG}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic Verilog/SystemVerilog corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument('--output', required=True, help="Output .csv, .jsonl or .parquet file")
+    args = parser.parse_args()
+
+    df = VerilogCorpusGenerator(corpus_config(args)).write(args.output)
+    size = df['text'].str.len().sum()
+    print(f"Wrote {len(df)} files ({size / (1024 * 1024):.1f} MB of code) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+
+"""DQEvaluator命令行入口：analyze、filter、score和plot子命令
+
+本模块只导入标准库，各子命令在运行时才导入所需的模块：score不加载pandas、pyarrow和绘图库，
+plot只在渲染进程中加载matplotlib，适合在钩子脚本和分片任务中频繁调用。
+
+用法:
+    python cli.py analyze [main.py的分析参数]
+    python cli.py filter OUTPUT_DIR [main.py的过滤参数]
+    python cli.py score PATH [PATH ...] [--json] [--fail-under SCORE]
+    python cli.py plot REPORT_DIR [REPORT_DIR ...]
+"""
+import argparse
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+
+# 原样转交main.py处理参数的子命令
+PASSTHROUGH_COMMANDS = ('analyze', 'filter')
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行解析器（analyze和filter的参数由main.py解析）"""
+    parser = argparse.ArgumentParser(prog='dqevaluator',
+                                     description="DQEvaluator: Quality Assessment Tool for LLM Training Datasets")
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+
+    subparsers.add_parser('analyze', add_help=False,
+                          help="Analyze the datasets in data/ (or --source-dir trees) and write reports and plots; "
+                               "accepts all options of main.py (see: analyze --help)")
+    subparsers.add_parser('filter', add_help=False,
+                          help="Filter mode: write the rows that pass to sharded files under OUTPUT_DIR; "
+                               "accepts the filter options of main.py (see: filter --help)")
+
+    score = subparsers.add_parser('score', help="Score small inputs quickly and print the result",
+                                  description="Score each input as one dataset with the same rules as analyze. "
+                                              "Verilog sources, source trees, CSV and JSONL inputs are read "
+                                              "without pandas or pyarrow.")
+    score.add_argument('paths', nargs='+', metavar='PATH',
+                       help="Verilog source file (one row), source directory (one row per .v/.sv/.vh file), "
+                            "or a CSV/JSONL/Parquet/Arrow file with a 'text' column")
+    score.add_argument('--workers', type=int, default=1,
+                       help="Number of worker processes used to analyze each input (default: 1)")
+    score.add_argument('--json', action='store_true',
+                       help="Print the scores as JSON instead of a text summary")
+    score.add_argument('--fail-under', type=float, default=None, metavar='SCORE',
+                       help="Exit with status 1 if any input scores below SCORE")
+    score.set_defaults(handler=run_score)
+
+    plot = subparsers.add_parser('plot', help="Render the plots of saved reports without re-analyzing the data")
+    plot.add_argument('report_dirs', nargs='+', metavar='REPORT_DIR', help="Report directory under results/")
+    plot.add_argument('--render-workers', type=int, default=2,
+                      help="Number of processes rendering plots, each plot being a separate task (default: 2)")
+    plot.set_defaults(handler=run_plot)
+    return parser
+
+def run_main(argv) -> int:
+    """以main.py的参数运行分析或过滤"""
+    import main
+    main.main(argv)
+    return 0
+
+def read_score_texts(path: str):
+    """读取一个评分输入的全部代码文本，Verilog源文件、目录、CSV和JSONL只使用标准库"""
+    from utils.text_reader import can_read_texts, read_small_texts
+    if can_read_texts(path):
+        return read_small_texts(path)
+    from utils.file_utils import read_texts
+    return read_texts(path)
+
+def run_score(args: argparse.Namespace) -> int:
+    """score子命令：逐个输入分析并评分"""
+    from analyzers.analysis_engine import AnalysisEngine
+    from analyzers.code_scorer import CodeScorer, print_score_summary
+
+    engine = AnalysisEngine()
+    scorer = CodeScorer()
+    reports = []
+    status = 0
+    for path in args.paths:
+        try:
+            texts = read_score_texts(path)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"Error reading {path}: {str(e)}", file=sys.stderr)
+            status = 2
+            continue
+        if not texts:
+            print(f"No code found in {path}", file=sys.stderr)
+            status = 2
+            continue
+
+        # 分析过程的状态信息输出到stderr，stdout只输出评分
+        with redirect_stdout(sys.stderr):
+            results = engine.analyze(texts, workers=args.workers)
+        scores = scorer.score_codebase(results)
+        reports.append({'input': path, 'rows': len(texts), **scores})
+        if args.fail_under is not None and scores['score'] < args.fail_under and status == 0:
+            status = 1
+        if not args.json:
+            print_score_summary(scores, f"Code Quality Score - {path} ({len(texts)} rows)")
+
+    if args.json:
+        print(json.dumps(reports, indent=2, default=float))
+    return status
+
+def run_plot(args: argparse.Namespace) -> int:
+    """plot子命令：由已保存的报告绘制图表"""
+    from visualizers.plot_tasks import run_plot as render_reports
+    missing = [report_dir for report_dir in args.report_dirs if not os.path.isdir(report_dir)]
+    if missing:
+        print(f"Report directory not found: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    render_reports(args.report_dirs, args.render_workers)
+    return 0
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # analyze和filter的参数原样转交main.py，filter的第一个参数为输出目录
+    if argv and argv[0] in PASSTHROUGH_COMMANDS:
+        command, rest = argv[0], argv[1:]
+        if command == 'filter' and rest and not rest[0].startswith('-'):
+            rest = ['--filter'] + rest
+        elif command == 'filter' and not {'--filter', '-h', '--help'} & set(rest):
+            print("usage: dqevaluator filter OUTPUT_DIR [options]", file=sys.stderr)
+            return 2
+        return run_main(rest)
+
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
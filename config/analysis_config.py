@@ -10,24 +10,29 @@ See LICENSE file in the project root for license information.
 DUPLICATION_CONFIG = {
     # 块分析配置
     'block_analysis': {
-        'min_block_size': 3,        # 最小重复块大小（行数）
+        'min_block_size': 3,        # 最小重复块大小（行数），同时为winnowing的k-gram行数
         'max_block_size': 20,       # 最大重复块大小（行数）
-        'sample_size': 30,          # 块分析的样本文件数量
-        'min_file_lines': 10,       # 进行块分析的最小文件行数
+        'winnow_window': 4,         # winnowing窗口大小（k-gram数），不少于min_block_size + winnow_window - 1行的重复块保证被检出
     },
     
     # 行分析配置
     'line_analysis': {
         'min_line_length': 5,       # 最小行长度，小于此长度的行将被忽略
         'high_duplication_threshold': 0.3,  # 高重复率阈值（30%）
-    },
-    
-    # 通用配置
-    'general': {
-        'random_seed': 42,          # 随机种子，用于采样
     }
 }
 
+# 跨文件近似重复分析配置（MinHash/LSH）
+NEAR_DUPLICATE_CONFIG = {
+    'num_perm': 64,                 # MinHash签名长度
+    'bands': 16,                    # LSH分带数（每带行数 = num_perm / bands）
+    'shingle_size': 3,              # 每个shingle包含的连续标准化行数
+    'similarity_threshold': 0.8,    # 判定为近似重复的估计Jaccard相似度
+    'max_listed_clusters': 10,      # 报告中列出的最大簇数
+    'max_listed_rows': 20,          # 每个簇列出的最大行号数
+    'random_seed': 42,              # 随机种子，用于生成哈希函数
+}
+
 # 代码复杂度分析配置
 COMPLEXITY_CONFIG = {
     'min_file_size': 10,           # 最小文件大小（字节）
@@ -98,3 +103,11 @@ VISUALIZATION_CONFIG = {
     'hist_bins': 50,                # 直方图箱数
     'dpi': 300,                     # 图表DPI
 }
+
+# 抽样近似评估配置（--sample）
+SAMPLING_CONFIG = {
+    'seed': 0,                      # 抽样和自助法的随机种子
+    'bootstrap_replicates': 1000,   # 自助法重抽样次数
+    'confidence': 0.95,             # 置信区间的置信水平（百分位数法）
+    'replicate_batch': 64,          # 每批同时计算的重抽样数，限制权重矩阵的内存
+}
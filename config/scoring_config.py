@@ -46,6 +46,7 @@ SCORING_CONFIG = {
         'high_duplication_ratio': 0.08,    # 高重复文件比例阈值
         'max_identical_blocks': 3,        # 最大相同代码块数
         'min_duplicate_block_lines': 5,   # 最小重复块行数
+        'max_near_duplicate_ratio': 0.1,  # 跨文件近似重复行比例阈值
     },
     
     # 熵分析指标
@@ -72,3 +73,17 @@ SCORING_CONFIG = {
         'entropy': 0.1           # 熵分析权重
     }
 }
+
+# 过滤模式配置：逐行评分（规则与数据集评分相同，见SCORING_CONFIG）低于min_score的行被剔除；
+# 另可按逐行指标设置硬性阈值，键为min_<指标列>或max_<指标列>（如max_duplication_ratio），
+# 指标列见AnalysisEngine.row_metric_columns，值为None表示不检查
+FILTER_CONFIG = {
+    'min_score': 60,                  # 最低逐行评分（D级）
+    'cascade': True,                  # 按开销从低到高分阶段分析，被剔除的行跳过后面的阶段
+    'min_text_length': None,          # 最小字符数
+    'max_text_length': None,          # 最大字符数
+    'max_duplication_ratio': None,    # 最大行级重复率
+    'min_entropy': None,              # 最小归一化熵
+    'max_entropy': None,              # 最大归一化熵
+    'max_low_entropy_window_ratio': None,  # 最大低熵窗口比例（模板化、生成的代码）
+}
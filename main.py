@@ -7,25 +7,56 @@ See LICENSE file in the project root for license information.
 
 #!/usr/bin/env python3
 import os
+import argparse
 import json
+import time
 import pandas as pd
+from collections import Counter
+from contextlib import nullcontext
 from datetime import datetime
 from tqdm import tqdm
 import numpy as np
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from typing import Dict, List, Tuple
 
-from analyzers.length_analyzer import LengthAnalyzer
-from analyzers.complexity_analyzer import ComplexityAnalyzer
-from analyzers.duplication_analyzer import DuplicationAnalyzer
-from analyzers.entropy_analyzer import EntropyAnalyzer
-from analyzers.code_scorer import CodeScorer
-from visualizers.code_visualizer import CodeVisualizer
+from analyzers.analysis_engine import AnalysisEngine, map_chunks
+from analyzers.code_scorer import CodeScorer, print_score_summary
+from analyzers.row_filter import RowFilter, OUTPUT_COLUMN_TYPES
+from analyzers.sample_estimator import SampleEstimator, RowMetricsCollector, print_sampling_summary
+from config.analysis_config import SAMPLING_CONFIG
+from config.scoring_config import FILTER_CONFIG
+from visualizers.plot_tasks import submit_plots, wait_for_plots, run_plot
+from utils.row_cache import RowCache, DEFAULT_CACHE_SIZE_MB
+from utils.report_state import (save_state, load_state, find_latest_report, supports_append,
+                                source_signature, appended_offset, iter_appended_chunks)
+from utils.file_utils import is_data_file, read_texts, iter_text_batches, iter_record_batches, DEFAULT_BATCH_SIZE
+from utils.row_metrics_writer import RowMetricsWriter, ROW_METRICS_FORMATS
+from utils.shard_writer import ShardWriter, SHARD_FORMATS, DEFAULT_SHARD_ROWS
+from utils.profiler import StageProfiler
+from utils.sampling import RowSampler
 
-def load_csv_data(file_path: str) -> pd.DataFrame:
-    """加载CSV文件数据"""
+# 增量更新时读取追加数据的默认块大小（行数）
+DEFAULT_UPDATE_CHUNKSIZE = 50000
+
+# 过滤模式的默认块大小（行数），每块为一个并行任务
+DEFAULT_FILTER_CHUNKSIZE = 10000
+
+def load_data_file(file_path: str) -> pd.DataFrame:
+    """加载数据文件（CSV、JSONL、Parquet或Arrow IPC）的text列
+    
+    源代码目录中的每个Verilog文件为一行，另有path列记录相对路径。
+    """
     try:
-        df = pd.read_csv(file_path)
+        if os.path.isdir(file_path):
+            row_keys = []
+            texts = read_texts(file_path, row_keys)
+            if not texts:
+                print(f"No Verilog source files found in {file_path}")
+                return None
+            df = pd.DataFrame({'path': row_keys, 'text': texts})
+        else:
+            df = pd.DataFrame({'text': read_texts(file_path)})
         print(f"\nSuccessfully loaded {file_path}")
         print(f"Records count: {len(df)}\n")
         return df
@@ -33,36 +64,83 @@ def load_csv_data(file_path: str) -> pd.DataFrame:
         print(f"Error loading {file_path}: {str(e)}")
         return None
 
-def analyze_code(df: pd.DataFrame, pbar: tqdm) -> Dict:
-    """分析代码并返回结果"""
-    results = {}
-    
-    # 长度分析
-    length_analyzer = LengthAnalyzer()
-    results['length_stats'] = {
-        'length_distribution': length_analyzer.analyze_code_length(df).to_dict(),
-        'line_count_distribution': length_analyzer.analyze_line_counts(df).to_dict(),
-        'line_length_stats': length_analyzer.analyze_line_lengths(df)
+def build_state(engine: AnalysisEngine, accumulators: Dict, streaming: bool, source: Dict = None) -> Dict:
+    """构建可持久化的累加状态，用于之后向报告中合并追加的数据"""
+    return {
+        'config_key': engine.config_key,
+        'streaming': streaming,
+        'rows': accumulators['length_stats'].total_files,
+        'source': source,
+        'accumulators': accumulators,
     }
-    pbar.update(25)
-    
-    # 复杂度分析
-    complexity_analyzer = ComplexityAnalyzer()
-    results['complexity_stats'] = complexity_analyzer.analyze_code_complexity(df)
-    pbar.update(25)
-    
-    # 重复度分析
-    duplication_analyzer = DuplicationAnalyzer()
-    results['duplication_stats'] = duplication_analyzer.analyze_code_duplication(df)
-    pbar.update(25)
-    
-    # 熵分析
-    entropy_analyzer = EntropyAnalyzer()
-    results['entropy_stats'] = entropy_analyzer.analyze_code_entropy(df)
-    pbar.update(25)
-    
+
+def row_metrics_path(directory: str, name: str, fmt: str) -> str:
+    """数据集的逐行指标表输出路径"""
+    return os.path.join(directory, f"{Path(name).stem}_metrics{ROW_METRICS_FORMATS[fmt]}")
+
+def open_row_metrics(path: str, engine: AnalysisEngine, row_keys: List[str] = None):
+    """打开逐行指标表输出，path为None时返回空的上下文"""
+    if path is None:
+        return nullcontext()
+    return RowMetricsWriter(path, engine.row_metric_columns(), row_keys)
+
+def print_row_metrics_written(row_sink: RowMetricsWriter):
+    """打印逐行指标表的写出结果"""
+    if row_sink is not None:
+        print(f"\nPer-row metrics for {row_sink.rows_written} records written to {row_sink.path}")
+
+def attach_row_keys(results: Dict, row_keys: List[str]) -> Dict:
+    """为分析结果附加行键（源文件路径），并在按行号引用的重复块位置和近似重复簇中标注路径"""
+    results['row_keys'] = row_keys
+    duplication_stats = results['duplication_stats']
+    for block in duplication_stats['block_level']['top_blocks']:
+        block['paths'] = [row_keys[row] for row, _ in block['locations']]
+    if 'cross_file' in duplication_stats:
+        for cluster in duplication_stats['cross_file']['top_clusters']:
+            cluster['paths'] = [row_keys[row] for row in cluster['rows']]
     return results
 
+def map_sample_rows(results: Dict, rows: List[int]) -> Dict:
+    """将样本分析结果中按样本内序号引用的行号（重复块位置、近似重复簇和冗余行）换为原始数据集中的行号"""
+    duplication_stats = results['duplication_stats']
+    for block in duplication_stats['block_level']['top_blocks']:
+        block['locations'] = [[rows[row], start] for row, start in block['locations']]
+    for cluster in duplication_stats['cross_file']['top_clusters']:
+        cluster['representative'] = rows[cluster['representative']]
+        cluster['rows'] = [rows[row] for row in cluster['rows']]
+    results['near_duplicate_rows'] = [(rows[row], rows[representative])
+                                      for row, representative in results['near_duplicate_rows']]
+    return results
+
+def analyze_code(df: pd.DataFrame, pbar: tqdm, workers: int = 1, cache: RowCache = None,
+                 metrics_path: str = None, profiler: StageProfiler = None) -> Tuple[Dict, Dict]:
+    """分析代码并返回结果（单次遍历完成长度、复杂度、重复度和熵分析）
+    
+    Args:
+        df: 包含text列的DataFrame，可选的path列作为行键写入结果
+        pbar: 进度条
+        workers: 并行进程数，大于1时分块并行分析后合并结果
+        cache: 可选的逐行分析记录缓存，未变化的行直接复用缓存结果
+        metrics_path: 可选的逐行指标表输出路径（.parquet或.arrow）
+        profiler: 记录各阶段耗时的剖析器，为None时新建；保存在结果的'profile'中
+        
+    Returns:
+        tuple: (分析结果, 可持久化的累加状态)
+    """
+    profiler = profiler or StageProfiler()
+    engine = AnalysisEngine(cache=cache)
+    texts = list(df['text'])
+    row_keys = list(df['path']) if 'path' in df.columns else None
+    with profiler.stage('analyze'), open_row_metrics(metrics_path, engine, row_keys) as row_sink:
+        accumulators = engine.accumulate(texts, pbar, workers=workers, row_sink=row_sink, profiler=profiler)
+    print_row_metrics_written(row_sink)
+    with profiler.stage('collect'):
+        results = engine.collect_results(accumulators, texts, profiler)
+    if row_keys is not None:
+        attach_row_keys(results, row_keys)
+    results['profile'] = profiler
+    return results, build_state(engine, accumulators, streaming=False)
+
 def print_analysis_stats(results: Dict, file_name: str):
     """打印分析统计信息"""
     print(f"\n=== Analysis Statistics for {file_name} ===")
@@ -101,6 +179,12 @@ def print_analysis_stats(results: Dict, file_name: str):
     print(f"Median duplication ratio: {line_stats['ratios']['median']:.2%}")
     print(f"Files with high duplication: {line_stats['high_duplication_count']} ({line_stats['high_duplication_count']/line_stats['total_files']:.2%})")
     
+    if 'cross_file' in duplication_stats:
+        cross_file = duplication_stats['cross_file']
+        print("\nCross-file Near-duplicates:")
+        print(f"Near-duplicate clusters: {cross_file['cluster_count']}")
+        print(f"Redundant rows: {cross_file['duplicate_rows']} ({cross_file['duplicate_fraction']:.2%})")
+    
     # 熵统计
     print("\n--- Code Entropy Statistics ---")
     entropy_stats = results['entropy_stats']
@@ -116,15 +200,77 @@ def print_analysis_stats(results: Dict, file_name: str):
     for block in entropy_stats['block_stats']['top_blocks'][:5]:
         print(f"  {block['block']}: {block['count']} occurrences")
 
-def save_analysis_report(results: Dict, stats_dir: str, filename: str) -> Tuple[str, str]:
-    """保存分析报告和统计信息"""
-    # 创建文件名（不带扩展名）
-    base_name = f"{Path(filename).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    window_stats = entropy_stats['window_stats']
+    print(f"\nSliding-window Entropy ({window_stats['window_size']} lines):")
+    print(f"Windows: {window_stats['total_windows']}")
+    print(f"Low-entropy windows: {window_stats['low_entropy_windows']} ({window_stats['low_entropy_ratio']:.2%})")
+    print(f"High-entropy windows: {window_stats['high_entropy_windows']} ({window_stats['high_entropy_ratio']:.2%})")
+    print(f"Mean per-file low-entropy fraction: {window_stats['file_low_entropy_fraction']['mean']:.2%}")
+    print(f"Mean per-file high-entropy fraction: {window_stats['file_high_entropy_fraction']['mean']:.2%}")
+
+    # 抽样近似评估的置信区间
+    if results.get('sampling'):
+        print_sampling_summary(results['sampling'])
+    
+    # 各阶段耗时
+    profile = results.get('profile')
+    if profile:
+        print_profile(profile)
+
+def print_profile(profile: Dict):
+    """打印报告profile部分的各阶段和各分析器耗时"""
+    print("\n--- Profile ---")
+    for name, stage in profile['stages'].items():
+        line = f"{name}: {stage['wall_s']:.2f}s wall, {stage['cpu_s']:.2f}s CPU"
+        if stage.get('rows_per_s'):
+            line += f", {stage['rows_per_s']:.0f} rows/s"
+        if 'peak_rss_mb' in stage:
+            line += f", peak RSS {stage['peak_rss_mb']:.0f} MB"
+        if 'peak_traced_mb' in stage:
+            line += f", peak allocated {stage['peak_traced_mb']:.1f} MB"
+        print(line)
+    
+    print("\nAnalyzers (summed over worker processes):")
+    analyzers = sorted(profile['analyzers'].items(), key=lambda item: item[1]['wall_s'], reverse=True)
+    for name, analyzer in analyzers:
+        sub_stages = ', '.join(f"{sub_stage} {stats['wall_s']:.2f}s"
+                               for sub_stage, stats in analyzer['stages'].items())
+        print(f"  {name}: {analyzer['wall_s']:.2f}s wall, {analyzer['cpu_s']:.2f}s CPU ({sub_stages})")
+    
+    print("\nCounters:")
+    for name, value in profile['counters'].items():
+        print(f"  {name}: {value}")
+
+def new_report_dir(stats_dir: str, filename: str) -> str:
+    """按数据集名称和当前时间生成新的报告目录路径（不创建目录）"""
+    return os.path.join(stats_dir, f"{Path(filename).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+def save_analysis_report(results: Dict, stats_dir: str, filename: str, report_dir: str = None,
+                         scores: Dict = None) -> Tuple[str, str]:
+    """保存分析报告和统计信息
     
-    # 创建报告目录
-    report_dir = os.path.join(stats_dir, base_name)
+    Args:
+        report_dir: 已有的报告目录，提供时覆盖其中的报告（增量更新），否则按时间新建
+        scores: 可选的评分结果，一并保存
+    """
+    if report_dir is None:
+        report_dir = new_report_dir(stats_dir, filename)
+    base_name = os.path.basename(os.path.normpath(report_dir))
     os.makedirs(report_dir, exist_ok=True)
     
+    # 行键（源文件路径）和近似重复的冗余行与数据量成正比，单独保存为按行号索引的表，不写入JSON报告
+    row_keys = results.get('row_keys')
+    near_duplicate_rows = results.get('near_duplicate_rows')
+    results = {key: value for key, value in results.items() if key not in ('row_keys', 'near_duplicate_rows')}
+    if row_keys is not None:
+        pd.DataFrame({'row': range(len(row_keys)), 'path': row_keys}).to_csv(
+            os.path.join(report_dir, f"{base_name}_rows.csv"), index=False)
+    if near_duplicate_rows is not None:
+        redundant = pd.DataFrame(near_duplicate_rows, columns=['row', 'representative'])
+        if row_keys is not None:
+            redundant['path'] = [row_keys[row] for row in redundant['row']]
+        redundant.to_csv(os.path.join(report_dir, f"{base_name}_near_duplicates.csv"), index=False)
+    
     # 保存JSON报告
     report_path = os.path.join(report_dir, f"{base_name}_report.json")
     with open(report_path, 'w') as f:
@@ -140,50 +286,13 @@ def save_analysis_report(results: Dict, stats_dir: str, filename: str) -> Tuple[
         print_analysis_stats(results, filename)
         sys.stdout = original_stdout
     
+    # 保存评分
+    if scores is not None:
+        with open(os.path.join(report_dir, f"{base_name}_scores.json"), 'w') as f:
+            json.dump(scores, f, indent=4, default=float)
+    
     return report_dir, report_path
 
-def generate_visualizations(results: Dict, df: pd.DataFrame, output_dir: str, visualizer: CodeVisualizer):
-    """生成可视化图表"""
-    # 代码长度分布
-    visualizer.plot_length_distribution(
-        lengths=df['text'].str.len(),
-        title='Distribution of Code Lengths',
-        output_dir=output_dir
-    )
-    
-    # 行长度分布
-    visualizer.plot_line_length_distribution(
-        line_lengths=[len(line) for code in df['text'] for line in code.split('\n')],
-        output_dir=output_dir
-    )
-    
-    # 复杂度分布
-    visualizer.plot_complexity_distribution(
-        complexity_ratio=results['complexity_stats']['code_lines_ratio']['mean'],
-        output_dir=output_dir
-    )
-    
-    # 重复度分析
-    visualizer.plot_duplication_analysis(
-        duplication_stats=results['duplication_stats'],
-        output_dir=output_dir
-    )
-    
-    # 熵分析
-    visualizer.plot_entropy_analysis(
-        entropy_stats=results['entropy_stats'],
-        output_dir=output_dir
-    )
-
-def print_score_summary(scores: Dict, title: str = ""):
-    """打印评分摘要"""
-    print(f"\n=== {title} ===")
-    print(f"Final Score: {scores['score']:.1f}")
-    print(f"Grade: {scores['grade']}")
-    print("\nDimension Scores:")
-    for dim, score in scores['dimension_scores'].items():
-        print(f"  {dim}: {score:.1f}")
-
 def calculate_dataset_average(all_scores: List[Dict]) -> Dict:
     """计算数据集的平均分数"""
     if not all_scores:
@@ -203,75 +312,612 @@ def calculate_dataset_average(all_scores: List[Dict]) -> Dict:
     # 计算总分平均分
     avg_scores['score'] = np.mean([s['score'] for s in all_scores])
     
-    # 确定总体评级
-    if avg_scores['score'] >= 90:
-        avg_scores['grade'] = 'A'
-    elif avg_scores['score'] >= 80:
-        avg_scores['grade'] = 'B'
-    elif avg_scores['score'] >= 70:
-        avg_scores['grade'] = 'C'
-    elif avg_scores['score'] >= 60:
-        avg_scores['grade'] = 'D'
-    else:
-        avg_scores['grade'] = 'F'
-        
+    # 确定总体评级（与逐个数据集评分和抽样评级概率使用同一评级标准）
+    avg_scores['grade'] = CodeScorer.grade(avg_scores['score'])
+    
     return avg_scores
 
-def main():
+def analyze_file_stream(file_path: str, pbar: tqdm, chunksize: int, workers: int = 1,
+                        cache: RowCache = None, metrics_path: str = None,
+                        profiler: StageProfiler = None) -> Tuple[Dict, Dict]:
+    """以流式模式分块读取并分析数据文件，内存占用与文件大小无关
+    
+    Args:
+        profiler: 记录各阶段耗时的剖析器（逐块读取的时间记为read），为None时新建
+    
+    Returns:
+        tuple: (分析结果, 可持久化的累加状态)，失败时为(None, None)
+    """
+    try:
+        profiler = profiler or StageProfiler()
+        source = source_signature(file_path)
+        engine = AnalysisEngine(cache=cache)
+        row_keys = [] if os.path.isdir(file_path) else None
+        chunks = profiler.iterate('read', iter_text_batches(file_path, chunksize, row_keys))
+        with profiler.stage('analyze'), open_row_metrics(metrics_path, engine, row_keys) as row_sink:
+            accumulators = engine.accumulate_stream(chunks, pbar, workers=workers, row_sink=row_sink,
+                                                    profiler=profiler)
+        print(f"\nSuccessfully analyzed {file_path} in streaming mode")
+        print_row_metrics_written(row_sink)
+        with profiler.stage('collect'):
+            results = engine.collect_results(accumulators, profiler=profiler)
+        if row_keys is not None:
+            attach_row_keys(results, row_keys)
+        results['profile'] = profiler
+        return results, build_state(engine, accumulators, True, source)
+    except Exception as e:
+        print(f"Error analyzing {file_path}: {str(e)}")
+        return None, None
+
+def update_file_analysis(file_path: str, state: Dict, pbar: tqdm, chunksize: int = None, workers: int = 1,
+                         cache: RowCache = None, metrics_path: str = None,
+                         profiler: StageProfiler = None) -> Tuple[Dict, Dict]:
+    """将数据文件在上次分析后追加的行合并到保存的累加状态中，耗时只与追加的数据量有关
+    
+    只有CSV和JSONL文件支持按字节偏移读取追加的行。精确模式的状态合并后，重复块的示例代码不再可用（原始文本未保存）。
+    逐行指标表只包含追加的行，文件名带有第一行的行号，不覆盖之前的指标表。
+    
+    Returns:
+        tuple: (分析结果, 更新后的累加状态)；分析配置变化、格式不支持追加或文件不是仅被追加时为(None, None)，
+            需重新完整分析
+    """
+    profiler = profiler or StageProfiler()
+    engine = AnalysisEngine(cache=cache)
+    if not supports_append(file_path):
+        print(f"\nIncremental updates are not supported for {file_path}, re-analyzing it")
+        return None, None
+    if state['config_key'] != engine.config_key:
+        print(f"\nAnalysis configuration changed since the last report, re-analyzing {file_path}")
+        return None, None
+    offset = appended_offset(state['source'], file_path)
+    if offset is None:
+        print(f"\n{file_path} was modified, not only appended to, since the last report; re-analyzing it")
+        return None, None
+    
+    try:
+        source = source_signature(file_path)
+        chunks = profiler.iterate('read', iter_appended_chunks(file_path, offset, chunksize or DEFAULT_UPDATE_CHUNKSIZE))
+        if metrics_path is not None:
+            base, extension = os.path.splitext(metrics_path)
+            metrics_path = f"{base}_from{state['rows']}{extension}"
+        with profiler.stage('analyze'), open_row_metrics(metrics_path, engine) as row_sink:
+            partial = engine.accumulate_stream(chunks, pbar, workers=workers, streaming=state['streaming'],
+                                               start=state['rows'], row_sink=row_sink, profiler=profiler)
+        print_row_metrics_written(row_sink)
+        accumulators = state['accumulators']
+        for name, accumulator in accumulators.items():
+            accumulator.merge(partial[name])
+        print(f"\nMerged {partial['length_stats'].total_files} appended records into the previous "
+              f"analysis of {file_path} ({state['rows']} records)")
+        with profiler.stage('collect'):
+            results = engine.collect_results(accumulators, profiler=profiler)
+        results['profile'] = profiler
+        return results, build_state(engine, accumulators, state['streaming'], source)
+    except Exception as e:
+        print(f"Error updating {file_path}: {str(e)}")
+        return None, None
+
+def sample_and_analyze_file(file_path: str, sampling: Dict, pbar: tqdm, chunksize: int = None, workers: int = 1,
+                            cache: RowCache = None, profiler: StageProfiler = None) -> Tuple[Dict, Dict]:
+    """近似评估：一次流式遍历抽取样本行，完整分析样本，并估计各指标、得分和评级的置信区间
+    
+    报告中的行号为原始数据集中的行号；块级重复块和近似重复簇只在样本内部检测。
+    抽样分析的结果不能合并追加的数据，不保存累加状态。
+    
+    Args:
+        sampling: 抽样配置（SAMPLING_CONFIG的各项，以及样本量size和是否按长度分层stratify）
+        chunksize: 抽样时每批读取的行数，为None时使用默认批大小
+    
+    Returns:
+        tuple: (分析结果, None)，结果的'sampling'中为抽样方法和估计；失败时为(None, None)
+    """
+    try:
+        profiler = profiler or StageProfiler()
+        sampler = RowSampler(sampling['size'], sampling['stratify'], sampling['seed'])
+        row_keys = [] if os.path.isdir(file_path) else None
+        with profiler.stage('sample'):
+            for texts in profiler.iterate('read', iter_text_batches(file_path, chunksize or DEFAULT_BATCH_SIZE,
+                                                                    row_keys)):
+                sampler.add(texts)
+            rows, strata, texts = sampler.sample()
+        if not texts:
+            print(f"No records sampled from {file_path}")
+            return None, None
+        print(f"\nSampled {len(rows)} of {sampler.population_rows} records from {file_path}")
+        
+        engine = AnalysisEngine(cache=cache)
+        collector = RowMetricsCollector()
+        with profiler.stage('analyze'):
+            accumulators = engine.accumulate(texts, pbar, workers=workers, row_sink=collector, profiler=profiler)
+        with profiler.stage('collect'):
+            results = engine.collect_results(accumulators, texts, profiler)
+        with profiler.stage('estimate'):
+            duplication_stats = results['duplication_stats']
+            estimate = SampleEstimator(engine, config=sampling).estimate(
+                collector.rows, strata, accumulators['near_duplicate_stats'].row_ids,
+                [row for row, _ in results['near_duplicate_rows']], duplication_stats['block_level']['top_blocks'])
+        map_sample_rows(results, rows)
+        if row_keys is not None:
+            attach_row_keys(results, row_keys)
+        results['sampling'] = dict(sampler.describe(strata), estimate=estimate)
+        results['profile'] = profiler
+        return results, None
+    except Exception as e:
+        print(f"Error sampling {file_path}: {str(e)}")
+        return None, None
+
+def load_and_analyze_file(file_path: str, workers: int = 1, chunksize: int = None, cache: RowCache = None,
+                          previous_state: Dict = None, pbar: tqdm = None,
+                          metrics_path: str = None, profiler: StageProfiler = None,
+                          sampling: Dict = None) -> Tuple[Dict, Dict]:
+    """加载并分析单个数据文件（在文件级工作进程中运行）
+    
+    Args:
+        previous_state: 上次分析保存的累加状态，提供时只分析追加的行
+        metrics_path: 可选的逐行指标表输出路径
+        profiler: 记录各阶段耗时的剖析器，为None时新建
+        sampling: 可选的抽样配置，提供时只分析抽取的样本（见sample_and_analyze_file）
+    
+    Returns:
+        tuple: (分析结果, 可持久化的累加状态)，加载失败时为(None, None)
+    """
+    profiler = profiler or StageProfiler()
+    if sampling is not None:
+        return sample_and_analyze_file(file_path, sampling, pbar, chunksize, workers, cache, profiler)
+    if previous_state is not None:
+        results, state = update_file_analysis(file_path, previous_state, pbar, chunksize, workers, cache,
+                                              metrics_path, profiler)
+        if results is not None:
+            return results, state
+    if chunksize:
+        return analyze_file_stream(file_path, pbar, chunksize, workers, cache, metrics_path, profiler)
+    source = source_signature(file_path)
+    with profiler.stage('load'):
+        df = load_data_file(file_path)
+    if df is None:
+        return None, None
+    results, state = analyze_code(df, pbar, workers=workers, cache=cache, metrics_path=metrics_path,
+                                  profiler=profiler)
+    state['source'] = source
+    return results, state
+
+def filter_dataset(file_path: str, output_dir: str, filter_config: Dict, chunksize: int = None, workers: int = 1,
+                   cache: RowCache = None, output_format: str = 'parquet',
+                   shard_rows: int = DEFAULT_SHARD_ROWS) -> Dict:
+    """以流式管线过滤一个数据集，内存占用与数据量无关
+    
+    逐块读取完整记录，按开销从低到高的级联阶段计算逐行指标和逐行评分（与数据集评分规则相同），
+    被前面阶段剔除的行不再运行后面的阶段；保留的行写入kept-*分片，剔除的行连同reject_reason列
+    写入rejected-*分片，两者都附加score和grade列。
+    
+    Args:
+        file_path: 数据文件或源代码目录
+        output_dir: 该数据集的输出目录
+        filter_config: 过滤配置（见FILTER_CONFIG）
+        
+    Returns:
+        dict: 过滤摘要（同时保存为output_dir/filter_summary.json）
+    """
+    engine = AnalysisEngine(cache=cache)
+    row_filter = RowFilter(engine, filter_config)
+    batches = ((frame, frame['text'].tolist())
+               for frame in iter_record_batches(file_path, chunksize or DEFAULT_FILTER_CHUNKSIZE))
+    reason_counts = Counter()
+    stage_stats = {stage['name']: [0, 0, 0.0] for stage in row_filter.stages}
+    score_total = 0.0
+    scored_rows = 0
+    
+    start_time = time.perf_counter()
+    with ShardWriter(output_dir, 'kept', output_format, shard_rows, OUTPUT_COLUMN_TYPES) as kept_writer, \
+            ShardWriter(output_dir, 'rejected', output_format, shard_rows, OUTPUT_COLUMN_TYPES) as rejected_writer, \
+            tqdm(desc="Filter Progress", unit="rows", position=1, leave=False) as pbar:
+        for frame, (evaluations, batch_stage_stats) in map_chunks(row_filter.evaluate_chunk, batches, workers):
+            kept, rejected, reasons = row_filter.filter_batch(frame, evaluations)
+            for name, stats in batch_stage_stats.items():
+                stage_stats[name] = [total + value for total, value in zip(stage_stats[name], stats)]
+            kept_writer.write(kept)
+            rejected_writer.write(rejected)
+            reason_counts.update(reasons)
+            scores = pd.concat([kept['score'], rejected['score']]).dropna()
+            score_total += scores.sum()
+            scored_rows += len(scores)
+            pbar.update(len(frame))
+    elapsed = time.perf_counter() - start_time
+    
+    total_rows = kept_writer.rows_written + rejected_writer.rows_written
+    summary = {
+        'input': file_path,
+        'rows': total_rows,
+        'kept_rows': kept_writer.rows_written,
+        'rejected_rows': rejected_writer.rows_written,
+        'kept_fraction': kept_writer.rows_written / total_rows if total_rows > 0 else 0.0,
+        # 提前剔除的行未完整评分（评分为NaN），平均分只统计完整评分的行
+        'fully_scored_rows': scored_rows,
+        'mean_score_fully_scored': score_total / scored_rows if scored_rows > 0 else None,
+        'reject_reasons': dict(reason_counts.most_common()),
+        'cascade': cascade_summary(row_filter, stage_stats),
+        'kept_shards': [os.path.basename(path) for path in kept_writer.paths],
+        'rejected_shards': [os.path.basename(path) for path in rejected_writer.paths],
+        'elapsed_seconds': elapsed,
+        'rows_per_second': total_rows / elapsed if elapsed > 0 else None,
+        'config': row_filter.config,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'filter_summary.json'), 'w') as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+def cascade_summary(row_filter: RowFilter, stage_stats: Dict) -> Dict:
+    """汇总级联各阶段运行的行数、剔除的行数和耗时，估算提前剔除节省的分析时间
+    
+    节省时间按各阶段实测的每行耗时乘以该阶段跳过的行数估算（多进程时为各进程耗时之和）。
+    未启用级联时全部剔除都计在最后一个阶段。
+    """
+    evaluated = stage_stats[row_filter.stages[0]['name']][0]
+    stages = []
+    saved = 0.0
+    for stage in row_filter.stages:
+        rows, rejected, seconds = stage_stats[stage['name']]
+        seconds_per_row = seconds / rows if rows > 0 else 0.0
+        saved += (evaluated - rows) * seconds_per_row
+        stages.append({
+            'stage': stage['name'],
+            'relative_cost': stage['cost'],
+            'rows': rows,
+            'rejected_rows': rejected,
+            'skipped_rows': evaluated - rows,
+            'seconds': seconds,
+        })
+    spent = sum(stage['seconds'] for stage in stages)
+    return {
+        'enabled': row_filter.cascade,
+        'stages': stages,
+        'analysis_seconds': spent,
+        'estimated_seconds_saved': saved,
+        'estimated_saved_fraction': saved / (spent + saved) if spent + saved > 0 else 0.0,
+    }
+
+def print_filter_summary(summary: Dict, title: str = ""):
+    """打印过滤摘要"""
+    print(f"\n=== {title} ===")
+    print(f"Kept: {summary['kept_rows']} / {summary['rows']} rows ({summary['kept_fraction']:.2%})")
+    if summary['mean_score_fully_scored'] is not None:
+        print(f"Mean row score over {summary['fully_scored_rows']} fully scored rows: "
+              f"{summary['mean_score_fully_scored']:.1f}")
+    for reason, count in summary['reject_reasons'].items():
+        print(f"  rejected by {reason}: {count}")
+    cascade = summary['cascade']
+    if cascade['enabled']:
+        for stage in cascade['stages']:
+            print(f"  stage {stage['stage']}: ran on {stage['rows']} rows, removed {stage['rejected_rows']}, "
+                  f"{stage['seconds']:.2f}s")
+        print(f"Early exit saved ~{cascade['estimated_seconds_saved']:.1f}s of analysis "
+              f"({cascade['estimated_saved_fraction']:.0%})")
+    if summary['rows_per_second'] is not None:
+        print(f"Throughput: {summary['rows_per_second']:.0f} rows/s ({summary['elapsed_seconds']:.1f}s)")
+
+def parse_threshold(text: str) -> Tuple[str, float]:
+    """解析NAME=VALUE形式的过滤阈值，VALUE为none时取消该阈值"""
+    name, separator, value = text.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected NAME=VALUE, got {text}")
+    try:
+        return name.strip(), None if value.strip().lower() == 'none' else float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid threshold value: {text}")
+
+def write_report(results: Dict, stats_dir: str, data_file: str, scores: Dict = None,
+                 state: Dict = None, report_dir: str = None) -> str:
+    """保存报告、评分和累加状态（在后台渲染进程中运行）
+    
+    Args:
+        report_dir: 报告目录，增量更新时为已有目录，其中的文件被覆盖
+    
+    Returns:
+        str: 报告目录
+    """
+    report_dir, _ = save_analysis_report(results, stats_dir, data_file, report_dir, scores)
+    if state is not None:
+        save_state(report_dir, state)
+    return report_dir
+
+def load_data_file_profiled(file_path: str, profiler: StageProfiler) -> pd.DataFrame:
+    """加载数据文件并记录加载时间（在预读线程中与上一个文件的分析同时运行，不记录内存）"""
+    with profiler.stage('load', memory=False):
+        return load_data_file(file_path)
+
+def iter_analyzed_files(paths: List[str], data_files: List[str], jobs: int, workers: int, chunksize: int = None,
+                        cache: RowCache = None, previous_states: List[Dict] = None,
+                        metrics_paths: List[str] = None, profile: bool = False, sampling: Dict = None):
+    """调度数据文件的加载与分析，按完成顺序产出(文件序号, 分析结果, 累加状态)
+    
+    jobs为1时在主进程中逐个分析，同时由后台线程预读下一个文件（流式模式、增量更新和抽样时逐块读取，不预读整个文件）；
+    jobs大于1时多个文件在进程池中同时加载和分析。
+    
+    Args:
+        paths: 数据文件或源代码目录路径
+        data_files: 与paths对应的数据集名称，用于输出和报告目录命名
+        metrics_paths: 可选的各数据集逐行指标表输出路径
+        profile: 是否按分析器收集cProfile统计并跟踪内存分配（见StageProfiler）
+        sampling: 可选的抽样配置，提供时每个文件只分析抽取的样本
+    """
+    if previous_states is None:
+        previous_states = [None] * len(paths)
+    if metrics_paths is None:
+        metrics_paths = [None] * len(paths)
+    
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(load_and_analyze_file, path, workers, chunksize, cache, previous_states[index],
+                                None, metrics_paths[index], StageProfiler(profile, profile), sampling): index
+                for index, path in enumerate(paths)
+            }
+            for future in as_completed(futures):
+                yield (futures[future],) + future.result()
+        return
+    
+    if chunksize or sampling is not None or any(state is not None for state in previous_states):
+        for index, path in enumerate(paths):
+            print(f"\nProcessing: {data_files[index]}")
+            with tqdm(desc="File Progress", unit="rows", position=1, leave=False) as file_pbar:
+                yield (index,) + load_and_analyze_file(path, workers, chunksize, cache, previous_states[index],
+                                                       file_pbar, metrics_paths[index],
+                                                       StageProfiler(profile, profile), sampling)
+        return
+    
+    with ThreadPoolExecutor(max_workers=1) as loader:
+        def prefetch(index):
+            # 读取前记录文件大小，之后追加的数据由增量更新处理
+            profiler = StageProfiler(profile, profile)
+            return (source_signature(paths[index]), profiler,
+                    loader.submit(load_data_file_profiled, paths[index], profiler))
+        
+        next_source, next_profiler, next_df = prefetch(0)
+        for index in range(len(paths)):
+            print(f"\nProcessing: {data_files[index]}")
+            source, profiler, df = next_source, next_profiler, next_df.result()
+            # 分析当前文件时预读下一个文件
+            if index + 1 < len(paths):
+                next_source, next_profiler, next_df = prefetch(index + 1)
+            if df is None:
+                yield index, None, None
+                continue
+            
+            # 单文件进度条
+            with tqdm(total=len(df), desc="File Progress", position=1, leave=False) as file_pbar:
+                results, state = analyze_code(df, file_pbar, workers=workers, cache=cache,
+                                              metrics_path=metrics_paths[index], profiler=profiler)
+            state['source'] = source
+            yield index, results, state
+
+def run_filter(args: argparse.Namespace, paths: List[str], data_files: List[str], cache: RowCache = None):
+    """过滤模式：依次过滤每个数据集，输出到args.filter下以数据集命名的目录"""
+    filter_config = dict(FILTER_CONFIG)
+    if args.min_score is not None:
+        filter_config['min_score'] = args.min_score
+    filter_config.update(args.threshold)
+    if args.no_cascade:
+        filter_config['cascade'] = False
+    
+    for path, data_file in zip(paths, data_files):
+        print(f"\nFiltering: {data_file}")
+        output_dir = os.path.join(args.filter, Path(data_file).stem)
+        summary = filter_dataset(path, output_dir, filter_config, args.chunksize, args.workers, cache,
+                                 args.output_format, args.shard_rows)
+        print_filter_summary(summary, f"Filter Summary - {data_file}")
+        print(f"\nFiltered dataset written to: {output_dir}")
+    
+    if cache is not None:
+        cache.close()
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="DQEvaluator: Quality Assessment Tool for LLM Training Datasets")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes used to analyze each data file (default: 1)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Number of data files loaded and analyzed concurrently (default: 1)")
+    parser.add_argument('--render-workers', type=int, default=2,
+                        help="Number of background processes writing reports and rendering plots, each plot "
+                             "being a separate task (default: 2)")
+    parser.add_argument('--no-plots', action='store_true',
+                        help="Write the analysis reports without rendering plots; render them later with --plot")
+    parser.add_argument('--plot', action='append', default=None, metavar='REPORT_DIR',
+                        help="Render the plots of an existing report directory from its saved JSON report "
+                             "without re-analyzing the data (may be repeated)")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Stream each data file in chunks of this many rows with bounded-memory statistics "
+                             "(medians and quantiles become sketch estimates)")
+    parser.add_argument('--cache', default=None, metavar='PATH',
+                        help="SQLite file caching per-row analysis results; unchanged rows are not re-analyzed "
+                             "and the cache is invalidated automatically when the analysis configuration changes")
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_CACHE_SIZE_MB, metavar='MB',
+                        help=f"Maximum row cache size in MB, least recently used rows are evicted "
+                             f"(default: {DEFAULT_CACHE_SIZE_MB})")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="Remove all entries from the row cache before analyzing")
+    parser.add_argument('--source-dir', action='append', default=None, metavar='DIR',
+                        help="Analyze all Verilog sources (.v/.sv/.vh) under this directory tree as one dataset, "
+                             "recording each file's path as its row key, instead of the files in data/ "
+                             "(may be repeated)")
+    parser.add_argument('--row-metrics', default=None, metavar='DIR',
+                        help="Write one row of metrics per input record (lengths, line ratios, duplication, "
+                             "entropy, block counts) to DIR/<name>_metrics.parquet, streamed in batches")
+    parser.add_argument('--row-metrics-format', choices=sorted(ROW_METRICS_FORMATS), default='parquet',
+                        help="File format of the per-row metrics table (default: parquet)")
+    parser.add_argument('--filter', default=None, metavar='DIR',
+                        help="Filter mode: stream each dataset, score every row and write the rows that pass to "
+                             "sharded files under DIR/<name>/ (rejected rows go to separate shards with a "
+                             "reject_reason column) instead of writing analysis reports")
+    parser.add_argument('--min-score', type=float, default=None,
+                        help=f"Minimum per-row score kept in filter mode (default: {FILTER_CONFIG['min_score']})")
+    parser.add_argument('--threshold', type=parse_threshold, action='append', default=[], metavar='NAME=VALUE',
+                        help="Per-row metric limit in filter mode, e.g. max_duplication_ratio=0.5 or "
+                             "min_text_length=200 (any min_/max_ plus a per-row metric column; may be repeated)")
+    parser.add_argument('--no-cascade', action='store_true',
+                        help="Run every analysis stage on every row in filter mode instead of skipping the more "
+                             "expensive stages for rows already rejected (reject_reason then lists all failed checks)")
+    parser.add_argument('--output-format', choices=sorted(SHARD_FORMATS), default='parquet',
+                        help="File format of the filter mode shards (default: parquet)")
+    parser.add_argument('--shard-rows', type=int, default=DEFAULT_SHARD_ROWS,
+                        help=f"Maximum rows per output shard in filter mode (default: {DEFAULT_SHARD_ROWS})")
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                        help="Also collect cProfile statistics per analyzer and trace memory allocations per stage; "
+                             "writes DIR/<name>_<analyzer>.prof (pstats) with a text summary (slows the analysis "
+                             "down; stage timings and counters are always in the report's profile section)")
+    parser.add_argument('--sample', type=float, default=None, metavar='SIZE',
+                        help="Approximate mode: analyze a uniform random sample of SIZE rows (or the fraction SIZE "
+                             "of the rows if below 1) drawn in one streaming pass, and report bootstrap confidence "
+                             "intervals for every metric, the score and the grade")
+    parser.add_argument('--stratify', action='store_true',
+                        help="Stratify --sample by code length (power-of-two length buckets) so that short and long "
+                             "files are represented in proportion")
+    parser.add_argument('--sample-seed', type=int, default=SAMPLING_CONFIG['seed'],
+                        help=f"Random seed of --sample and the bootstrap (default: {SAMPLING_CONFIG['seed']})")
+    parser.add_argument('--bootstrap', type=int, default=SAMPLING_CONFIG['bootstrap_replicates'], metavar='N',
+                        help=f"Bootstrap replicates for the --sample confidence intervals "
+                             f"(default: {SAMPLING_CONFIG['bootstrap_replicates']})")
+    parser.add_argument('--update', action='store_true',
+                        help="Merge rows appended to each CSV or JSONL file since its latest report into the saved "
+                             "aggregate state and rewrite that report, instead of re-analyzing everything")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    if args.plot:
+        run_plot(args.plot, args.render_workers)
+        return
+    
     # 设置数据和输出目录
     data_dir = "data"
     stats_dir = "results"
     os.makedirs(stats_dir, exist_ok=True)
     
-    # 获取所有CSV文件
-    csv_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
-    total_files = len(csv_files)
+    if args.source_dir:
+        # 每个源代码目录树作为一个数据集，以目录名命名
+        paths = [os.path.normpath(source_dir) for source_dir in args.source_dir]
+        missing = [path for path in paths if not os.path.isdir(path)]
+        if missing:
+            print(f"Source directory not found: {', '.join(missing)}")
+            return
+        data_files = [os.path.basename(os.path.abspath(path)) for path in paths]
+        total_files = len(paths)
+        print(f"\nFound {total_files} source trees to analyze")
+    else:
+        # 获取所有数据文件（CSV、JSONL、Parquet、Arrow IPC）
+        data_files = sorted(f for f in os.listdir(data_dir) if is_data_file(f))
+        paths = [os.path.join(data_dir, data_file) for data_file in data_files]
+        total_files = len(data_files)
+        
+        if total_files == 0:
+            print(f"No data files found in the {data_dir} directory!")
+            return
+            
+        print(f"\nFound {total_files} data files to analyze")
+    
+    # 抽样近似评估的配置
+    sampling = None
+    if args.sample is not None:
+        if args.sample <= 0 or args.bootstrap < 2:
+            print("--sample must be positive and --bootstrap at least 2")
+            return
+        if args.update or args.row_metrics or args.filter:
+            print("--sample cannot be combined with --update, --row-metrics or --filter")
+            return
+        sampling = dict(SAMPLING_CONFIG, size=args.sample, stratify=args.stratify, seed=args.sample_seed,
+                        bootstrap_replicates=args.bootstrap)
+    
+    # 逐行指标表输出路径
+    metrics_paths = None
+    if args.row_metrics:
+        metrics_paths = [row_metrics_path(args.row_metrics, data_file, args.row_metrics_format)
+                         for data_file in data_files]
+    
+    # 逐行分析记录缓存
+    cache = None
+    if args.cache:
+        cache = RowCache(args.cache, args.cache_size)
+        if args.clear_cache:
+            cache.clear()
     
-    if total_files == 0:
-        print(f"No CSV files found in the {data_dir} directory!")
+    if args.filter:
+        run_filter(args, paths, data_files, cache)
         return
-        
-    print(f"\nFound {total_files} CSV files to analyze")
     
-    # 初始化评分器和可视化器
+    # 增量更新：读取每个文件最近一次报告保存的累加状态
+    report_dirs = [None] * total_files
+    previous_states = [None] * total_files
+    if args.update:
+        for index, data_file in enumerate(data_files):
+            report_dirs[index] = find_latest_report(stats_dir, data_file)
+            if report_dirs[index] is not None:
+                previous_states[index] = load_state(report_dirs[index])
+    
+    # 初始化评分器，报告和图表由后台进程生成，每个图表是一个独立任务
     scorer = CodeScorer()
-    visualizer = CodeVisualizer()
-    all_scores = []
+    all_scores = [None] * total_files
+    render_futures = {}
+    plot_futures = {}
     
     # 总进度条
-    with tqdm(total=total_files, desc="Total Progress", position=0) as total_pbar:
-        for csv_file in csv_files:
-            print(f"\nProcessing: {csv_file}")
-            
-            # 加载数据
-            df = load_csv_data(os.path.join(data_dir, csv_file))
-            if df is None:
+    with tqdm(total=total_files, desc="Total Progress", position=0) as total_pbar, \
+            ProcessPoolExecutor(max_workers=max(1, args.render_workers)) as renderer:
+        for index, results, state in iter_analyzed_files(paths, data_files, args.jobs, args.workers,
+                                                         args.chunksize, cache, previous_states, metrics_paths,
+                                                         args.profile is not None, sampling):
+            data_file = data_files[index]
+            if results is None:
                 total_pbar.update(1)
                 continue
-                
-            # 单文件进度条
-            with tqdm(total=100, desc="File Progress", position=1, leave=False) as file_pbar:
-                # 分析代码
-                results = analyze_code(df, file_pbar)
-                
-                # 评分
+            
+            # 评分，评分耗时与分析各阶段一起写入报告的profile部分
+            profiler = results.pop('profile')
+            with profiler.stage('score'), profiler.span('scorer.score_codebase'):
                 scores = scorer.score_codebase(results)
-                all_scores.append(scores)
-                
-                # 保存报告和统计信息
-                report_dir, report_path = save_analysis_report(results, stats_dir, csv_file)
-                
-                # 生成可视化
-                generate_visualizations(results, df, report_dir, visualizer)
-                
-                # 打印单文件评分结果
-                print_score_summary(scores, f"Code Quality Score - {csv_file}")
-                print(f"\nAnalysis report and visualizations saved to: {report_dir}")
+            if 'sampling' in results:
+                # 抽样评估的得分附带置信区间和各评级的概率
+                estimate = results['sampling']['estimate']['score']
+                scores['confidence_interval'] = {key: estimate[key] for key in
+                                                 ('ci_low', 'ci_high', 'grade_probabilities', 'grade_ambiguous')}
+            all_scores[index] = scores
+            results['profile'] = profiler.result()
+            if args.profile:
+                profiler.write_pstats(args.profile, Path(data_file).stem)
+                print(f"\ncProfile statistics for {data_file} written to: {args.profile}")
             
-            total_pbar.update(1)
+            # 打印单文件评分结果
+            print_score_summary(scores, f"Code Quality Score - {data_file}")
+            if 'sampling' in results:
+                print_sampling_summary(results['sampling'])
+            
+            # 保存报告和生成可视化在后台进行，不阻塞下一个文件的分析
+            report_dir = report_dirs[index] or new_report_dir(stats_dir, data_file)
+            future = renderer.submit(write_report, results, stats_dir, data_file, scores, state, report_dir)
+            future.add_done_callback(lambda _: total_pbar.update(1))
+            render_futures[future] = data_file
+            if not args.no_plots:
+                for future in submit_plots(renderer, results, report_dir):
+                    plot_futures[future] = report_dir
+        
+        for future in as_completed(render_futures):
+            data_file = render_futures[future]
+            try:
+                report_dir = future.result()
+                print(f"\nAnalysis report for {data_file} saved to: {report_dir}")
+            except Exception as e:
+                print(f"Error writing report for {data_file}: {str(e)}")
+        wait_for_plots(plot_futures)
+    
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f"\nRow cache {args.cache}: {cache_stats['entries']} entries, "
+              f"{cache_stats['size'] / (1024 * 1024):.1f} MB")
+        cache.close()
     
     # 计算并打印数据集平均分
-    dataset_avg = calculate_dataset_average(all_scores)
+    dataset_avg = calculate_dataset_average([scores for scores in all_scores if scores is not None])
     if dataset_avg:
         print("\n" + "="*50)
         print_score_summary(dataset_avg, "Dataset Average Scores")
@@ -0,0 +1,52 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""各测试共用的合成语料和结果比较"""
+import json
+import math
+
+import pytest
+
+from benchmarks.corpus_generator import VerilogCorpusGenerator
+
+# 测试语料：文件较短、跨文件重复率较高，使重复块和近似重复簇都能出现
+TEST_CORPUS_CONFIG = {'rows': 150, 'median_lines': 30, 'duplication_rate': 0.3, 'seed': 7}
+
+
+@pytest.fixture(scope='session')
+def corpus_frame():
+    """确定性的合成Verilog语料（只有text列的DataFrame）"""
+    return VerilogCorpusGenerator(TEST_CORPUS_CONFIG).dataframe()
+
+
+@pytest.fixture(scope='session')
+def corpus(corpus_frame):
+    """合成语料的代码文本列表"""
+    return list(corpus_frame['text'])
+
+
+def comparable(results):
+    """去掉分析结果中的性能剖析，并转换为JSON兼容的普通类型（numpy标量转为float）"""
+    results = {key: value for key, value in results.items() if key != 'profile'}
+    return json.loads(json.dumps(results, default=float))
+
+
+def assert_results_close(actual, expected, rel=1e-9, path=''):
+    """递归比较两个分析结果，浮点数按相对误差rel比较（在线统计的合并顺序不同时只差舍入误差）"""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and set(actual) == set(expected), path
+        for key in expected:
+            assert_results_close(actual[key], expected[key], rel, f'{path}/{key}')
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for index, (left, right) in enumerate(zip(actual, expected)):
+            assert_results_close(left, right, rel, f'{path}[{index}]')
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert isinstance(actual, float) and math.isnan(actual), f'{path}: {actual} != nan'
+    elif isinstance(expected, float) and not isinstance(actual, bool):
+        assert math.isclose(actual, expected, rel_tol=rel, abs_tol=1e-12), f'{path}: {actual} != {expected}'
+    else:
+        assert actual == expected, f'{path}: {actual} != {expected}'
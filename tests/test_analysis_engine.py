@@ -0,0 +1,86 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""融合分析引擎与各独立分析器的结果一致性测试"""
+import pytest
+
+from analyzers.analysis_engine import AnalysisEngine
+from analyzers.complexity_analyzer import ComplexityAnalyzer
+from analyzers.duplication_analyzer import DuplicationAnalyzer
+from analyzers.entropy_analyzer import EntropyAnalyzer
+from analyzers.length_analyzer import LengthAnalyzer
+from conftest import assert_results_close, comparable
+
+
+@pytest.fixture(scope='module')
+def engine_results(corpus):
+    """单进程对整个语料的精确分析结果"""
+    return comparable(AnalysisEngine().analyze(corpus))
+
+
+def test_engine_matches_standalone_analyzers(corpus_frame, engine_results):
+    """一次遍历的引擎结果与逐个分析器分别遍历DataFrame的结果一致"""
+    length_analyzer = LengthAnalyzer()
+    length_stats = engine_results['length_stats']
+    assert_results_close(length_stats['length_distribution'],
+                         comparable(dict(length_analyzer.analyze_code_length(corpus_frame))))
+    assert_results_close(length_stats['line_count_distribution'],
+                         comparable(dict(length_analyzer.analyze_line_counts(corpus_frame))))
+    assert_results_close(length_stats['line_length_stats'],
+                         comparable(length_analyzer.analyze_line_lengths(corpus_frame)))
+
+    assert_results_close(engine_results['complexity_stats'],
+                         comparable(ComplexityAnalyzer().analyze_code_complexity(corpus_frame)))
+    assert_results_close(engine_results['entropy_stats'],
+                         comparable(EntropyAnalyzer().analyze_code_entropy(corpus_frame)))
+    # 跨文件近似重复（cross_file）只由引擎统计
+    duplication_stats = comparable(DuplicationAnalyzer().analyze_code_duplication(corpus_frame))
+    for level in ('line_level', 'block_level'):
+        assert_results_close(engine_results['duplication_stats'][level], duplication_stats[level])
+
+
+def test_parallel_workers_match_single_process(corpus, engine_results):
+    """多进程分块分析并按行顺序合并后，结果与单进程一致（只差合并顺序带来的舍入误差）"""
+    parallel = AnalysisEngine().analyze(corpus, workers=2, chunk_size=40)
+    assert_results_close(comparable(parallel), engine_results)
+
+
+# 流式模式下由分位数草图估计的统计量，草图的相对误差不超过SKETCH_ACCURACY
+SKETCH_QUANTILE_KEYS = {'25%', '50%', '75%', 'median'}
+SKETCH_ACCURACY = 0.01
+
+
+def _split_sketch_estimates(results, path='', estimates=None):
+    """取出结果中的分位数估计（按路径）和分箱直方图的总数，其余部分原样返回"""
+    if estimates is None:
+        estimates = {}
+    if isinstance(results, dict):
+        exact = {}
+        for key, value in results.items():
+            if key in SKETCH_QUANTILE_KEYS:
+                estimates[f'{path}/{key}'] = value
+            elif key.endswith('_bins'):
+                # 分箱边界取自草图，只比较落入各箱的总数
+                estimates[f'{path}/{key}'] = sum(value['counts'])
+            elif key != 'example':  # 流式分析不保留文本，代码块示例由调用方之后补全
+                exact[key] = _split_sketch_estimates(value, f'{path}/{key}', estimates)[0]
+        return exact, estimates
+    if isinstance(results, list):
+        return [_split_sketch_estimates(item, f'{path}[{index}]', estimates)[0]
+                for index, item in enumerate(results)], estimates
+    return results, estimates
+
+
+def test_streaming_matches_exact_within_sketch_tolerance(corpus, engine_results):
+    """流式分块累加的结果中，在线统计与精确结果一致，分位数在草图误差范围内"""
+    chunks = [corpus[start:start + 40] for start in range(0, len(corpus), 40)]
+    streaming, streaming_estimates = _split_sketch_estimates(comparable(AnalysisEngine().analyze_stream(chunks)))
+    exact, exact_estimates = _split_sketch_estimates(engine_results)
+
+    assert_results_close(streaming, exact)
+    assert set(streaming_estimates) == set(exact_estimates)
+    for path, expected in exact_estimates.items():
+        assert streaming_estimates[path] == pytest.approx(expected, rel=SKETCH_ACCURACY), path
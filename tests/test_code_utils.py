@@ -0,0 +1,43 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""代码行标准化的测试"""
+import pytest
+
+from benchmarks.bench_normalize_line import normalize_line_reference
+from utils.code_utils import normalize_line
+
+# 覆盖各替换规则及其相互作用的代码行
+TRICKY_LINES = [
+    '',
+    '   ',
+    'assign data1 = 16;',
+    "assign x = 4'hF;",
+    "assign x = 4'hAB0;",
+    "assign x = 16'hFF;",
+    "assign x = 8'b1010;",
+    "assign x = 8'd255;",
+    "assign x = 'h1F;",
+    '$display("value %d", cnt2);',
+    '$display("a" , "b"1);',
+    'x"y"z = 1',
+    'reg [WIDTH-1:0] buf_ready1;\t// 32 bits',
+    'foo_bar baz 123abc a1b2 _9',
+    '"unterminated 42',
+]
+
+
+@pytest.mark.parametrize('line', TRICKY_LINES)
+def test_normalize_line_matches_reference_on_tricky_lines(line):
+    """单次记号扫描的结果与逐条re.sub的原实现一致"""
+    assert normalize_line(line) == normalize_line_reference(line)
+
+
+def test_normalize_line_matches_reference_on_corpus(corpus):
+    """合成语料的全部代码行上与原实现一致"""
+    for code in corpus:
+        for line in code.split('\n'):
+            assert normalize_line(line) == normalize_line_reference(line), line
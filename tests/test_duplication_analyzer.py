@@ -0,0 +1,121 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""winnowing指纹和克隆类的测试"""
+import random
+import string
+
+import pytest
+
+from analyzers.duplication_analyzer import DuplicationAnalyzer, normalize_code_lines
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return DuplicationAnalyzer()
+
+
+def random_lines(rng, count):
+    """互不相同、标准化后仍互不相同的代码行（标识符只含字母）"""
+    def name():
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(10))
+    return [f'assign {name()} = {name()} & {name()};' for _ in range(count)]
+
+
+def fingerprints(analyzer, lines):
+    """一个文件的指纹：{哈希: [(起始行, 结束行), ...]}"""
+    hashes, starts, ends = analyzer.winnow(normalize_code_lines(lines))
+    result = {}
+    for fingerprint, start, end in zip(hashes.tolist(), starts.tolist(), ends.tolist()):
+        result.setdefault(fingerprint, []).append((start, end))
+    return result
+
+
+def accumulate(analyzer, files):
+    """按DuplicationAnalyzer.analyze_code_duplication的方式累加各文件的重复度累加器"""
+    accumulator = analyzer.create_accumulator()
+    for index, lines in enumerate(files):
+        normalized_lines = normalize_code_lines(lines)
+        accumulator.add_line_duplicates(index, *analyzer.find_line_duplicates(lines, normalized_lines))
+        accumulator.add_fingerprints(index, *analyzer.winnow(normalized_lines))
+    return accumulator
+
+
+def test_winnowing_guarantees_shared_fingerprint(analyzer):
+    """两个文件共有的不少于min_block_size + winnow_window - 1行的代码段，在段内至少共享一个指纹"""
+    rng = random.Random(5)
+    guarantee = analyzer.min_block_size + analyzer.winnow_window - 1
+    for _ in range(200):
+        segment = random_lines(rng, guarantee)
+        first_prefix = rng.randint(0, 8)
+        second_prefix = rng.randint(0, 8)
+        first = random_lines(rng, first_prefix) + segment + random_lines(rng, rng.randint(0, 8))
+        second = random_lines(rng, second_prefix) + segment + random_lines(rng, rng.randint(0, 8))
+        first_fingerprints = fingerprints(analyzer, first)
+        second_fingerprints = fingerprints(analyzer, second)
+        shared = set(first_fingerprints) & set(second_fingerprints)
+        assert shared
+        for fingerprint in shared:
+            for start, end in first_fingerprints[fingerprint]:
+                assert first_prefix <= start and end <= first_prefix + guarantee
+            for start, end in second_fingerprints[fingerprint]:
+                assert second_prefix <= start and end <= second_prefix + guarantee
+
+
+def test_winnowing_skips_blank_and_comment_lines(analyzer):
+    """空白行和注释行不参与k-gram，插入它们不改变指纹哈希"""
+    rng = random.Random(6)
+    lines = random_lines(rng, 12)
+    padded = []
+    for line in lines:
+        padded.extend([line, '', '    // note'])
+    assert list(fingerprints(analyzer, lines)) == list(fingerprints(analyzer, padded))
+
+
+def test_clone_classes_split_at_differing_ranges(analyzer):
+    """[X, Y] / [X] / [Y]：两段分别在两个文件中重复，拆为两个克隆类"""
+    rng = random.Random(7)
+    block_x = random_lines(rng, 8)
+    block_y = random_lines(rng, 8)
+    files = [block_x + block_y, random_lines(rng, 3) + block_x, block_y + random_lines(rng, 3)]
+    accumulator = accumulate(analyzer, files)
+
+    classes, shared_count = accumulator.find_clone_classes()
+    assert shared_count > 0
+    assert sorted(sorted(row for row, _, _ in locations) for locations in classes.values()) == [[0, 1], [0, 2]]
+    for locations in classes.values():
+        for row, start, size in locations:
+            assert size >= analyzer.min_block_size
+            block = files[row][start:start + size]
+            assert all(line in block_x for line in block) or all(line in block_y for line in block)
+
+    block_level = accumulator.result(['\n'.join(lines) for lines in files])['block_level']
+    assert block_level['total_blocks'] == 2
+    assert block_level['rows_with_clones'] == 3
+
+
+def test_clone_class_within_one_file(analyzer):
+    """同一文件中不重叠的两次重复归为一个克隆类"""
+    rng = random.Random(8)
+    block = random_lines(rng, 8)
+    lines = block + random_lines(rng, 4) + block
+    classes, _ = accumulate(analyzer, [lines]).find_clone_classes()
+    assert len(classes) == 1
+    locations = next(iter(classes.values()))
+    assert [row for row, _, _ in locations] == [0, 0]
+    assert locations[1][1] - locations[0][1] == len(block) + 4
+
+
+def test_no_shared_fingerprints(analyzer):
+    """没有共享指纹（包括没有任何指纹）时没有克隆类"""
+    rng = random.Random(9)
+    assert analyzer.create_accumulator().find_clone_classes() == ({}, 0)
+    accumulator = accumulate(analyzer, [random_lines(rng, 20), random_lines(rng, 20), ['x;']])
+    assert accumulator.find_clone_classes() == ({}, 0)
+    block_level = accumulator.result()['block_level']
+    assert block_level['total_blocks'] == 0
+    assert block_level['rows_with_clones'] == 0
+    assert block_level['shared_fingerprint_ratio'] == 0.0
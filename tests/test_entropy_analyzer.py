@@ -0,0 +1,102 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""代码块扫描和滑动窗口熵的测试"""
+import math
+from collections import Counter
+
+import pytest
+
+from analyzers.entropy_analyzer import EntropyAnalyzer
+from utils.verilog_lexer import lex
+
+# 守卫匹配、重叠匹配以及注释和字符串中的关键字
+TRICKY_CODE = '''module top #(parameter W = 8) (input wire clk, output reg [W-1:0] q);
+  // always @(posedge clk) in a comment is not a block
+  /* module hidden; reg r; */ wire w1, w2;
+  always @ ( posedge clk ) if (rst) q <= 0; else q <= q + 1;
+  always@(negedge clk) begin end
+  always_ff @(posedge clk) casez (sel) endcase
+  initial $display("assign if else module m;");
+  reg
+    multi_line_reg;
+  logic [3:0] l; typedef enum {A, B} state_t; struct packed {logic a;} s;
+  generate endgenerate function f; endfunction task t; endtask
+  assert property (p); localparam L = 1; myreg regx wire_ inout_x
+endmodule
+'''
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return EntropyAnalyzer()
+
+
+def regex_block_counts(analyzer, code_text):
+    """原实现：在掩码文本上用各代码块的正则分别finditer计数"""
+    masked_text = lex(code_text).masked_text()
+    return {block_type: len(pattern.findall(masked_text)) for block_type, pattern in analyzer.patterns.items()}
+
+
+def test_scan_blocks_matches_regex_counts_on_tricky_code(analyzer):
+    """一次关键字扫描的计数与逐个正则finditer的计数一致"""
+    _, blocks, line_count = analyzer.scan_blocks(TRICKY_CODE)
+    assert analyzer._block_counts(blocks) == regex_block_counts(analyzer, TRICKY_CODE)
+    assert line_count == TRICKY_CODE.count('\n') + 1
+
+
+def test_scan_blocks_matches_regex_counts_on_corpus(analyzer, corpus):
+    """合成语料上与原实现计数一致，出现位置的行号升序且与关键字所在行一致"""
+    for code in corpus:
+        block_lines, blocks, line_count = analyzer.scan_blocks(code)
+        assert analyzer._block_counts(blocks) == regex_block_counts(analyzer, code)
+        assert block_lines == sorted(block_lines)
+        assert all(0 <= line < line_count for line in block_lines)
+
+
+def test_scan_blocks_reports_keyword_lines(analyzer):
+    """每次出现记录的是关键字所在的行"""
+    block_lines, blocks, _ = analyzer.scan_blocks('// if\nassign a = b;\n\nif (x)\n  y = 1;\nelse y = 0;')
+    assert list(zip(block_lines, blocks)) == [(1, 'assign'), (3, 'if_else'), (5, 'if_else')]
+    assert Counter(blocks) == {'assign': 1, 'if_else': 2}
+
+
+def window_profile_reference(analyzer, block_lines, blocks, line_count):
+    """逐个窗口重新统计代码块并计算熵的参照实现"""
+    window = max(1, min(analyzer.window_size, line_count))
+    weights = analyzer.block_weights
+    low_windows = high_windows = 0
+    for first in range(line_count - window + 1):
+        counts = Counter(block for line, block in zip(block_lines, blocks) if first <= line < first + window)
+        total_weight = sum(count * weights[block] for block, count in counts.items())
+        entropy = 0.0
+        if total_weight > 0:
+            frequencies = [count * weights[block] / total_weight for block, count in counts.items()]
+            entropy = -sum(freq * math.log2(freq) for freq in frequencies if freq > 0) / math.log2(len(weights))
+        if entropy < analyzer.thresholds['low_entropy']:
+            low_windows += 1
+        elif entropy > analyzer.thresholds['high_entropy']:
+            high_windows += 1
+    return {'windows': line_count - window + 1, 'low_entropy_windows': low_windows,
+            'high_entropy_windows': high_windows}
+
+
+def test_window_profile_matches_recomputed_windows(analyzer, corpus):
+    """增量更新的滑动窗口熵与逐窗口重新计算的结果一致（含短于窗口的文件和拼接的长文件）"""
+    texts = corpus + [TRICKY_CODE, '', 'assign a = b;', '\n'.join(corpus[:5])]
+    for code in texts:
+        scanned = analyzer.scan_blocks(code)
+        assert analyzer.window_profile(*scanned) == window_profile_reference(analyzer, *scanned)
+
+
+def test_short_file_window_equals_file_entropy(analyzer):
+    """不足一个窗口的文件只有一个窗口，其熵等于整个文件的熵"""
+    result = analyzer.analyze_block_entropy(TRICKY_CODE)
+    assert result['window_profile']['windows'] == 1
+    low = result['entropy'] < analyzer.thresholds['low_entropy']
+    high = result['entropy'] > analyzer.thresholds['high_entropy']
+    assert result['window_profile']['low_entropy_windows'] == int(low)
+    assert result['window_profile']['high_entropy_windows'] == int(high)
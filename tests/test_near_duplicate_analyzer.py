@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""MinHash签名和LSH近似重复聚类的测试"""
+import json
+import os
+import random
+import string
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from analyzers.analysis_engine import AnalysisEngine
+from analyzers.near_duplicate_analyzer import NearDuplicateAnalyzer
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return NearDuplicateAnalyzer()
+
+
+def random_lines(rng, count):
+    """互不相同的标准化代码行"""
+    def name():
+        return ''.join(rng.choice(string.ascii_lowercase) for _ in range(10))
+    return [f'assign {name()} = {name()} & {name()};' for _ in range(count)]
+
+
+@pytest.fixture(scope='module')
+def files():
+    """4个原始文件、每个原始文件的两份只改动一行的副本，以及4个无关文件（按此顺序排列的行号）"""
+    rng = random.Random(13)
+    originals = [random_lines(rng, 60) for _ in range(4)]
+    copies = []
+    for lines in originals:
+        for _ in range(2):
+            copy = list(lines)
+            copy[rng.randrange(len(copy))] = random_lines(rng, 1)[0]
+            copies.append(copy)
+    return originals + copies + [random_lines(rng, 60) for _ in range(4)]
+
+
+def accumulate(analyzer, files, row_ids):
+    accumulator = analyzer.create_accumulator()
+    for row, lines in zip(row_ids, files):
+        accumulator.add({'minhash': analyzer.signature(lines)}, row)
+    return accumulator
+
+
+def test_signature_estimates_jaccard_similarity(analyzer):
+    """签名中相等位置的比例接近shingle集合的Jaccard相似度"""
+    rng = random.Random(17)
+    shared = random_lines(rng, 100)
+    first = shared + random_lines(rng, 50)
+    second = shared + random_lines(rng, 50)
+    first_shingles = set(analyzer.shingle_hashes(first).tolist())
+    second_shingles = set(analyzer.shingle_hashes(second).tolist())
+    jaccard = len(first_shingles & second_shingles) / len(first_shingles | second_shingles)
+    estimate = (analyzer.signature(first) == analyzer.signature(second)).mean()
+    assert abs(estimate - jaccard) < 0.2
+    assert analyzer.signature(['', '']) is None
+    assert np.array_equal(analyzer.signature(first), analyzer.signature(iter(first)))
+
+
+def test_near_identical_copies_cluster_with_original(analyzer, files):
+    """只改动一行的副本与原始文件归为一簇，无关文件不进入任何簇"""
+    clusters = accumulate(analyzer, files, range(len(files))).clusters()
+    assert clusters == [[index, 4 + 2 * index, 5 + 2 * index] for index in range(4)]
+
+
+def test_clusters_use_row_ids_and_survive_merging(analyzer, files):
+    """分片累加后合并的结果与一次累加相同，簇中为累加时的行号"""
+    row_ids = [1000 + 3 * index for index in range(len(files))]
+    whole = accumulate(analyzer, files, row_ids)
+    merged = accumulate(analyzer, files[:5], row_ids[:5])
+    merged.merge(accumulate(analyzer, files[5:], row_ids[5:]))
+    assert merged.clusters() == whole.clusters()
+    assert whole.clusters()[0] == [1000, 1012, 1015]
+
+
+def test_redundant_rows_match_clusters(analyzer, files):
+    """冗余行为各簇中除代表行以外的行，数量与统计结果一致"""
+    accumulator = accumulate(analyzer, files, range(len(files)))
+    clusters = accumulator.clusters()
+    redundant = accumulator.redundant_rows(clusters)
+    assert redundant == sorted((row, rows[0]) for rows in clusters for row in rows[1:])
+    result = accumulator.result(clusters)
+    assert result['duplicate_rows'] == len(redundant) == 8
+    assert result['cluster_count'] == 4
+    assert result['rows_analyzed'] == len(files)
+
+
+def test_redundant_rows_written_to_side_file(tmp_path, files):
+    """近似重复的冗余行另存为报告目录中的CSV，不写入JSON报告"""
+    results = AnalysisEngine().analyze(['\n'.join(lines) for lines in files])
+    assert len(results['near_duplicate_rows']) == results['duplication_stats']['cross_file']['duplicate_rows']
+
+    report_dir = str(tmp_path / 'files_20240101_000000')
+    main.save_analysis_report(results, str(tmp_path), 'files.csv', report_dir=report_dir)
+    redundant = pd.read_csv(os.path.join(report_dir, 'files_20240101_000000_near_duplicates.csv'))
+    assert list(redundant.itertuples(index=False, name=None)) == \
+        [tuple(pair) for pair in results['near_duplicate_rows']]
+    with open(os.path.join(report_dir, 'files_20240101_000000_report.json')) as f:
+        assert 'near_duplicate_rows' not in json.load(f)
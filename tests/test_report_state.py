@@ -0,0 +1,72 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""累加状态的保存、读取和--update增量合并测试"""
+import os
+import pickle
+
+import main
+from conftest import assert_results_close, comparable
+from utils.report_state import (_STATE_MAGIC, appended_offset, load_state, save_state, source_signature,
+                                state_path)
+
+# 引用不存在的模块的pickle（模拟累加器类被重命名或删除后的旧状态），反序列化时会失败
+MISSING_CLASS_PICKLE = b'\x80\x04cdqevaluator_removed_module\nRemovedAccumulator\n.'
+
+CHUNKSIZE = 30
+
+
+def test_update_after_append_matches_full_run(tmp_path, corpus_frame):
+    """保存、读取状态后合并追加的行，结果与对完整文件的一次分析一致"""
+    appended_path = str(tmp_path / 'appended.csv')
+    full_path = str(tmp_path / 'full.csv')
+    corpus_frame[:100].to_csv(appended_path, index=False)
+    corpus_frame.to_csv(full_path, index=False)
+
+    _, state = main.analyze_file_stream(appended_path, None, CHUNKSIZE)
+    report_dir = str(tmp_path / 'report')
+    os.makedirs(report_dir)
+    save_state(report_dir, state)
+
+    corpus_frame[100:].to_csv(appended_path, mode='a', header=False, index=False)
+    loaded = load_state(report_dir)
+    assert loaded is not None and loaded['rows'] == 100
+    updated, updated_state = main.update_file_analysis(appended_path, loaded, None, CHUNKSIZE)
+    full, _ = main.analyze_file_stream(full_path, None, CHUNKSIZE)
+
+    assert updated_state['rows'] == len(corpus_frame)
+    assert_results_close(comparable(updated), comparable(full))
+
+
+def test_append_detection(tmp_path, corpus_frame):
+    """只追加时返回追加前的文件大小，改写已有内容时返回None"""
+    path = str(tmp_path / 'data.csv')
+    corpus_frame[:10].to_csv(path, index=False)
+    signature = source_signature(path)
+
+    corpus_frame[10:20].to_csv(path, mode='a', header=False, index=False)
+    assert appended_offset(signature, path) == signature['size']
+
+    corpus_frame[5:20].to_csv(path, index=False)
+    assert appended_offset(signature, path) is None
+
+
+def test_state_without_version_header_is_not_unpickled(tmp_path):
+    """没有版本头部的早期状态文件直接拒绝，不反序列化其中的累加器"""
+    report_dir = str(tmp_path)
+    with open(state_path(report_dir), 'wb') as f:
+        f.write(MISSING_CLASS_PICKLE)
+    assert load_state(report_dir) is None
+
+
+def test_state_with_other_version_is_not_unpickled(tmp_path):
+    """版本头部与当前版本不符的状态文件不反序列化状态本身"""
+    report_dir = str(tmp_path)
+    with open(state_path(report_dir), 'wb') as f:
+        f.write(_STATE_MAGIC)
+        pickle.dump({'version': '2-0000000000000000'}, f)
+        f.write(MISSING_CLASS_PICKLE)
+    assert load_state(report_dir) is None
@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""逐行分析记录缓存的测试"""
+import pickle
+import random
+
+import pytest
+
+from analyzers.analysis_engine import AnalysisEngine
+from conftest import comparable
+from utils.profiler import StageProfiler
+from utils.row_cache import RowCache
+
+CONFIG_KEY = b'config-a'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = RowCache(str(tmp_path / 'rows.sqlite'))
+    yield cache
+    cache.close()
+
+
+def meta_total_size(cache):
+    return cache._connect().execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+
+
+def put_records(cache, texts, payload_size=1000):
+    """写入以文本为键、带不可压缩负载的记录，返回各文本的键"""
+    keys = cache.keys(CONFIG_KEY, texts)
+    cache.put_many({key: {'text': text, 'payload': random.Random(text).randbytes(payload_size)}
+                    for key, text in zip(keys, texts)})
+    return keys
+
+
+def test_cached_engine_matches_uncached_and_hits_on_rerun(corpus, cache):
+    """第一次全部未命中，第二次全部命中，两次结果都与不使用缓存时一致"""
+    expected = comparable(AnalysisEngine().analyze(corpus))
+    texts = list(dict.fromkeys(corpus))
+    for expected_hits in (0, len(texts)):
+        engine = AnalysisEngine(cache=cache)
+        profiler = StageProfiler()
+        records = list(engine.iter_records(texts, profiler))
+        assert len(records) == len(texts)
+        assert profiler.counters['cache_hits'] == expected_hits
+        assert profiler.counters['cache_misses'] == len(texts) - expected_hits
+        assert comparable(engine.analyze(corpus)) == expected
+    assert cache.stats()['entries'] == len(texts)
+
+
+def test_eviction_bounds_total_size_and_keeps_recent_entries(tmp_path):
+    """超过容量时按最近使用时间淘汰，总大小不超过容量，meta中的计数与实际总大小一致"""
+    cache = RowCache(str(tmp_path / 'small.sqlite'), max_size_mb=20000 / (1024 * 1024))
+    old_keys = put_records(cache, [f'old {index}' for index in range(5)])
+    # 刷新第一条的使用时间，之后它应晚于其余旧条目被淘汰
+    cache.put_many({}, touched=old_keys[:1])
+    for batch in range(10):
+        put_records(cache, [f'new {batch} {index}' for index in range(5)])
+        stats = cache.stats()
+        assert stats['size'] <= cache.max_bytes
+        assert meta_total_size(cache) == stats['size']
+        surviving = cache.get_many(old_keys)
+        if old_keys[0] not in surviving:
+            assert surviving == {}
+    assert cache.stats()['entries'] < 55
+    assert cache.get_many(old_keys) == {}
+    cache.close()
+
+
+def test_replacing_entries_does_not_double_count(cache):
+    """重复写入相同的键时，被替换条目的大小从总大小中扣除"""
+    texts = [f'row {index}' for index in range(20)]
+    put_records(cache, texts)
+    size = cache.stats()['size']
+    put_records(cache, texts)
+    assert cache.stats()['size'] == size == meta_total_size(cache)
+
+
+def test_config_change_invalidates_entries(cache, tmp_path):
+    """用不同的配置摘要打开缓存时清空全部条目，相同配置重新打开时保留"""
+    keys = put_records(cache, ['a', 'b', 'c'])
+    cache.close()
+
+    reopened = RowCache(cache.path)
+    assert len(reopened.get_many(reopened.keys(CONFIG_KEY, ['a', 'b', 'c']))) == 3
+    reopened.keys(b'config-b', ['a'])
+    assert reopened.stats() == {'entries': 0, 'size': 0}
+    assert meta_total_size(reopened) == 0
+    assert reopened.get_many(keys) == {}
+    reopened.close()
+
+
+def test_cache_can_be_sent_to_workers(cache):
+    """缓存对象序列化时不带连接，反序列化后在新进程中重新连接"""
+    put_records(cache, ['a'])
+    clone = pickle.loads(pickle.dumps(cache))
+    assert clone._connection is None
+    assert len(clone.get_many(clone.keys(CONFIG_KEY, ['a']))) == 1
+    clone.close()
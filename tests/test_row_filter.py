@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""逐行过滤的级联评估测试"""
+import math
+
+import pytest
+
+from analyzers.analysis_engine import AnalysisEngine
+from analyzers.row_filter import INVALID_REASON, RowFilter
+from config.scoring_config import FILTER_CONFIG
+from utils.row_cache import RowCache
+
+# 只按评分、只按指标阈值、评分与阈值组合三种过滤配置
+FILTER_CASES = [
+    {'min_score': 70},
+    {'min_score': None, 'max_duplication_ratio': 0.2, 'min_entropy': 0.4},
+    {'min_score': 62, 'max_low_entropy_window_ratio': 0.5, 'max_text_length': 1500},
+]
+
+
+@pytest.fixture(scope='module')
+def texts(corpus):
+    """合成语料加上无效行"""
+    return corpus + [None, 123]
+
+
+def evaluate(engine, texts, cascade, **config):
+    row_filter = RowFilter(engine, {**FILTER_CONFIG, **config, 'cascade': cascade})
+    return row_filter.evaluate_chunk(texts)
+
+
+@pytest.mark.parametrize('config', FILTER_CASES)
+def test_cascade_keeps_the_same_rows(texts, config):
+    """级联提前剔除与完整评估保留的行相同，保留行的评分和评级相同"""
+    engine = AnalysisEngine()
+    cascaded, cascade_stats = evaluate(engine, texts, True, **config)
+    complete, complete_stats = evaluate(engine, texts, False, **config)
+
+    kept = [index for index, (_, _, reason) in enumerate(complete) if reason is None]
+    assert 0 < len(kept) < len(texts)
+    assert [index for index, (_, _, reason) in enumerate(cascaded) if reason is None] == kept
+    assert [cascaded[index][:2] for index in kept] == [complete[index][:2] for index in kept]
+    for (_, _, cascade_reason), (_, _, complete_reason) in zip(cascaded, complete):
+        # 提前剔除的行只记录已检查阶段的剔除原因
+        if cascade_reason is not None:
+            assert set(cascade_reason.split(',')) <= set(complete_reason.split(','))
+    assert [reason for _, _, reason in cascaded[-2:]] == [INVALID_REASON] * 2
+
+    # 级联确实跳过了部分行的后续阶段
+    last_stage = list(complete_stats)[-1]
+    assert complete_stats[last_stage][0] == len(texts) - 2
+    assert cascade_stats[last_stage][0] < complete_stats[last_stage][0]
+
+
+def test_cached_rows_evaluate_like_complete_rows(tmp_path, texts):
+    """已缓存的行用完整指标评估，结果与不启用级联的完整评估完全相同"""
+    cache = RowCache(str(tmp_path / 'rows.sqlite'))
+    engine = AnalysisEngine(cache=cache)
+    list(engine.iter_records(texts))
+    config = FILTER_CASES[2]
+    cached, _ = evaluate(engine, texts, True, **config)
+    complete, _ = evaluate(AnalysisEngine(), texts, False, **config)
+    for (score, grade, reason), (expected_score, expected_grade, expected_reason) in zip(cached, complete):
+        assert (grade, reason) == (expected_grade, expected_reason)
+        assert score == expected_score or (math.isnan(score) and math.isnan(expected_score))
+    cache.close()
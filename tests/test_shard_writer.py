@@ -0,0 +1,29 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""ShardWriter的Parquet列类型测试"""
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from analyzers.row_filter import OUTPUT_COLUMN_TYPES
+from utils.shard_writer import ShardWriter
+
+
+def test_all_null_batch_followed_by_float_batch(tmp_path):
+    """第一批的score全为空值时，之后带浮点评分的批次仍能写入同一分片"""
+    with ShardWriter(str(tmp_path), 'rejected', 'parquet', 100, OUTPUT_COLUMN_TYPES) as writer:
+        writer.write(pd.DataFrame({'text': ['a', 'b'], 'score': [None, None], 'grade': [None, None],
+                                   'reject_reason': ['max_text_length', 'max_text_length']}))
+        writer.write(pd.DataFrame({'text': ['c'], 'score': [42.5], 'grade': ['F'],
+                                   'reject_reason': ['min_score']}))
+
+    table = pq.read_table(writer.paths[0])
+    assert table.schema.field('score').type == pa.float64()
+    assert table.schema.field('grade').type == pa.string()
+    assert table.column('score').to_pylist() == [None, None, 42.5]
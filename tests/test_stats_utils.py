@@ -0,0 +1,78 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""在线统计和分位数草图的测试"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.stats_utils import QuantileSketch, RunningStats, describe_counts
+
+
+@pytest.fixture(scope='module')
+def values():
+    """跨越多个数量级、含零和负数的样本（数量为1001，使各百分位恰好落在某个样本上）"""
+    rng = np.random.default_rng(3)
+    samples = np.concatenate([rng.lognormal(5, 2, 990), np.zeros(3), -rng.lognormal(1, 1, 8)])
+    return rng.permutation(samples).tolist()
+
+
+def test_sketch_quantiles_within_relative_accuracy(values):
+    """落在样本上的分位数估计与精确值的相对误差不超过relative_accuracy"""
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in np.linspace(0, 1, 101):
+        expected = float(np.quantile(values, q))
+        assert sketch.quantile(q) == pytest.approx(expected, rel=0.01), q
+
+
+def test_sketch_merge_matches_single_sketch(values):
+    """分片草图合并后与在全部样本上构建的草图完全一致"""
+    whole = QuantileSketch()
+    parts = [QuantileSketch() for _ in range(3)]
+    for index, value in enumerate(values):
+        whole.add(value)
+        parts[index % 3].add(value)
+    merged = parts[0]
+    merged.merge(parts[1])
+    merged.merge(parts[2])
+    assert merged.items() == whole.items()
+    assert (merged.min, merged.max, merged.count) == (whole.min, whole.max, whole.count)
+
+
+def test_sketch_memory_is_bounded():
+    """桶数超过max_buckets时合并最小的桶，高分位数不受影响"""
+    sketch = QuantileSketch(max_buckets=64)
+    for exponent in range(-200, 200):
+        sketch.add(1.1 ** exponent)
+    assert len(sketch.positive) <= 64
+    assert sketch.quantile(1.0) == pytest.approx(1.1 ** 199)
+    assert sketch.quantile(0.9) == pytest.approx(1.1 ** 159, rel=0.01)
+
+
+def test_running_stats_merge_matches_numpy(values):
+    """Welford统计按分片合并后与numpy的均值和标准差一致"""
+    merged = RunningStats()
+    for start in range(0, len(values), 250):
+        part = RunningStats()
+        for value in values[start:start + 250]:
+            part.add(value)
+        merged.merge(part)
+    assert merged.mean == pytest.approx(np.mean(values), rel=1e-9)
+    assert merged.std() == pytest.approx(np.std(values), rel=1e-9)
+    assert merged.std(ddof=1) == pytest.approx(np.std(values, ddof=1), rel=1e-9)
+    assert (merged.min, merged.max) == (min(values), max(values))
+
+
+def test_describe_counts_matches_pandas():
+    """按取值计数的统计与pandas.Series.describe()一致"""
+    rng = np.random.default_rng(5)
+    samples = rng.integers(0, 200, 777)
+    counts = dict(zip(*np.unique(samples, return_counts=True)))
+    expected = pd.Series(samples).describe()
+    for key, value in describe_counts(counts).items():
+        assert value == pytest.approx(expected[key], rel=1e-12), key
@@ -0,0 +1,87 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""Verilog词法扫描的测试"""
+import random
+
+import pytest
+
+from utils.verilog_lexer import BLOCK_COMMENT, LINE_COMMENT, STRING, lex
+
+# 随机文本的字符表：各种记号的开头和结尾字符，以及普通代码字符
+FUZZ_ALPHABET = ['/', '/', '*', '"', '\\', '\n', 'a', ' ', ';']
+
+
+def lex_reference(text):
+    """逐字符扫描的参照实现，返回(种类, 起始, 结束)列表"""
+    tokens = []
+    length = len(text)
+    position = 0
+    while position < length:
+        if text.startswith('//', position):
+            end = text.find('\n', position)
+            tokens.append((LINE_COMMENT, position, length if end < 0 else end))
+        elif text.startswith('/*', position):
+            end = text.find('*/', position + 2)
+            tokens.append((BLOCK_COMMENT, position, length if end < 0 else end + 2))
+        elif text[position] == '"':
+            end = position + 1
+            while end < length and text[end] not in '"\n':
+                if text[end] == '\\':
+                    if end + 1 >= length or text[end + 1] == '\n':
+                        break
+                    end += 1
+                end += 1
+            if end < length and text[end] == '"':
+                end += 1
+            tokens.append((STRING, position, end))
+        else:
+            position += 1
+            continue
+        position = tokens[-1][2]
+    return tokens
+
+
+def spans(tokens):
+    return list(zip(tokens.kinds, tokens.starts, tokens.ends))
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('a / b; c /= d;', []),
+    ('x = "a // not a comment"; // comment', [(STRING, 4, 24), (LINE_COMMENT, 26, 36)]),
+    ('/* "not a string" // */ y', [(BLOCK_COMMENT, 0, 23)]),
+    ('s = "esc \\" quote"; z', [(STRING, 4, 18)]),
+    ('s = "open\nnext', [(STRING, 4, 9)]),
+    ('a /* unclosed\nblock', [(BLOCK_COMMENT, 2, 19)]),
+    ('/*/ still open */x', [(BLOCK_COMMENT, 0, 17)]),
+    ('// trailing', [(LINE_COMMENT, 0, 11)]),
+])
+def test_lex_tricky_cases(text, expected):
+    """字符串中的注释开头、注释中的引号、转义引号、未闭合的字符串和块注释"""
+    assert spans(lex(text)) == expected
+
+
+def test_lex_matches_reference_on_random_text():
+    """随机组合记号字符的文本上与逐字符参照实现一致"""
+    rng = random.Random(11)
+    for _ in range(3000):
+        text = ''.join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 40)))
+        assert spans(lex(text)) == lex_reference(text), repr(text)
+
+
+def test_views_preserve_length_and_lines(corpus):
+    """code_text和masked_text与原文本等长、换行符位置不变，并去掉注释和字符串中的内容"""
+    text = 'assign a = "x // y"; /* multi\nline */ b = 1; // tail\nend'
+    tokens = lex(text)
+    assert tokens.code_text() == 'assign a = "x // y";         \n        b = 1;        \nend'
+    assert tokens.masked_text() == 'assign a = """""""";         \n        b = 1;        \nend'
+    assert tokens.code_lines() == tokens.code_text().split('\n')
+
+    for code in corpus:
+        tokens = lex(code)
+        lines = code.split('\n')
+        for view in (tokens.code_text(), tokens.masked_text()):
+            assert [len(line) for line in view.split('\n')] == [len(line) for line in lines]
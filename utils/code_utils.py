@@ -6,6 +6,7 @@ See LICENSE file in the project root for license information.
 """
 """代码处理相关的工具函数"""
 import re
+from functools import lru_cache
 
 def preprocess_code(code):
     """预处理代码文本"""
@@ -13,33 +14,44 @@ def preprocess_code(code):
         return []
     return code.split('\n')
 
+# 字符串常量
+_STRING_PATTERN = re.compile(r'"[^"]*"')
+
+# 单次扫描的记号模式：单个数字加'h及以字母结尾的十六进制数为HEX，以数字结尾的单词为VAR或NUM
+_TOKEN_PATTERN = re.compile(r"\b\d'h[0-9a-fA-F]*[a-fA-F]\b|\b\w*\d\b")
+
+# 标准化结果缓存的最大条目数（HDL代码中end、begin等重复行很多）
+NORMALIZE_CACHE_SIZE = 65536
+
+
+def _replace_token(match):
+    """将一个记号替换为其结构类别"""
+    token = match.group()
+    if "'" in token:
+        return 'HEX'
+    # 以数字结尾的多字符单词（如data1、16）为VAR，单个数字为NUM
+    return 'VAR' if len(token) > 1 else 'NUM'
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
 def normalize_line(line):
-    """标准化代码行，保留结构特征"""
-    # 替换字符串常量
-    line = re.sub(r'"[^"]*"', 'STR', line)
+    """标准化代码行，保留结构特征
     
-    # 替换带数字的变量名（如data1, data2）
-    line = re.sub(r'\b\w+\d+\b', 'VAR', line)
+    结果与依次执行以下替换完全一致：字符串常量->STR，带数字的变量名->VAR，
+    Verilog二进制/十六进制/十进制常量->BIN/HEX/DEC，普通数字->NUM，再规范化空白字符。
+    VAR替换会先吃掉所有以数字结尾的单词，因此BIN和DEC永远不会命中，
+    HEX只在单个数字位宽且十六进制数以字母结尾时命中，可以合并为一次记号扫描。
+    """
+    # 替换字符串常量（需先于记号扫描，替换结果可能与相邻字符组成新单词）
+    if '"' in line:
+        line = _STRING_PATTERN.sub('STR', line)
     
-    # 替换Verilog数字常量
-    line = re.sub(r'\b\d+\'b[01]+\b', 'BIN', line)  # 二进制
-    line = re.sub(r'\b\d+\'h[0-9a-fA-F]+\b', 'HEX', line)  # 十六进制
-    line = re.sub(r'\b\d+\'d\d+\b', 'DEC', line)  # 十进制
-    
-    # 替换普通数字
-    line = re.sub(r'\b\d+\b', 'NUM', line)
+    # 一次扫描替换变量名、数字常量和普通数字
+    line = _TOKEN_PATTERN.sub(_replace_token, line)
     
     # 规范化空白字符
     return ' '.join(line.split())
 
-def is_comment_line(line):
-    """检查是否为注释行"""
-    line = line.strip()
-    return (line.startswith('//') or 
-            line.startswith('/*') or 
-            line.startswith('*') or 
-            line.endswith('*/'))
-
 def is_blank_line(line):
     """检查是否为空白行"""
     return not bool(line.strip())
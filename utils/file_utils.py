@@ -5,22 +5,220 @@ This file is part of DQEvaluator, licensed under custom license.
 See LICENSE file in the project root for license information.
 """
 """文件处理相关的工具函数"""
+import json
 import os
 import pandas as pd
+from utils.text_reader import (CSV_EXTENSIONS, JSONL_EXTENSIONS, VERILOG_EXTENSIONS,
+                               iter_source_files, read_source_file)
+
+# pyarrow为可选依赖，仅读取Parquet和Arrow IPC文件时需要
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 支持的数据文件格式（CSV和JSONL的扩展名定义在utils.text_reader中）
+PARQUET_EXTENSIONS = ('.parquet',)
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+DATA_EXTENSIONS = CSV_EXTENSIONS + JSONL_EXTENSIONS + PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+
+# 默认每批读取的行数
+DEFAULT_BATCH_SIZE = 50000
+
+def is_data_file(file_name):
+    """判断是否为支持的数据文件"""
+    return file_name.lower().endswith(DATA_EXTENSIONS)
+
+def _require_pyarrow(file_path):
+    if pa is None:
+        raise ImportError(f"Reading {file_path} requires pyarrow (pip install pyarrow)")
+
+def iter_source_batches(root, batch_size=DEFAULT_BATCH_SIZE, row_keys=None):
+    """逐批读取目录树中的Verilog源文件，每个文件为一行
+
+    Args:
+        root: 源代码目录
+        batch_size: 每批的文件数
+        row_keys: 可选列表，按行依次追加源文件相对于root的路径
+
+    Yields:
+        list: 一批源文件内容
+    """
+    batch = []
+    for path in iter_source_files(root):
+        try:
+            text = read_source_file(path)
+        except OSError as e:
+            print(f"Error reading {path}: {str(e)}")
+            continue
+        batch.append(text)
+        if row_keys is not None:
+            row_keys.append(os.path.relpath(path, root))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _iter_arrow_batches(file_path):
+    """以内存映射方式逐个读取Arrow IPC文件（文件或流格式）的记录批，不复制数据"""
+    _require_pyarrow(file_path)
+    with pa.memory_map(file_path, 'r') as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            batches = pa.ipc.open_stream(source)
+        yield from batches
+
+def _iter_arrow_column(file_path):
+    """以内存映射方式逐批读取Arrow IPC文件的text列"""
+    for batch in _iter_arrow_batches(file_path):
+        # 缺少该列时get_field_index返回-1，不能直接按下标读取（会读到最后一列）
+        index = batch.schema.get_field_index('text')
+        if index < 0:
+            raise ValueError(f"Arrow file {file_path} must contain a 'text' column")
+        yield batch.column(index)
+
+def iter_text_batches(file_path, batch_size=DEFAULT_BATCH_SIZE, row_keys=None):
+    """逐批读取数据文件的text列，内存占用只与批大小有关
+
+    CSV和JSONL逐块解析；Parquet按行组读取；Arrow IPC文件以内存映射方式访问，
+    每批只为当前批的字符串创建Python对象。目录按Verilog源代码树读取，每个源文件为一行。
+
+    Args:
+        file_path: 数据文件路径（.csv/.jsonl/.parquet/.arrow/.feather/.ipc）或源代码目录
+        batch_size: 每批的行数
+        row_keys: 可选列表，读取源代码目录时按行依次追加源文件的相对路径
+
+    Yields:
+        list: 一批代码文本（缺失值为None）
+    """
+    if os.path.isdir(file_path):
+        yield from iter_source_batches(file_path, batch_size, row_keys)
+        return
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        with pd.read_csv(file_path, usecols=['text'], chunksize=batch_size) as reader:
+            for chunk in reader:
+                yield chunk['text'].tolist()
+    elif extension in JSONL_EXTENSIONS:
+        with open(file_path, 'rb') as f:
+            yield from iter_jsonl_batches(f, batch_size)
+    elif extension in PARQUET_EXTENSIONS:
+        _require_pyarrow(file_path)
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=['text']):
+            yield batch.column(0).to_pylist()
+    elif extension in ARROW_EXTENSIONS:
+        # 按batch_size重新分批，批边界与记录批无关
+        batch = []
+        for column in _iter_arrow_column(file_path):
+            offset = 0
+            while offset < len(column):
+                size = min(batch_size - len(batch), len(column) - offset)
+                batch.extend(column.slice(offset, size).to_pylist())
+                offset += size
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    else:
+        raise ValueError(f"Unsupported data file format: {file_path}")
+
+def iter_jsonl_batches(f, batch_size=DEFAULT_BATCH_SIZE):
+    """从已打开的JSONL文件的当前位置逐批读取text字段"""
+    for records in _iter_jsonl_records(f, batch_size):
+        yield [record.get('text') for record in records]
+
+def _iter_jsonl_records(f, batch_size):
+    batch = []
+    for line in f:
+        if not line.strip():
+            continue
+        batch.append(json.loads(line))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_record_batches(file_path, batch_size=DEFAULT_BATCH_SIZE):
+    """逐批读取数据文件的完整记录（全部列），用于输出筛选后的数据集
+
+    源代码目录的每批包含path和text两列。
+
+    Yields:
+        pandas.DataFrame: 一批原始记录（包含text列）
+    """
+    if os.path.isdir(file_path):
+        row_keys = []
+        for texts in iter_source_batches(file_path, batch_size, row_keys):
+            yield pd.DataFrame({'path': row_keys, 'text': texts})
+            row_keys.clear()
+        return
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        with pd.read_csv(file_path, chunksize=batch_size) as reader:
+            yield from reader
+    elif extension in JSONL_EXTENSIONS:
+        with open(file_path, 'rb') as f:
+            for records in _iter_jsonl_records(f, batch_size):
+                yield pd.DataFrame.from_records(records)
+    elif extension in PARQUET_EXTENSIONS:
+        _require_pyarrow(file_path)
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield batch.to_pandas()
+    elif extension in ARROW_EXTENSIONS:
+        for batch in _iter_arrow_batches(file_path):
+            for offset in range(0, batch.num_rows, batch_size):
+                yield batch.slice(offset, batch_size).to_pandas()
+    else:
+        raise ValueError(f"Unsupported data file format: {file_path}")
+
+def read_texts(file_path, row_keys=None):
+    """读取数据文件的全部代码文本（只读取text列）
+
+    Args:
+        file_path: 数据文件路径或源代码目录
+        row_keys: 可选列表，读取源代码目录时按行依次追加源文件的相对路径
+
+    Returns:
+        list: 代码文本（缺失值为None或NaN）
+    """
+    extension = '' if os.path.isdir(file_path) else os.path.splitext(file_path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return pd.read_csv(file_path, usecols=['text'])['text'].tolist()
+    if extension in PARQUET_EXTENSIONS:
+        _require_pyarrow(file_path)
+        return pq.read_table(file_path, columns=['text'], memory_map=True).column('text').to_pylist()
+    texts = []
+    for batch in iter_text_batches(file_path, row_keys=row_keys):
+        texts.extend(batch)
+    return texts
 
 def load_data(data_file):
-    """加载数据文件"""
+    """加载数据文件（CSV、JSONL、Parquet或Arrow IPC）或Verilog源代码目录"""
     try:
-        # 尝试读取CSV文件
-        df = pd.read_csv(data_file)
-        
-        # 确保有text列
-        if 'text' not in df.columns:
-            raise ValueError("CSV file must contain a 'text' column")
-        
+        if data_file.lower().endswith(CSV_EXTENSIONS):
+            # 尝试读取CSV文件
+            df = pd.read_csv(data_file)
+
+            # 确保有text列
+            if 'text' not in df.columns:
+                raise ValueError("CSV file must contain a 'text' column")
+        else:
+            df = pd.DataFrame({'text': read_texts(data_file)})
+
         # 重命名列以匹配代码
         df = df.rename(columns={'text': 'code_text'})
-        
+
         print(f"\nSuccessfully loaded data with {len(df)} records")
         return df
     except Exception as e:
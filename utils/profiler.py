@@ -0,0 +1,261 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""分阶段性能剖析：各阶段的墙钟时间、CPU时间、吞吐量、内存峰值和热点路径计数器
+
+计时区间分两级：
+- 粗粒度阶段（读取、分析、汇总、评分）由stage()记录，同时记录常驻内存峰值，
+  启用内存跟踪时还记录阶段内Python对象分配的峰值（tracemalloc）；
+- 逐行的子阶段由switch()记录，区间名为'<分析器>.<子阶段>'，相邻区间共用一次计时，开销为每个区间两次时钟读取。
+启用cProfile时按分析器分别收集调用统计，可写出为pstats文件。
+
+剖析器可以序列化后传给工作进程，工作进程记录的结果合并回主进程（各进程的时间相加）。
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# pstats文本摘要中列出的函数数
+PSTATS_LINES = 40
+
+_MB = 1024 * 1024
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），平台不支持时为None；ru_maxrss在Linux上以KB为单位，在macOS上以字节为单位"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / _MB if sys.platform == 'darwin' else peak / 1024
+
+
+class _CollectedStats:
+    """已收集的cProfile统计（来自其他进程），供pstats.Stats读取"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class StageProfiler:
+    def __init__(self, cprofile=False, trace_memory=False):
+        """初始化剖析器
+
+        Args:
+            cprofile: 是否按分析器收集cProfile调用统计（开销较大，用于定位热点函数）
+            trace_memory: 是否用tracemalloc记录各粗粒度阶段的Python内存分配峰值（开销较大）
+        """
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        # 区间名 -> [墙钟时间, CPU时间, 调用次数, 行数]
+        self.stages = {}
+        # 粗粒度阶段 -> 内存统计
+        self.memory = {}
+        self.counters = Counter()
+        # 分析器 -> cProfile.Profile（本进程）和收集好的统计列表（来自工作进程）
+        self.profiles = {}
+        self.profile_stats = {}
+        self._span = None
+        self._active_profile = None
+        self._traced_peaks = []
+
+    def __getstate__(self):
+        # cProfile.Profile不能序列化，转换为收集好的统计
+        state = self.__dict__.copy()
+        profile_stats = {analyzer: list(stats) for analyzer, stats in self.profile_stats.items()}
+        for analyzer, profile in self.profiles.items():
+            profile.create_stats()
+            profile_stats.setdefault(analyzer, []).append(profile.stats)
+        state.update(profiles={}, profile_stats=profile_stats, _span=None, _active_profile=None, _traced_peaks=[])
+        return state
+
+    def spawn(self):
+        """创建设置相同的空剖析器，由工作进程记录后通过merge合并回来"""
+        return StageProfiler(self.cprofile)
+
+    def _add(self, name, wall, cpu, rows):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = [0.0, 0.0, 0, 0]
+        stats[0] += wall
+        stats[1] += cpu
+        stats[2] += 1
+        stats[3] += rows
+
+    def switch(self, name, rows=1):
+        """结束当前的子阶段区间并开始名为name的区间，name为None时只结束当前区间
+
+        Args:
+            name: 区间名，格式为'<分析器>.<子阶段>'
+            rows: 该区间处理的行数（逐行区间为1，汇总等整体区间为0）
+        """
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        span = self._span
+        if span is not None:
+            self._add(span[0], wall - span[1], cpu - span[2], span[3])
+
+        if self.cprofile:
+            analyzer = name.partition('.')[0] if name is not None else None
+            active = self._active_profile
+            if active is not None and active[0] != analyzer:
+                active[1].disable()
+                active = None
+            if active is None and analyzer is not None:
+                profile = self.profiles.get(analyzer)
+                if profile is None:
+                    profile = self.profiles[analyzer] = cProfile.Profile()
+                profile.enable()
+                active = (analyzer, profile)
+            self._active_profile = active
+            # 切换cProfile的时间不计入下一个区间
+            wall = time.perf_counter()
+            cpu = time.process_time()
+
+        self._span = None if name is None else (name, wall, cpu, rows)
+
+    @contextmanager
+    def span(self, name, rows=0):
+        """以上下文管理器记录一个子阶段区间（区间外没有其他打开的子阶段区间时使用）"""
+        self.switch(name, rows)
+        try:
+            yield
+        finally:
+            self.switch(None)
+
+    def iterate(self, name, iterable):
+        """逐项产出iterable的元素，取下一项（如从文件读取下一块）的时间记入区间name"""
+        iterator = iter(iterable)
+        while True:
+            self.switch(name, 0)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.switch(None)
+            yield item
+
+    @contextmanager
+    def stage(self, name, memory=True):
+        """记录一个粗粒度阶段（如读取、分析、汇总、评分），行数为阶段内分析的行数
+
+        Args:
+            memory: 是否记录该阶段的内存峰值（在与其他阶段并行的线程中运行时应为False）
+        """
+        tracing = False
+        if memory:
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                # 嵌套阶段重置峰值前，先把外层阶段到目前为止的峰值保存下来
+                if self._traced_peaks:
+                    self._traced_peaks[-1] = max(self._traced_peaks[-1], tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+                self._traced_peaks.append(0)
+            rss_before = peak_rss_mb()
+        rows_before = self.counters['rows']
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - wall, time.process_time() - cpu, self.counters['rows'] - rows_before)
+            if memory:
+                stats = self.memory.setdefault(name, {})
+                rss = peak_rss_mb()
+                if rss is not None:
+                    stats['peak_rss_mb'] = max(stats.get('peak_rss_mb', 0.0), rss)
+                    stats['rss_growth_mb'] = stats.get('rss_growth_mb', 0.0) + rss - rss_before
+                if tracing:
+                    peak = max(self._traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                    stats['peak_traced_mb'] = max(stats.get('peak_traced_mb', 0.0), peak / _MB)
+                    if self._traced_peaks:
+                        self._traced_peaks[-1] = max(self._traced_peaks[-1], peak)
+
+    def merge(self, other):
+        """合并另一个剖析器（如工作进程返回的）记录的结果"""
+        for name, (wall, cpu, calls, rows) in other.stages.items():
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = [0.0, 0.0, 0, 0]
+            stats[0] += wall
+            stats[1] += cpu
+            stats[2] += calls
+            stats[3] += rows
+        for name, other_stats in other.memory.items():
+            stats = self.memory.setdefault(name, {})
+            for key, value in other_stats.items():
+                stats[key] = stats.get(key, 0.0) + value if key == 'rss_growth_mb' else max(stats.get(key, 0.0), value)
+        self.counters.update(other.counters)
+        for analyzer, stats in other.profile_stats.items():
+            self.profile_stats.setdefault(analyzer, []).extend(stats)
+
+    def result(self):
+        """生成报告中的profile部分
+
+        Returns:
+            dict: stages为粗粒度阶段，analyzers为各分析器及其子阶段（多进程分析时为各进程之和），
+                counters为热点路径计数器
+        """
+        rows = self.counters['rows']
+        stages = {}
+        analyzers = {}
+        for name, (wall, cpu, calls, stage_rows) in self.stages.items():
+            entry = {'wall_s': wall, 'cpu_s': cpu, 'calls': calls}
+            if stage_rows:
+                entry['rows'] = stage_rows
+                entry['rows_per_s'] = stage_rows / wall if wall > 0 else None
+            analyzer, _, sub_stage = name.partition('.')
+            if not sub_stage:
+                entry.update(self.memory.get(name, {}))
+                stages[name] = entry
+                continue
+            group = analyzers.setdefault(analyzer, {'wall_s': 0.0, 'cpu_s': 0.0, 'stages': {}})
+            group['wall_s'] += wall
+            group['cpu_s'] += cpu
+            group['stages'][sub_stage] = entry
+        for group in analyzers.values():
+            group['rows_per_s'] = rows / group['wall_s'] if rows and group['wall_s'] > 0 else None
+        return {'stages': stages, 'analyzers': analyzers, 'counters': dict(self.counters)}
+
+    def write_pstats(self, output_dir, prefix):
+        """为每个分析器写出cProfile统计<prefix>_<分析器>.prof（可用pstats读取）和按累计时间排序的文本摘要
+
+        Returns:
+            list: 写出的.prof文件路径
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for analyzer in sorted(set(self.profiles) | set(self.profile_stats)):
+            sources = [_CollectedStats(dict(stats)) for stats in self.profile_stats.get(analyzer, [])]
+            profile = self.profiles.get(analyzer)
+            if profile is not None:
+                profile.create_stats()
+                sources.append(_CollectedStats(dict(profile.stats)))
+            text = io.StringIO()
+            stats = pstats.Stats(*sources, stream=text)
+            base = os.path.join(output_dir, f"{prefix}_{analyzer}")
+            stats.dump_stats(f"{base}.prof")
+            stats.sort_stats('cumulative').print_stats(PSTATS_LINES)
+            with open(f"{base}.txt", 'w') as f:
+                f.write(text.getvalue())
+            paths.append(f"{base}.prof")
+        return paths
@@ -0,0 +1,158 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""分析报告的累加状态持久化，用于追加数据后的增量更新
+
+状态文件直接序列化各分析器的累加器对象，累加器的类名或字段变化后旧文件无法正确恢复。
+因此文件以魔数和一个只含版本的小头部开头，版本由STATE_VERSION和定义累加器的模块源码摘要组成，
+任一模块修改后自动变化；读取时先比较头部，版本不符的文件不反序列化，对应的数据文件重新完整分析。
+"""
+import importlib.util
+import os
+import pickle
+import re
+from functools import lru_cache
+from hashlib import blake2b
+from pathlib import Path
+import pandas as pd
+from utils.file_utils import CSV_EXTENSIONS, JSONL_EXTENSIONS, iter_jsonl_batches
+
+# 状态文件格式版本，状态字典的结构变化时递增（累加器的变化由STATE_MODULES的源码摘要自动体现）
+STATE_VERSION = 3
+
+# 定义被序列化的累加器（及其使用的在线统计）的模块
+STATE_MODULES = (
+    'analyzers.analysis_engine',
+    'analyzers.length_analyzer',
+    'analyzers.complexity_analyzer',
+    'analyzers.duplication_analyzer',
+    'analyzers.entropy_analyzer',
+    'analyzers.near_duplicate_analyzer',
+    'utils.stats_utils',
+)
+
+# 状态文件开头的魔数，之后依次为版本头部和状态本身两个pickle
+_STATE_MAGIC = b'DQESTATE'
+
+# 校验追加前文件内容时读取的末尾字节数
+_TAIL_BYTES = 65536
+
+
+def state_path(report_dir):
+    """报告目录中的状态文件路径"""
+    return os.path.join(report_dir, f"{os.path.basename(os.path.normpath(report_dir))}_state.pkl")
+
+
+@lru_cache(maxsize=None)
+def state_version():
+    """当前的状态版本：STATE_VERSION和STATE_MODULES源码的摘要（不导入这些模块）"""
+    digest = blake2b(digest_size=8)
+    for name in STATE_MODULES:
+        with open(importlib.util.find_spec(name).origin, 'rb') as f:
+            digest.update(f.read())
+    return f"{STATE_VERSION}-{digest.hexdigest()}"
+
+
+def save_state(report_dir, state):
+    """将累加状态保存到报告目录（先写临时文件再替换，避免中断时留下损坏的状态）"""
+    path = state_path(report_dir)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(_STATE_MAGIC)
+        pickle.dump({'version': state_version()}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    return path
+
+
+def load_state(report_dir):
+    """读取报告目录中的累加状态
+
+    先读取版本头部，版本与当前不符（包括没有头部的早期文件）时不反序列化状态本身。
+
+    Returns:
+        dict: 累加状态，不存在或版本不符时返回None（需重新完整分析）
+    """
+    path = state_path(report_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        header = None
+        if f.read(len(_STATE_MAGIC)) == _STATE_MAGIC:
+            header = pickle.load(f)
+        if header is None or header.get('version') != state_version():
+            print(f"\nSaved analysis state {path} was written by a different version of the analyzers, "
+                  f"re-analyzing the data file")
+            return None
+        return pickle.load(f)
+
+
+def find_latest_report(stats_dir, filename):
+    """查找某个数据文件最近一次保存了累加状态的报告目录
+
+    Returns:
+        str: 报告目录，没有时返回None
+    """
+    if not os.path.isdir(stats_dir):
+        return None
+    pattern = re.compile(rf"^{re.escape(Path(filename).stem)}_\d{{8}}_\d{{6}}$")
+    for name in sorted(os.listdir(stats_dir), reverse=True):
+        report_dir = os.path.join(stats_dir, name)
+        if pattern.match(name) and os.path.exists(state_path(report_dir)):
+            return report_dir
+    return None
+
+
+def _tail_hash(file_path, size):
+    with open(file_path, 'rb') as f:
+        f.seek(max(0, size - _TAIL_BYTES))
+        return blake2b(f.read(size - max(0, size - _TAIL_BYTES)), digest_size=16).hexdigest()
+
+
+def source_signature(file_path):
+    """记录数据文件当前的大小和末尾内容摘要，用于之后判断文件是否只是被追加（源代码目录返回None）"""
+    if os.path.isdir(file_path):
+        return None
+    size = os.path.getsize(file_path)
+    return {'size': size, 'tail_hash': _tail_hash(file_path, size)}
+
+
+def appended_offset(signature, file_path):
+    """判断数据文件是否在上次分析后只追加了数据
+
+    Returns:
+        int: 新数据的起始字节偏移，文件被截断或改写时返回None
+    """
+    size = os.path.getsize(file_path)
+    if size < signature['size'] or _tail_hash(file_path, signature['size']) != signature['tail_hash']:
+        return None
+    return signature['size']
+
+
+def supports_append(file_path):
+    """数据文件格式是否支持按字节偏移读取追加的行（CSV和JSONL）"""
+    return file_path.lower().endswith(CSV_EXTENSIONS + JSONL_EXTENSIONS)
+
+
+def iter_appended_chunks(file_path, offset, chunksize):
+    """从字节偏移处分块读取CSV或JSONL文件追加部分的text列"""
+    if offset >= os.path.getsize(file_path):
+        return
+    if file_path.lower().endswith(JSONL_EXTENSIONS):
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            yield from iter_jsonl_batches(f, chunksize)
+        return
+    columns = pd.read_csv(file_path, nrows=0).columns
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        try:
+            reader = pd.read_csv(f, header=None, names=columns, usecols=['text'], chunksize=chunksize)
+        except pd.errors.EmptyDataError:
+            return
+        with reader:
+            for chunk in reader:
+                yield chunk['text']
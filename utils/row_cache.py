@@ -0,0 +1,208 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""逐行分析记录的磁盘缓存（SQLite）"""
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+from hashlib import blake2b
+
+# 默认缓存容量（MB）
+DEFAULT_CACHE_SIZE_MB = 1024
+
+# 单条SQL语句中的最大参数数
+_QUERY_BATCH_SIZE = 500
+
+# 超出容量时淘汰到容量的该比例，避免每次写入都触发淘汰
+_EVICTION_TARGET = 0.9
+
+
+class RowCache:
+    """按内容寻址的逐行分析记录缓存
+
+    键为代码文本以分析配置摘要为密钥的blake2b哈希，相同文本在相同配置下复用分析记录。
+    打开缓存时若配置摘要与缓存中记录的不一致，则清空全部条目；
+    总大小超过容量时按最近使用时间淘汰。总大小作为计数记在meta表中，与条目的写入和删除
+    在同一事务中增减（多个工作进程并发写入时也保持一致），写入时不再对全表求和。
+
+    连接在每个进程首次使用时建立，对象可以传给工作进程使用。
+    """
+
+    def __init__(self, path, max_size_mb=DEFAULT_CACHE_SIZE_MB):
+        """初始化缓存
+
+        Args:
+            path: SQLite数据库文件路径
+            max_size_mb: 缓存容量（MB）
+        """
+        self.path = path
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._connection = None
+        self._config_key = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_config_key'] = None
+        return state
+
+    def _connect(self):
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB)')
+                connection.execute('CREATE TABLE IF NOT EXISTS records ('
+                                   'key BLOB PRIMARY KEY, value BLOB NOT NULL, '
+                                   'size INTEGER NOT NULL, last_used INTEGER NOT NULL)')
+                connection.execute('CREATE INDEX IF NOT EXISTS records_last_used ON records (last_used)')
+            self._connection = connection
+        return self._connection
+
+    def open(self, config_key):
+        """按分析配置打开缓存，配置变化时清空旧条目
+
+        Args:
+            config_key: 分析配置摘要（bytes）
+        """
+        if self._config_key == config_key:
+            return
+        connection = self._connect()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute("SELECT value FROM meta WHERE name = 'config_key'").fetchone()
+            if row is None or bytes(row[0]) != config_key:
+                if row is not None:
+                    print(f"\nAnalysis configuration changed, invalidating row cache {self.path}")
+                connection.execute('DELETE FROM records')
+                connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('config_key', ?)",
+                                   (config_key,))
+                self._set_total_size(connection, 0)
+            elif self._total_size(connection) is None:
+                # 早期版本的缓存文件没有总大小计数，打开时求和一次
+                total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM records').fetchone()[0]
+                self._set_total_size(connection, total)
+            # 容量可能比上次运行时小
+            self._evict(connection)
+        self._config_key = config_key
+
+    def keys(self, config_key, texts):
+        """计算代码文本的缓存键，非字符串的行返回None"""
+        self.open(config_key)
+        return [blake2b(text.encode('utf-8'), digest_size=16, key=config_key).digest()
+                if isinstance(text, str) else None
+                for text in texts]
+
+    def get_many(self, keys):
+        """批量读取缓存的分析记录
+
+        Returns:
+            dict: 命中的键到分析记录的映射
+        """
+        connection = self._connect()
+        keys = [key for key in keys if key is not None]
+        records = {}
+        for start in range(0, len(keys), _QUERY_BATCH_SIZE):
+            batch = keys[start:start + _QUERY_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            for key, value in connection.execute(
+                    f'SELECT key, value FROM records WHERE key IN ({placeholders})', batch):
+                records[bytes(key)] = pickle.loads(zlib.decompress(value))
+        return records
+
+    def put_many(self, records, touched=()):
+        """批量写入新的分析记录，并刷新命中条目的使用时间
+
+        Args:
+            records: 键到分析记录的映射
+            touched: 本次命中的键
+        """
+        if not records and not touched:
+            return
+        connection = self._connect()
+        now = time.time_ns()
+        rows = []
+        for key, record in records.items():
+            value = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL), 1)
+            rows.append((key, value, len(value), now))
+        touched = list(touched)
+        with connection:
+            # 先取得写锁，使读取被替换条目的大小与写入之间不会插入其他进程的写入
+            connection.execute('BEGIN IMMEDIATE')
+            # 其他进程可能已写入相同的键，被替换条目的大小从总大小中扣除
+            replaced = 0
+            for start in range(0, len(rows), _QUERY_BATCH_SIZE):
+                batch = [row[0] for row in rows[start:start + _QUERY_BATCH_SIZE]]
+                placeholders = ','.join('?' * len(batch))
+                replaced += connection.execute(
+                    f'SELECT COALESCE(SUM(size), 0) FROM records WHERE key IN ({placeholders})', batch).fetchone()[0]
+            connection.executemany('INSERT OR REPLACE INTO records (key, value, size, last_used) '
+                                   'VALUES (?, ?, ?, ?)', rows)
+            for start in range(0, len(touched), _QUERY_BATCH_SIZE):
+                batch = touched[start:start + _QUERY_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                connection.execute(f'UPDATE records SET last_used = ? WHERE key IN ({placeholders})',
+                                   [now] + batch)
+            if rows:
+                connection.execute("UPDATE meta SET value = value + ? WHERE name = 'total_size'",
+                                   (sum(row[2] for row in rows) - replaced,))
+                self._evict(connection)
+
+    @staticmethod
+    def _total_size(connection):
+        """meta表中记录的条目总大小（字节），没有记录时返回None"""
+        row = connection.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def _set_total_size(connection, total):
+        connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('total_size', ?)", (total,))
+
+    def _evict(self, connection):
+        """总大小超过容量时删除最久未使用的条目"""
+        total = self._total_size(connection)
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * _EVICTION_TARGET
+        while total > target:
+            oldest = connection.execute('SELECT key, size FROM records ORDER BY last_used LIMIT ?',
+                                        (_QUERY_BATCH_SIZE,)).fetchall()
+            if not oldest:
+                break
+            evicted = []
+            for key, size in oldest:
+                if total <= target:
+                    break
+                evicted.append((key,))
+                total -= size
+            connection.executemany('DELETE FROM records WHERE key = ?', evicted)
+        self._set_total_size(connection, total)
+
+    def clear(self):
+        """清空缓存"""
+        connection = self._connect()
+        with connection:
+            connection.execute('DELETE FROM records')
+            self._set_total_size(connection, 0)
+        connection.execute('VACUUM')
+
+    def stats(self):
+        """返回缓存条目数和总大小（字节）"""
+        connection = self._connect()
+        count, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM records').fetchone()
+        return {'entries': count, 'size': size}
+
+    def close(self):
+        """关闭当前进程的数据库连接"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._config_key = None
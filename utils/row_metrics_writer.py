@@ -0,0 +1,84 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""逐行指标表的分批写出（Parquet或Arrow IPC）"""
+import os
+
+# pyarrow为可选依赖，仅输出逐行指标表时需要
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 支持的输出格式及文件扩展名
+ROW_METRICS_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+class RowMetricsWriter:
+    """逐批写出逐行指标表
+
+    每次写入一批行（一个Parquet行组或Arrow记录批），内存占用只与批大小有关。
+    row列为行号，可与原始数据按行顺序关联；读取源代码目录时另有path列。
+    """
+
+    def __init__(self, path, columns, row_keys=None):
+        """初始化并创建输出文件
+
+        Args:
+            path: 输出文件路径，格式由扩展名决定（.parquet或.arrow）
+            columns: 列名和类型（'int'、'float'或'bool'）的列表，第一列为行号
+            row_keys: 可选的行键（源文件路径）序列，按行号取值写入path列
+        """
+        if pa is None:
+            raise ImportError("Writing per-row metrics requires pyarrow (pip install pyarrow)")
+        types = {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_()}
+        fields = [pa.field(name, types[kind]) for name, kind in columns]
+        if row_keys is not None:
+            fields.insert(1, pa.field('path', pa.string()))
+        self.schema = pa.schema(fields)
+        self.path = path
+        self.row_keys = row_keys
+        self.rows_written = 0
+        self._sink = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith(ROW_METRICS_FORMATS['parquet']):
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write_rows(self, rows):
+        """写入一批逐行指标
+
+        Args:
+            rows: 按列顺序排列的指标值元组的列表
+        """
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        if self.row_keys is not None:
+            columns.insert(1, [self.row_keys[row] for row in columns[0]])
+        arrays = [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows_written += len(rows)
+
+    def close(self):
+        """完成写入并关闭文件"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            if self._sink is not None:
+                self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
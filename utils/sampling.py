@@ -0,0 +1,157 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""单次流式遍历的行抽样
+
+固定样本量时使用蓄水池抽样（Algorithm L，跳过不入样的行时不调用随机数），固定比例时使用伯努利抽样。
+按代码长度分层时，以文本长度的以2为底的对数划分层（缺失值单独一层）：固定比例抽样在各层内独立进行；
+固定样本量抽样为每层保留一个容量为样本量的蓄水池，遍历结束后按各层行数比例分配样本量（最大余数法），
+再从各层蓄水池中均匀抽取，样本近似自加权，同时保证各长度段按比例出现在样本中。
+"""
+import math
+import random
+
+# 缺失值（非字符串）所在的层
+MISSING_STRATUM = -1
+
+
+def length_stratum(text):
+    """代码文本所在的长度层：长度在[2^(h-1), 2^h)内的文本属于第h层，空文本为第0层"""
+    if not isinstance(text, str):
+        return MISSING_STRATUM
+    return len(text).bit_length()
+
+
+class _Reservoir:
+    """固定容量的均匀蓄水池（Algorithm L）"""
+
+    def __init__(self, capacity, rng):
+        self.capacity = capacity
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+        self.weight = math.exp(math.log(1.0 - rng.random()) / capacity)
+        self.next_index = capacity + self._skip()
+
+    def _skip(self):
+        """下一次入样前跳过的行数"""
+        if self.weight >= 1.0:
+            return 0
+        return math.floor(math.log(1.0 - self.rng.random()) / math.log(1.0 - self.weight))
+
+    def offer(self, item):
+        index = self.seen
+        self.seen += 1
+        if index < self.capacity:
+            self.items.append(item)
+        elif index == self.next_index:
+            self.items[self.rng.randrange(self.capacity)] = item
+            self.weight *= math.exp(math.log(1.0 - self.rng.random()) / self.capacity)
+            self.next_index += self._skip() + 1
+
+
+class RowSampler:
+    def __init__(self, size, stratify=False, seed=0):
+        """初始化抽样器
+
+        Args:
+            size: 不小于1时为样本行数（蓄水池抽样），在(0, 1)内时为抽样比例（伯努利抽样）
+            stratify: 是否按代码长度分层抽样
+            seed: 随机种子，相同输入和种子得到相同样本
+        """
+        if size <= 0:
+            raise ValueError(f"Sample size must be positive, got {size}")
+        self.fraction = size if size < 1 else None
+        self.size = None if size < 1 else int(size)
+        self.stratify = stratify
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.population_rows = 0
+        self.strata_rows = {}
+        # 蓄水池抽样：层 -> 蓄水池；伯努利抽样：入样的(行号, 层, 文本)
+        self.reservoirs = {}
+        self.selected = []
+
+    @property
+    def method(self):
+        return 'bernoulli' if self.fraction is not None else 'reservoir'
+
+    def add(self, texts):
+        """依次处理一批代码文本，行号接续之前的批"""
+        rng = self.rng
+        stratify = self.stratify
+        fraction = self.fraction
+        for text in texts:
+            row = self.population_rows
+            self.population_rows += 1
+            stratum = length_stratum(text) if stratify else 0
+            self.strata_rows[stratum] = self.strata_rows.get(stratum, 0) + 1
+            if fraction is not None:
+                if rng.random() < fraction:
+                    self.selected.append((row, stratum, text))
+                continue
+            reservoir = self.reservoirs.get(stratum)
+            if reservoir is None:
+                reservoir = self.reservoirs[stratum] = _Reservoir(self.size, rng)
+            reservoir.offer((row, stratum, text))
+
+    def allocate(self):
+        """按各层行数比例分配样本量（最大余数法），返回层 -> 样本行数"""
+        total = self.population_rows
+        size = min(self.size, total)
+        quotas = {stratum: size * rows / total for stratum, rows in self.strata_rows.items()}
+        allocation = {stratum: math.floor(quota) for stratum, quota in quotas.items()}
+        remainder = size - sum(allocation.values())
+        for stratum in sorted(quotas, key=lambda stratum: (allocation[stratum] - quotas[stratum], stratum))[:remainder]:
+            allocation[stratum] += 1
+        return allocation
+
+    def sample(self):
+        """返回样本，按原始行号排序
+
+        Returns:
+            tuple: (行号列表, 层列表, 代码文本列表)
+        """
+        if self.fraction is not None:
+            selected = list(self.selected)
+        else:
+            selected = []
+            allocation = self.allocate()
+            for stratum in sorted(self.reservoirs):
+                items = self.reservoirs[stratum].items
+                selected.extend(self.rng.sample(items, min(allocation[stratum], len(items))))
+        selected.sort(key=lambda item: item[0])
+        return ([row for row, _, _ in selected], [stratum for _, stratum, _ in selected],
+                [text for _, _, text in selected])
+
+    def describe(self, strata):
+        """抽样方法和各层的总体行数、样本行数
+
+        Args:
+            strata: sample()返回的样本各行所在的层
+        """
+        sample_counts = {}
+        for stratum in strata:
+            sample_counts[stratum] = sample_counts.get(stratum, 0) + 1
+        description = {
+            'method': self.method,
+            'stratified': self.stratify,
+            'seed': self.seed,
+            'population_rows': self.population_rows,
+            'sample_rows': len(strata),
+            'sample_fraction': len(strata) / self.population_rows if self.population_rows else 0.0,
+        }
+        if self.stratify:
+            description['strata'] = [
+                {
+                    'min_length': None if stratum == MISSING_STRATUM else (0 if stratum == 0 else 2 ** (stratum - 1)),
+                    'max_length': None if stratum == MISSING_STRATUM else 2 ** stratum - 1,
+                    'population_rows': rows,
+                    'sample_rows': sample_counts.get(stratum, 0),
+                }
+                for stratum, rows in sorted(self.strata_rows.items())
+            ]
+        return description
@@ -0,0 +1,119 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""按行数分片写出数据集（Parquet、JSONL或CSV）"""
+import os
+
+# pyarrow为可选依赖，仅输出Parquet分片时需要
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 支持的输出格式及文件扩展名
+SHARD_FORMATS = {'parquet': '.parquet', 'jsonl': '.jsonl', 'csv': '.csv'}
+
+# 默认每个分片的行数
+DEFAULT_SHARD_ROWS = 100000
+
+
+class ShardWriter:
+    """按行数分片写出数据集
+
+    分片文件名为<prefix>-00000.<扩展名>，每个分片最多shard_rows行。
+    数据逐批追加到当前分片，内存占用只与批大小有关。
+    """
+
+    def __init__(self, directory, prefix, fmt='parquet', shard_rows=DEFAULT_SHARD_ROWS, column_types=None):
+        """初始化分片输出
+
+        Args:
+            directory: 输出目录
+            prefix: 分片文件名前缀
+            fmt: 输出格式（parquet、jsonl或csv）
+            shard_rows: 每个分片的最大行数
+            column_types: 可选的列名到类型（'int'、'float'、'bool'或'string'）的映射，
+                Parquet分片中这些列使用声明的类型，不由第一批数据推断
+        """
+        if fmt == 'parquet' and pa is None:
+            raise ImportError("Writing Parquet shards requires pyarrow (pip install pyarrow)")
+        self.directory = directory
+        self.prefix = prefix
+        self.fmt = fmt
+        self.shard_rows = shard_rows
+        self.column_types = column_types or {}
+        self.paths = []
+        self.rows_written = 0
+        self._schema = None
+        self._file = None
+        self._shard_filled = 0
+
+    def _open_shard(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.paths):05d}{SHARD_FORMATS[self.fmt]}")
+        if self.fmt == 'parquet':
+            self._file = pq.ParquetWriter(path, self._schema)
+        else:
+            self._file = open(path, 'w', encoding='utf-8', newline='')
+        self.paths.append(path)
+        self._shard_filled = 0
+
+    def _write_part(self, frame):
+        if self.fmt == 'parquet':
+            self._file.write_table(pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False))
+        elif self.fmt == 'jsonl':
+            text = frame.to_json(orient='records', lines=True, force_ascii=False, double_precision=15)
+            self._file.write(text.rstrip('\n') + '\n')
+        else:
+            frame.to_csv(self._file, index=False, header=self._shard_filled == 0)
+
+    def write(self, frame):
+        """追加一批记录，写满的分片自动切换到下一个
+
+        Args:
+            frame: 一批记录（DataFrame），各批的列需一致
+        """
+        if len(frame) == 0:
+            return
+        if self.fmt == 'parquet' and self._schema is None:
+            self._schema = self._build_schema(frame)
+        offset = 0
+        while offset < len(frame):
+            if self._file is None or self._shard_filled == self.shard_rows:
+                self.close()
+                self._open_shard()
+            size = min(self.shard_rows - self._shard_filled, len(frame) - offset)
+            self._write_part(frame.iloc[offset:offset + size])
+            self._shard_filled += size
+            self.rows_written += size
+            offset += size
+
+    def _build_schema(self, frame):
+        """Parquet分片的模式：声明了类型的列使用声明的类型，其余列由第一批数据推断，
+        其中全为空值的列按字符串处理，避免之后的批次类型不一致"""
+        types = {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(), 'string': pa.string()}
+        fields = []
+        for field in pa.Schema.from_pandas(frame, preserve_index=False):
+            if field.name in self.column_types:
+                field = pa.field(field.name, types[self.column_types[field.name]])
+            elif pa.types.is_null(field.type):
+                field = pa.field(field.name, pa.string())
+            fields.append(field)
+        return pa.schema(fields)
+
+    def close(self):
+        """关闭当前分片"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
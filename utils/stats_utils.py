@@ -0,0 +1,310 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""统计相关的工具函数"""
+import math
+import numpy as np
+
+
+def _value_at(sorted_items, index):
+    """返回按值排序的(值, 次数)序列中第index个元素（从0开始）"""
+    seen = 0
+    for value, count in sorted_items:
+        seen += count
+        if index < seen:
+            return value
+    return sorted_items[-1][0]
+
+
+def quantile_from_counts(sorted_items, total, q):
+    """按pandas的线性插值规则，从(值, 次数)序列计算分位数"""
+    position = q * (total - 1)
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    lower_value = _value_at(sorted_items, lower)
+    if upper == lower:
+        return float(lower_value)
+    upper_value = _value_at(sorted_items, upper)
+    return float(lower_value + (upper_value - lower_value) * (position - lower))
+
+
+# 预分箱直方图的默认箱数
+HISTOGRAM_BINS = 50
+
+
+def bin_histogram(values, counts, bins=HISTOGRAM_BINS):
+    """把按取值计数的直方图合并为等宽分箱（与numpy.histogram的分箱一致），绘图时只需处理各箱
+
+    Args:
+        values: 取值序列
+        counts: 每个取值的出现次数
+        bins: 箱数
+
+    Returns:
+        dict: edges（bins+1个箱边界）和counts（各箱次数），没有取值时均为空列表
+    """
+    if len(values) == 0:
+        return {'edges': [], 'counts': []}
+    binned, edges = np.histogram(values, bins=bins, weights=counts)
+    return {'edges': edges.tolist(), 'counts': np.rint(binned).astype(np.int64).tolist()}
+
+
+def describe_counts(counts):
+    """根据{值: 次数}统计，计算与pandas.Series.describe()一致的统计信息
+
+    Args:
+        counts: 整数值到出现次数的映射
+
+    Returns:
+        dict: count/mean/std/min/25%/50%/75%/max
+    """
+    total = sum(counts.values())
+    if total == 0:
+        nan = float('nan')
+        return {'count': 0.0, 'mean': nan, 'std': nan, 'min': nan,
+                '25%': nan, '50%': nan, '75%': nan, 'max': nan}
+
+    sorted_items = sorted((value, count) for value, count in counts.items() if count > 0)
+    value_sum = sum(value * count for value, count in sorted_items)
+    square_sum = sum(value * value * count for value, count in sorted_items)
+
+    # 使用整数运算计算样本方差，避免大数相减的精度损失
+    if total > 1:
+        std = math.sqrt((total * square_sum - value_sum * value_sum) / (total * (total - 1)))
+    else:
+        std = float('nan')
+
+    return {
+        'count': float(total),
+        'mean': value_sum / total,
+        'std': std,
+        'min': float(sorted_items[0][0]),
+        '25%': quantile_from_counts(sorted_items, total, 0.25),
+        '50%': quantile_from_counts(sorted_items, total, 0.5),
+        '75%': quantile_from_counts(sorted_items, total, 0.75),
+        'max': float(sorted_items[-1][0]),
+    }
+
+
+def describe_counts_summary(counts):
+    """根据{值: 次数}统计，计算与numpy一致的mean/std/min/max/median（总体标准差）"""
+    stats = describe_counts(counts)
+    total = stats['count']
+    std = stats['std'] * math.sqrt((total - 1) / total) if total > 1 else 0.0
+    if total == 0:
+        std = float('nan')
+    return {
+        'mean': stats['mean'],
+        'std': std,
+        'min': stats['min'],
+        'max': stats['max'],
+        'median': stats['50%']
+    }
+
+
+class RunningStats:
+    """Welford在线均值/方差统计，可与其他分片的统计合并"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        """累加一个数值"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """合并另一分片的统计（Chan并行公式）"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def std(self, ddof=0):
+        """标准差，ddof=0为总体标准差（同np.std），ddof=1为样本标准差（同pandas）"""
+        if self.count - ddof <= 0:
+            return float('nan')
+        return math.sqrt(max(self.m2, 0.0) / (self.count - ddof))
+
+
+class QuantileSketch:
+    """相对误差有界的可合并分位数草图（DDSketch）
+
+    数值按对数刻度分桶，分位数估计的相对误差不超过relative_accuracy，
+    内存只与桶数有关，与数据量无关。
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        """累加一个数值（可带重复次数）"""
+        self.count += count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value > 0:
+            store = self.positive
+            key = self._key(value)
+        elif value < 0:
+            store = self.negative
+            key = self._key(-value)
+        else:
+            self.zero_count += count
+            return
+        store[key] = store.get(key, 0) + count
+        if len(store) > self.max_buckets:
+            self._collapse(store)
+
+    def _collapse(self, store):
+        """桶数超限时合并绝对值最小的桶"""
+        keys = sorted(store)
+        excess = len(keys) - self.max_buckets
+        merged = sum(store.pop(key) for key in keys[:excess + 1])
+        store[keys[excess]] = merged
+
+    def merge(self, other):
+        """合并另一分片的草图"""
+        for key, count in other.positive.items():
+            self.positive[key] = self.positive.get(key, 0) + count
+        for key, count in other.negative.items():
+            self.negative[key] = self.negative.get(key, 0) + count
+        for store in (self.positive, self.negative):
+            if len(store) > self.max_buckets:
+                self._collapse(store)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def items(self):
+        """按数值升序返回(代表值, 次数)"""
+        items = [(-self._value(key), self.negative[key]) for key in sorted(self.negative, reverse=True)]
+        if self.zero_count:
+            items.append((0.0, self.zero_count))
+        items.extend((self._value(key), self.positive[key]) for key in sorted(self.positive))
+        return items
+
+    def quantile(self, q):
+        """估计q分位数（线性插值规则与pandas一致）"""
+        if self.count == 0:
+            return float('nan')
+        items = self.items()
+        value = quantile_from_counts(items, self.count, q)
+        return min(max(value, self.min), self.max)
+
+
+class ExactSummary:
+    """保留全部数值的精确统计，结果与numpy计算一致"""
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value):
+        self.values.append(value)
+
+    def merge(self, other):
+        """合并另一分片的数值（需按行顺序合并）"""
+        self.values.extend(other.values)
+
+    def summary(self, median=True):
+        """返回mean/std/min/max（以及median）"""
+        values = self.values
+        stats = {
+            'mean': float(np.mean(values)),
+            'std': float(np.std(values)),
+            'min': float(np.min(values)),
+            'max': float(np.max(values))
+        }
+        if median:
+            stats['median'] = float(np.median(values))
+        return stats
+
+
+class StreamingSummary:
+    """内存有界的在线统计：Welford计算均值/标准差，分位数草图估计中位数"""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.stats = RunningStats()
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value):
+        self.stats.add(value)
+        self.sketch.add(value)
+
+    def merge(self, other):
+        """合并另一分片的统计"""
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+
+    def summary(self, median=True):
+        """返回mean/std/min/max（以及median），与ExactSummary格式一致"""
+        stats = self.stats
+        result = {
+            'mean': float(stats.mean) if stats.count else float('nan'),
+            'std': stats.std(),
+            'min': float(stats.min) if stats.count else float('nan'),
+            'max': float(stats.max) if stats.count else float('nan')
+        }
+        if median:
+            result['median'] = float(self.sketch.quantile(0.5))
+        return result
+
+    def describe(self):
+        """返回与pandas.Series.describe()格式一致的统计信息"""
+        stats = self.stats
+        if stats.count == 0:
+            return describe_counts({})
+        return {
+            'count': float(stats.count),
+            'mean': float(stats.mean),
+            'std': stats.std(ddof=1),
+            'min': float(stats.min),
+            '25%': float(self.sketch.quantile(0.25)),
+            '50%': float(self.sketch.quantile(0.5)),
+            '75%': float(self.sketch.quantile(0.75)),
+            'max': float(stats.max),
+        }
+
+
+def create_summary(streaming=False):
+    """根据模式创建精确或流式统计"""
+    return StreamingSummary() if streaming else ExactSummary()
@@ -0,0 +1,88 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""只依赖标准库的代码文本读取（Verilog源文件和目录树、CSV和JSONL的text列）
+
+不导入pandas和pyarrow，供命令行快速评分等启动时间敏感的路径使用；
+大数据集的分块读取见utils.file_utils。
+"""
+import csv
+import json
+import mmap
+import os
+import sys
+
+# 支持的数据文件格式
+CSV_EXTENSIONS = ('.csv',)
+JSONL_EXTENSIONS = ('.jsonl',)
+
+# 目录树中作为源代码读取的文件
+VERILOG_EXTENSIONS = ('.v', '.sv', '.vh')
+
+# 不小于该大小（字节）的源文件以内存映射方式读取
+MMAP_THRESHOLD = 1 << 20
+
+# pandas.read_csv默认按缺失值处理的字符串，读取结果与pandas一致
+CSV_NA_VALUES = frozenset((
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+))
+
+def iter_source_files(root):
+    """递归遍历目录树中的Verilog源文件（.v/.sv/.vh），按路径排序产出，保证行号稳定"""
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(VERILOG_EXTENSIONS):
+                yield os.path.join(directory, name)
+
+def read_source_file(path):
+    """读取源文件内容，大文件通过内存映射直接解码，不经过中间缓冲区"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, 'utf-8', 'replace')
+        return f.read().decode('utf-8', 'replace')
+
+def read_csv_texts(file_path):
+    """用标准库csv模块读取CSV文件的text列（缺失值为None）"""
+    # 代码文本可能远超csv模块默认的单字段长度上限
+    csv.field_size_limit(sys.maxsize)
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or 'text' not in reader.fieldnames:
+            raise ValueError("CSV file must contain a 'text' column")
+        return [None if row['text'] in CSV_NA_VALUES else row['text'] for row in reader]
+
+def read_jsonl_texts(file_path):
+    """读取JSONL文件每条记录的text字段（缺失值为None）"""
+    with open(file_path, 'rb') as f:
+        return [json.loads(line).get('text') for line in f if line.strip()]
+
+def can_read_texts(file_path):
+    """判断read_small_texts能否只用标准库读取该路径"""
+    return os.path.isdir(file_path) or file_path.lower().endswith(
+        CSV_EXTENSIONS + JSONL_EXTENSIONS + VERILOG_EXTENSIONS)
+
+def read_small_texts(file_path):
+    """只用标准库读取一个输入的全部代码文本
+
+    Args:
+        file_path: Verilog源文件（作为一行）、源代码目录（每个源文件一行）、CSV或JSONL文件
+
+    Returns:
+        list: 代码文本
+    """
+    if os.path.isdir(file_path):
+        return [read_source_file(path) for path in iter_source_files(file_path)]
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        return read_csv_texts(file_path)
+    if extension in JSONL_EXTENSIONS:
+        return read_jsonl_texts(file_path)
+    if extension in VERILOG_EXTENSIONS:
+        return [read_source_file(file_path)]
+    raise ValueError(f"Unsupported input for the lightweight reader: {file_path}")
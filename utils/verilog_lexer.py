@@ -0,0 +1,138 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+"""各分析器共用的Verilog词法扫描
+
+对每个文件做一次从左到右的扫描，得到按起始位置排序的注释和字符串记号区间：扫描在块注释内部时跳过
+直到*/的全部内容（未闭合的块注释延伸到文件末尾），字符串内部的//和/*以及注释内部的引号都不会开始新的记号。
+记号的种类和起止偏移保存在紧凑的数组中。
+
+在此基础上提供两种与原文本等长、换行符位置不变的视图：code_text()将注释替换为空格，用于判断注释行和
+标准化代码行；masked_text()再将字符串替换为引号，注释和字符串中的单词不会被计为代码块。
+"""
+import re
+from array import array
+
+# 记号种类
+LINE_COMMENT = 1
+BLOCK_COMMENT = 2
+STRING = 3
+
+# 字符串（不跨行，未闭合时到行尾）。注释由str.find查找：正则引擎只对单个字面量开头的模式做快速查找，
+# 以/或"开头的选择分支需要逐字符检查，比分别查找两个字面量慢一个数量级
+_STRING_PATTERN = re.compile(r'"(?:\\.|[^"\\\n])*"?')
+
+# 各种类记号的填充字符：注释为空格，字符串为引号（不能开始标识符）
+_FILL_CHARS = {LINE_COMMENT: ' ', BLOCK_COMMENT: ' ', STRING: '"'}
+
+
+class TokenSpans:
+    """一个文件的注释和字符串记号区间，种类和起止偏移分别保存在数组中，按起始位置排序"""
+
+    __slots__ = ('text', 'kinds', 'starts', 'ends', '_code_text', '_masked_text')
+
+    def __init__(self, text):
+        self.text = text
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self._code_text = None
+        self._masked_text = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def code_text(self):
+        """注释替换为空格后的文本（长度和换行符位置不变）"""
+        if self._code_text is None:
+            self._code_text = self._replace((LINE_COMMENT, BLOCK_COMMENT))
+        return self._code_text
+
+    def masked_text(self):
+        """注释替换为空格、字符串替换为引号后的文本（长度和换行符位置不变）"""
+        if self._masked_text is None:
+            self._masked_text = self._replace((LINE_COMMENT, BLOCK_COMMENT, STRING))
+        return self._masked_text
+
+    def code_lines(self):
+        """按行拆分的code_text()，与text.split('\\n')一一对应"""
+        return self.code_text().split('\n')
+
+    def _replace(self, kinds):
+        """将指定种类的记号替换为等长的填充内容，保留其中的换行符"""
+        text = self.text
+        pieces = []
+        position = 0
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            if kind not in kinds:
+                continue
+            pieces.append(text[position:start])
+            pieces.append(_fill(text[start:end], kind))
+            position = end
+        if not pieces:
+            return text
+        pieces.append(text[position:])
+        return ''.join(pieces)
+
+
+def _fill(token, kind):
+    """记号的等长填充内容，保留其中的换行符"""
+    char = _FILL_CHARS[kind]
+    if '\n' not in token:
+        return char * len(token)
+    return '\n'.join(char * len(part) for part in token.split('\n'))
+
+
+def lex(text):
+    """扫描一个文件的代码文本
+
+    从左到右依次取最近的注释开头（//或/*）或引号作为下一个记号，记号结束后从其末尾继续，
+    记号内部的//、/*和引号因此不会开始新的记号。每种字面量的下一个出现位置只在落入已扫描的记号后
+    重新查找，各次查找的范围互不重叠，总开销与文本长度成线性。
+
+    Args:
+        text: 代码文本
+
+    Returns:
+        TokenSpans: 注释和字符串的记号区间
+    """
+    tokens = TokenSpans(text)
+    kinds, starts, ends = tokens.kinds, tokens.starts, tokens.ends
+    find = text.find
+    match_string = _STRING_PATTERN.match
+    length = len(text)
+    position = 0
+    slash = find('/')
+    quote = find('"')
+    while True:
+        # 下一个开始注释的斜杠（跳过除号等单独的斜杠）
+        while slash >= 0 and (slash < position or text[slash + 1:slash + 2] not in ('/', '*')):
+            slash = find('/', max(slash + 1, position))
+        if 0 <= quote < position:
+            quote = find('"', position)
+        if slash < 0 and quote < 0:
+            break
+
+        if quote < 0 or 0 <= slash < quote:
+            start = slash
+            if text[start + 1] == '/':
+                end = find('\n', start)
+                kinds.append(LINE_COMMENT)
+            else:
+                end = find('*/', start + 2)
+                if end >= 0:
+                    end += 2
+                kinds.append(BLOCK_COMMENT)
+            if end < 0:
+                end = length
+        else:
+            start = quote
+            end = match_string(text, start).end()
+            kinds.append(STRING)
+        starts.append(start)
+        ends.append(end)
+        position = end
+    return tokens
@@ -6,22 +6,39 @@ See LICENSE file in the project root for license information.
 """
 
 import os
+import matplotlib
+# 只输出图片文件：使用非交互式的Agg后端，无需图形界面，可在多个进程中同时渲染
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 from typing import List, Dict, Union
 
+# matplotlib 3.6起内置的seaborn样式更名为seaborn-v0_8，旧版本中仍为seaborn
+PLOT_STYLE = 'seaborn-v0_8' if 'seaborn-v0_8' in plt.style.available else 'seaborn'
+
 class CodeVisualizer:
     def __init__(self):
         """初始化代码可视化器"""
         # 设置图表样式
-        plt.style.use('seaborn')
+        plt.style.use(PLOT_STYLE)
         sns.set_palette("husl")
     
-    def plot_length_distribution(self, lengths: List[int], title: str, output_dir: str):
-        """绘制代码长度分布图"""
+    def plot_histogram_bins(self, histogram: Dict):
+        """在当前图表中绘制预分箱直方图"""
+        if histogram['counts']:
+            plt.stairs(histogram['counts'], histogram['edges'], fill=True)
+    
+    def plot_length_distribution(self, histogram: Dict, title: str, output_dir: str):
+        """绘制代码长度分布图
+        
+        Args:
+            histogram: 分析阶段生成的代码长度分箱直方图（edges和counts）
+            title: 图表标题
+            output_dir: 输出目录
+        """
         plt.figure(figsize=(10, 6))
-        sns.histplot(lengths, bins=50)
+        self.plot_histogram_bins(histogram)
         plt.title(title)
         plt.xlabel('Code Length (characters)')
         plt.ylabel('Frequency')
@@ -30,10 +47,15 @@ class CodeVisualizer:
         plt.savefig(os.path.join(output_dir, 'length_distribution.png'))
         plt.close()
     
-    def plot_line_length_distribution(self, line_lengths: List[int], output_dir: str):
-        """绘制行长度分布图"""
+    def plot_line_length_distribution(self, histogram: Dict, output_dir: str):
+        """绘制行长度分布图
+        
+        Args:
+            histogram: 分析阶段生成的行长度分箱直方图（edges和counts）
+            output_dir: 输出目录
+        """
         plt.figure(figsize=(10, 6))
-        sns.histplot(line_lengths, bins=50)
+        self.plot_histogram_bins(histogram)
         plt.title('Distribution of Line Lengths')
         plt.xlabel('Line Length (characters)')
         plt.ylabel('Frequency')
@@ -68,7 +90,7 @@ class CodeVisualizer:
         
         # 绘制重复率分布
         ratios = [r for r in line_stats['ratios'].values() if isinstance(r, (int, float))]
-        sns.histplot(ratios, bins=30)
+        plt.hist(ratios, bins=30)
         plt.title('Distribution of Duplication Ratios')
         plt.xlabel('Duplication Ratio')
         plt.ylabel('Frequency')
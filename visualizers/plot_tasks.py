@@ -0,0 +1,133 @@
+"""
+Copyright (c) 2024 Rujia Wang
+
+This file is part of DQEvaluator, licensed under custom license.
+See LICENSE file in the project root for license information.
+"""
+
+"""图表绘制任务：由分析结果（或已保存的JSON报告）生成各图表的绘制任务，并在渲染进程池中执行
+
+本模块不导入matplotlib，只有实际绘图的进程才加载绘图库。
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+from utils.stats_utils import bin_histogram
+
+def histogram_bins(length_stats: Dict, name: str) -> Dict:
+    """读取分析阶段生成的分箱直方图，早期报告中没有分箱时由按取值计数的直方图生成"""
+    bins = length_stats.get(f'{name}_bins')
+    if bins is None:
+        histogram = length_stats[f'{name}_histogram']
+        bins = bin_histogram(histogram['lengths'], histogram['counts'])
+    return bins
+
+def visualization_tasks(results: Dict, output_dir: str) -> List[Tuple[str, Dict]]:
+    """列出各图表的绘制任务，每个任务只携带该图表所需的少量数据（长度分布为预分箱直方图）
+    
+    Returns:
+        list: (CodeVisualizer方法名, 参数)的列表
+    """
+    length_stats = results['length_stats']
+    entropy_stats = results['entropy_stats']
+    return [
+        # 代码长度分布
+        ('plot_length_distribution', {
+            'histogram': histogram_bins(length_stats, 'length'),
+            'title': 'Distribution of Code Lengths',
+            'output_dir': output_dir,
+        }),
+        # 行长度分布
+        ('plot_line_length_distribution', {
+            'histogram': histogram_bins(length_stats, 'line_length'),
+            'output_dir': output_dir,
+        }),
+        # 复杂度分布
+        ('plot_complexity_distribution', {
+            'complexity_ratio': results['complexity_stats']['code_lines_ratio']['mean'],
+            'output_dir': output_dir,
+        }),
+        # 重复度分析
+        ('plot_duplication_analysis', {
+            'duplication_stats': {'line_level': results['duplication_stats']['line_level']},
+            'output_dir': output_dir,
+        }),
+        # 熵分析
+        ('plot_entropy_analysis', {
+            'entropy_stats': {
+                'global_entropy_stats': entropy_stats['global_entropy_stats'],
+                'block_stats': {'top_blocks': [{'block': block['block'], 'count': block['count']}
+                                               for block in entropy_stats['block_stats']['top_blocks'][:10]]},
+            },
+            'output_dir': output_dir,
+        }),
+    ]
+
+def generate_visualizations(results: Dict, output_dir: str, visualizer):
+    """在当前进程中依次生成全部可视化图表
+    
+    Args:
+        visualizer: CodeVisualizer实例
+    """
+    for method, kwargs in visualization_tasks(results, output_dir):
+        getattr(visualizer, method)(**kwargs)
+
+_render_visualizer = None
+
+def render_plot(method: str, kwargs: Dict) -> str:
+    """绘制一个图表（在后台渲染进程中运行，各图表可在不同进程中同时绘制）
+    
+    Returns:
+        str: 图表所在目录
+    """
+    global _render_visualizer
+    if _render_visualizer is None:
+        # matplotlib和seaborn只在渲染进程中导入
+        from visualizers.code_visualizer import CodeVisualizer
+        _render_visualizer = CodeVisualizer()
+    os.makedirs(kwargs['output_dir'], exist_ok=True)
+    getattr(_render_visualizer, method)(**kwargs)
+    return kwargs['output_dir']
+
+def submit_plots(renderer: ProcessPoolExecutor, results: Dict, report_dir: str) -> List:
+    """把一个报告的各图表作为独立任务提交到渲染进程池"""
+    return [renderer.submit(render_plot, method, kwargs)
+            for method, kwargs in visualization_tasks(results, report_dir)]
+
+def wait_for_plots(plot_futures: Dict):
+    """等待图表绘制完成，报告已完成绘图的报告目录和绘制错误"""
+    failed = set()
+    for future in as_completed(plot_futures):
+        report_dir = plot_futures[future]
+        try:
+            future.result()
+        except Exception as e:
+            failed.add(report_dir)
+            print(f"Error rendering plot in {report_dir}: {str(e)}")
+    for report_dir in dict.fromkeys(plot_futures.values()):
+        if report_dir not in failed:
+            print(f"\nPlots saved to: {report_dir}")
+
+def find_report_file(report_dir: str) -> str:
+    """返回报告目录中的JSON分析报告路径"""
+    reports = sorted(name for name in os.listdir(report_dir) if name.endswith('_report.json'))
+    if not reports:
+        raise FileNotFoundError(f"No analysis report found in {report_dir}")
+    return os.path.join(report_dir, reports[-1])
+
+def run_plot(report_dirs: List[str], render_workers: int):
+    """延后绘图：由已保存的JSON分析报告重新生成图表，不重新分析数据"""
+    plot_futures = {}
+    with ProcessPoolExecutor(max_workers=max(1, render_workers)) as renderer:
+        for report_dir in report_dirs:
+            try:
+                with open(find_report_file(report_dir)) as f:
+                    results = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading report from {report_dir}: {str(e)}")
+                continue
+            for future in submit_plots(renderer, results, report_dir):
+                plot_futures[future] = report_dir
+        wait_for_plots(plot_futures)